@@ -1,14 +1,25 @@
 import logging
 import os
-from typing import Optional
+from contextlib import ExitStack
+from typing import Iterable, List, Optional, Tuple
 
 import yaml
 
-from peerscout.keyword_extract.keyword_extract import current_timestamp_as_string, etl_keywords
+from peerscout.keyword_extract.keyword_cache import KeywordCache
+from peerscout.keyword_extract.keyword_extract import (
+    KeywordExtractor,
+    current_timestamp_as_string,
+    etl_keywords,
+    get_keyword_extractor,
+    get_persistent_keyword_cache
+)
 from peerscout.keyword_extract.keyword_extract_config import (
     KeywordExtractConfig,
     MultiKeywordExtractConfig
 )
+from peerscout.keyword_extract.sharding import get_shard_state_s3_object, validate_shard
+from peerscout.keyword_extract.spacy_language import SpacyLanguageCache
+from peerscout.utils.background_worker import run_concurrently
 from peerscout.utils.s3_data_service import get_stored_state
 
 
@@ -24,6 +35,12 @@ DEFAULT_DEPLOYMENT_ENV = 'ci'
 EXTRACT_KEYWORDS_CONFIG_FILE_PATH_ENV_NAME = 'EXTRACT_KEYWORDS_FILE_PATH'
 EXTRACT_KEYWORDS_MAX_ROWS_ENV_NAME = 'EXTRACT_KEYWORDS_MAX_ROWS'
 SPACY_LANGUAGE_MODEL_ENV_NAME = 'SPACY_LANGUAGE_MODEL'
+EXTRACT_KEYWORDS_SHARD_INDEX_ENV_NAME = 'EXTRACT_KEYWORDS_SHARD_INDEX'
+EXTRACT_KEYWORDS_SHARD_COUNT_ENV_NAME = 'EXTRACT_KEYWORDS_SHARD_COUNT'
+EXTRACT_KEYWORDS_PIPELINE_PARALLELISM_ENV_NAME = 'EXTRACT_KEYWORDS_PIPELINE_PARALLELISM'
+
+
+DEFAULT_PIPELINE_PARALLELISM = 1
 
 
 def get_yaml_file_as_dict(file_location: str) -> dict:
@@ -39,13 +56,56 @@ def get_spacy_language_model_override() -> Optional[str]:
     return os.getenv(SPACY_LANGUAGE_MODEL_ENV_NAME)
 
 
-def get_max_rows_override() -> Optional[int]:
-    max_rows_str = os.getenv(EXTRACT_KEYWORDS_MAX_ROWS_ENV_NAME)
-    if max_rows_str:
-        return int(max_rows_str)
+def get_optional_int_env(env_name: str) -> Optional[int]:
+    value_str = os.getenv(env_name)
+    if value_str:
+        return int(value_str)
     return None
 
 
+def get_max_rows_override() -> Optional[int]:
+    return get_optional_int_env(EXTRACT_KEYWORDS_MAX_ROWS_ENV_NAME)
+
+
+def get_shard_override() -> Tuple[Optional[int], Optional[int]]:
+    # run shard i of N of each pipeline (e.g. one shard per pod)
+    shard_index = get_optional_int_env(EXTRACT_KEYWORDS_SHARD_INDEX_ENV_NAME)
+    shard_count = get_optional_int_env(EXTRACT_KEYWORDS_SHARD_COUNT_ENV_NAME)
+    validate_shard(shard_index, shard_count)
+    return shard_index, shard_count
+
+
+def get_pipeline_parallelism(
+        multi_keyword_extract_conf: MultiKeywordExtractConfig) -> int:
+    # pipelines mostly wait for BigQuery, other pipelines may run in the meantime
+    return (
+        get_optional_int_env(EXTRACT_KEYWORDS_PIPELINE_PARALLELISM_ENV_NAME)
+        or multi_keyword_extract_conf.pipeline_parallelism
+        or DEFAULT_PIPELINE_PARALLELISM
+    )
+
+
+def start_keyword_extractors(
+        exit_stack: ExitStack,
+        keyword_extract_config_list: List[KeywordExtractConfig],
+        persistent_keyword_cache: Optional[KeywordCache] = None,
+        spacy_language_cache: Optional[SpacyLanguageCache] = None
+) -> Iterable[KeywordExtractor]:
+    # Worker processes are forked, which is not safe while other threads may hold
+    # locks (e.g. the upload and page prefetch threads of other pipelines).
+    # The keyword extractors of concurrently running pipelines, and their workers,
+    # are therefore started in the main thread before any pipeline is started
+    # (closed when the exit stack is closed).
+    for keyword_extract_config in keyword_extract_config_list:
+        keyword_extractor = exit_stack.enter_context(get_keyword_extractor(
+            keyword_extract_config,
+            persistent_keyword_cache=persistent_keyword_cache,
+            spacy_language_cache=spacy_language_cache
+        ))
+        keyword_extractor.start_workers()
+        yield keyword_extractor
+
+
 def get_data_config() -> dict:
     conf_file_path = os.environ[EXTRACT_KEYWORDS_CONFIG_FILE_PATH_ENV_NAME]
     return get_yaml_file_as_dict(
@@ -72,10 +132,26 @@ def main():
         multi_keyword_extract_conf.state_file_bucket_name,
         multi_keyword_extract_conf.state_file_object_name
     )
+    shard_index, shard_count = get_shard_override()
+    LOGGER.info('shard: %r of %r', shard_index, shard_count)
     state_dict = get_stored_state(
         multi_keyword_extract_conf.state_file_bucket_name,
         multi_keyword_extract_conf.state_file_object_name
     )
+    if shard_count:
+        # the state of the shard is kept in a separate state object
+        # (a shard without its own state continues from the state of the pipeline)
+        state_dict = {
+            **(state_dict or {}),
+            **(get_stored_state(
+                multi_keyword_extract_conf.state_file_bucket_name,
+                get_shard_state_s3_object(
+                    multi_keyword_extract_conf.state_file_object_name,
+                    shard_index,
+                    shard_count
+                )
+            ) or {})
+        }
     LOGGER.info('state_dict: %r', state_dict)
     timestamp_as_string = current_timestamp_as_string()
     LOGGER.info('timestamp_as_string: %r', timestamp_as_string)
@@ -83,25 +159,70 @@ def main():
     LOGGER.info('spacy_language_model_override: %r', spacy_language_model_override)
     max_rows_override = get_max_rows_override()
     LOGGER.info('max_rows_override: %r', max_rows_override)
-    for extract_conf_dict in multi_keyword_extract_conf.keyword_extract_config:
-        keyword_extract_config = KeywordExtractConfig(
+    pipeline_parallelism = get_pipeline_parallelism(multi_keyword_extract_conf)
+    LOGGER.info('pipeline_parallelism: %r', pipeline_parallelism)
+    persistent_keyword_cache = get_persistent_keyword_cache(
+        multi_keyword_extract_conf
+    )
+    # language models, clients and the keyword cache are shared by the pipelines
+    spacy_language_cache = SpacyLanguageCache()
+    extract_conf_dict_list = multi_keyword_extract_conf.keyword_extract_config or []
+    if not extract_conf_dict_list:
+        LOGGER.warning('no keyword extraction pipelines configured')
+    keyword_extract_config_list = [
+        KeywordExtractConfig(
             extract_conf_dict,
             gcp_project=multi_keyword_extract_conf.gcp_project,
             import_timestamp_field_name=(
                 multi_keyword_extract_conf.import_timestamp_field_name
             ),
             spacy_language_model=spacy_language_model_override,
-            limit_count_value=max_rows_override
+            limit_count_value=max_rows_override,
+            shard_index=shard_index,
+            shard_count=shard_count
         )
-        LOGGER.info('keyword_extract_config: %r', keyword_extract_config)
+        for extract_conf_dict in extract_conf_dict_list
+    ]
+
+    def run_pipeline(
+            config_and_keyword_extractor: Tuple[
+                KeywordExtractConfig, Optional[KeywordExtractor]
+            ]):
+        keyword_extract_config, keyword_extractor = config_and_keyword_extractor
+        LOGGER.info('keyword_extract_config: %r', vars(keyword_extract_config))
         etl_keywords(
             keyword_extract_config=keyword_extract_config,
             timestamp_as_string=timestamp_as_string,
             state_s3_bucket=multi_keyword_extract_conf.state_file_bucket_name,
             state_s3_object=multi_keyword_extract_conf.state_file_object_name,
-            data_pipelines_state=state_dict
+            data_pipelines_state=state_dict,
+            persistent_keyword_cache=persistent_keyword_cache,
+            spacy_language_cache=spacy_language_cache,
+            keyword_extractor=keyword_extractor
         )
 
+    try:
+        with ExitStack() as exit_stack:
+            keyword_extractor_list: List[Optional[KeywordExtractor]] = (
+                [None] * len(keyword_extract_config_list)
+            )
+            if pipeline_parallelism > 1:
+                keyword_extractor_list = list(start_keyword_extractors(
+                    exit_stack,
+                    keyword_extract_config_list,
+                    persistent_keyword_cache=persistent_keyword_cache,
+                    spacy_language_cache=spacy_language_cache
+                ))
+            run_concurrently(
+                run_pipeline,
+                zip(keyword_extract_config_list, keyword_extractor_list),
+                max_workers=pipeline_parallelism,
+                name='keyword-pipeline'
+            )
+    finally:
+        if persistent_keyword_cache is not None:
+            persistent_keyword_cache.close()
+
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
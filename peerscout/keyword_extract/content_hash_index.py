@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from botocore.exceptions import ClientError
+
+from peerscout.keyword_extract.keyword_extract_config import KeywordExtractConfig
+from peerscout.keyword_extract.sharding import is_sharded
+from peerscout.keyword_extract.spacy_keyword import KEYWORD_EXTRACTION_RULE_VERSION
+from peerscout.utils.s3_data_service import download_s3_json_object, upload_s3_object
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+CONTENT_HASH_DIGEST_SIZE = 12
+
+# the index is saved after this many loaded batches (and at the end of the run)
+DEFAULT_CONTENT_HASH_INDEX_SAVE_INTERVAL = 20
+
+
+def get_keyword_extraction_version(keyword_extract_config: KeywordExtractConfig) -> str:
+    # changes to the extraction (rules, model or chunking) invalidate the content hashes
+    version_parts = [
+        KEYWORD_EXTRACTION_RULE_VERSION,
+        keyword_extract_config.spacy_language_model or 'simple',
+        keyword_extract_config.spacy_load_profile or '',
+        str(keyword_extract_config.max_text_length or '')
+    ]
+    if keyword_extract_config.reparse_derived_keywords:
+        version_parts.append('reparse-derived-keywords')
+    return ':'.join(version_parts)
+
+
+def get_content_hash(
+        text: Any,
+        existing_keywords: Any,
+        extraction_version: str) -> str:
+    # a compact hash of what the extracted keywords of a row depend on
+    return hashlib.blake2b(
+        json.dumps(
+            [extraction_version, text, existing_keywords],
+            ensure_ascii=False,
+            default=str
+        ).encode('utf-8'),
+        digest_size=CONTENT_HASH_DIGEST_SIZE
+    ).hexdigest()
+
+
+class ContentHashIndex:  # pylint: disable=too-many-instance-attributes
+    # The content hash of each id whose keywords were loaded.
+    # Hashes of new or changed rows are pending until their batch was loaded.
+    def __init__(
+            self,
+            hash_by_id: Optional[Dict[str, str]] = None,
+            bucket: Optional[str] = None,
+            object_name: Optional[str] = None):
+        self.hash_by_id = dict(hash_by_id or {})
+        # where the index is saved to
+        self.bucket = bucket
+        self.object_name = object_name
+        self._pending_hash_by_id: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.changed_count = 0
+        self.unchanged_count = 0
+        # the number of commits since the index was last saved
+        self.unsaved_commit_count = 0
+
+    def iter_changed_records(
+            self,
+            record_list: Iterable[dict],
+            id_field: str,
+            text_field: str,
+            existing_keyword_field: Optional[str],
+            extraction_version: str) -> Iterable[dict]:
+        # rows without an id are always passed on
+        for record in record_list:
+            record_id = record.get(id_field)
+            if record_id is None:
+                yield record
+                continue
+            content_hash = get_content_hash(
+                record.get(text_field),
+                record.get(existing_keyword_field) if existing_keyword_field else None,
+                extraction_version
+            )
+            key = str(record_id)
+            with self._lock:
+                if self.hash_by_id.get(key) == content_hash:
+                    self.unchanged_count += 1
+                    continue
+                self._pending_hash_by_id[key] = content_hash
+                self.changed_count += 1
+            yield record
+
+    def commit(self, record_ids: Iterable[Any]):
+        with self._lock:
+            self.unsaved_commit_count += 1
+            for record_id in record_ids:
+                if record_id is None:
+                    continue
+                content_hash = self._pending_hash_by_id.pop(str(record_id), None)
+                if content_hash is not None:
+                    self.hash_by_id[str(record_id)] = content_hash
+
+    def to_json(self) -> str:
+        with self._lock:
+            self.unsaved_commit_count = 0
+            return json.dumps(self.hash_by_id, separators=(',', ':'), sort_keys=True)
+
+
+def get_content_hash_index_object_name(
+        keyword_extract_config: KeywordExtractConfig) -> Optional[str]:
+    # each shard has its own index (the ids of the shards do not overlap)
+    object_name = keyword_extract_config.content_hash_index_object_name
+    if not object_name or not is_sharded(keyword_extract_config):
+        return object_name
+    return (
+        f'{object_name}.shard-{keyword_extract_config.shard_index}'
+        f'-of-{keyword_extract_config.shard_count}'
+    )
+
+
+def load_content_hash_index(bucket: str, object_name: str) -> ContentHashIndex:
+    try:
+        hash_by_id = download_s3_json_object(bucket, object_name)
+    except ClientError as ex:
+        if ex.response['Error']['Code'] != 'NoSuchKey':
+            raise ex
+        hash_by_id = {}
+    LOGGER.info(
+        'loaded content hash index: s3://%s/%s (%d ids)',
+        bucket, object_name, len(hash_by_id)
+    )
+    return ContentHashIndex(hash_by_id, bucket=bucket, object_name=object_name)
+
+
+def save_content_hash_index(content_hash_index: ContentHashIndex):
+    if not content_hash_index.bucket or not content_hash_index.object_name:
+        raise ValueError('bucket and object name are required to save the content hash index')
+    upload_s3_object(
+        bucket=content_hash_index.bucket,
+        object_key=content_hash_index.object_name,
+        data_object=content_hash_index.to_json()
+    )
+
+
+def get_content_hash_index(
+        keyword_extract_config: KeywordExtractConfig,
+        bucket: Optional[str]) -> Optional[ContentHashIndex]:
+    # the index is stored alongside the state (None if not configured)
+    object_name = get_content_hash_index_object_name(keyword_extract_config)
+    if not object_name:
+        return None
+    if not bucket or not keyword_extract_config.id_field:
+        raise ValueError(
+            'state file bucket and idField are required for the content hash index'
+            f' (pipeline: {keyword_extract_config.pipeline_id})'
+        )
+    if not keyword_extract_config.table_write_append:
+        raise ValueError(
+            'tableWriteAppend is required for the content hash index'
+            f' (pipeline: {keyword_extract_config.pipeline_id})'
+        )
+    return load_content_hash_index(bucket, object_name)
+
+
+def commit_content_hash_index(
+        content_hash_index: ContentHashIndex,
+        record_ids: Iterable[Any],
+        keyword_extract_config: KeywordExtractConfig):
+    # once the rows with the given ids were loaded, the index is only saved every
+    # few batches (saving all of the hashes), a run that fails before saving the index
+    # only results in the loaded rows being extracted again if they are retrieved again
+    content_hash_index.commit(record_ids)
+    save_interval = (
+        keyword_extract_config.content_hash_index_save_interval
+        or DEFAULT_CONTENT_HASH_INDEX_SAVE_INTERVAL
+    )
+    if content_hash_index.unsaved_commit_count >= save_interval:
+        save_content_hash_index(content_hash_index)
+
+
+def save_content_hash_index_if_changed(content_hash_index: ContentHashIndex):
+    # at the end of the run
+    if content_hash_index.unsaved_commit_count:
+        save_content_hash_index(content_hash_index)
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+DEFAULT_IN_MEMORY_KEYWORD_CACHE_SIZE = 100000
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# how often the persistent keyword cache is pruned during a long run
+DEFAULT_KEYWORD_CACHE_PRUNE_INTERVAL_SECONDS = 60 * 60
+
+
+def get_keyword_cache_key(normalized_text: str, model_name: str) -> str:
+    return hashlib.sha256(
+        '\n'.join([model_name, normalized_text]).encode('utf-8')
+    ).hexdigest()
+
+
+class KeywordCache(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[List[str]]:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, keywords: List[str]):
+        pass
+
+    def flush(self):
+        pass
+
+
+class InMemoryKeywordCache(KeywordCache):
+    # least recently used entries are removed once max_size is reached
+    def __init__(self, max_size: int = DEFAULT_IN_MEMORY_KEYWORD_CACHE_SIZE):
+        self.max_size = max_size
+        self._keywords_by_key: 'OrderedDict[str, List[str]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keywords_by_key)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        keywords = self._keywords_by_key.get(key)
+        if keywords is not None:
+            self._keywords_by_key.move_to_end(key)
+        return keywords
+
+    def put(self, key: str, keywords: List[str]):
+        self._keywords_by_key[key] = keywords
+        self._keywords_by_key.move_to_end(key)
+        while len(self._keywords_by_key) > self.max_size:
+            self._keywords_by_key.popitem(last=False)
+
+
+class LayeredKeywordCache(KeywordCache):
+    # e.g. an in-memory cache in front of a persistent cache,
+    # keywords found in a later layer are added to the earlier layers
+    def __init__(self, keyword_caches: List[KeywordCache]):
+        self.keyword_caches = keyword_caches
+
+    def get(self, key: str) -> Optional[List[str]]:
+        for index, keyword_cache in enumerate(self.keyword_caches):
+            keywords = keyword_cache.get(key)
+            if keywords is not None:
+                for previous_keyword_cache in self.keyword_caches[:index]:
+                    previous_keyword_cache.put(key, keywords)
+                return keywords
+        return None
+
+    def put(self, key: str, keywords: List[str]):
+        for keyword_cache in self.keyword_caches:
+            keyword_cache.put(key, keywords)
+
+    def flush(self):
+        for keyword_cache in self.keyword_caches:
+            keyword_cache.flush()
+
+
+class SqliteKeywordCache(KeywordCache):  # pylint: disable=too-many-instance-attributes
+    # Persists the keywords in a SQLite database file, to be shared across
+    # runs and pipelines. Entries of a different rule version are ignored
+    # (see KEYWORD_EXTRACTION_RULE_VERSION).
+    # prune removes entries not used within max_age_days and
+    # the least recently used entries beyond max_entries
+    # (also on flush, if it was last pruned more than prune_interval_seconds ago).
+    def __init__(
+            self,
+            path: str,
+            rule_version: str,
+            max_age_days: Optional[float] = None,
+            max_entries: Optional[int] = None,
+            prune_interval_seconds: float = DEFAULT_KEYWORD_CACHE_PRUNE_INTERVAL_SECONDS):
+        self.path = path
+        self.rule_version = rule_version
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.prune_interval_seconds = prune_interval_seconds
+        self._last_pruned_timestamp = time.time()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS extracted_keywords (
+                key TEXT NOT NULL,
+                rule_version TEXT NOT NULL,
+                keywords_json TEXT NOT NULL,
+                last_used_timestamp REAL NOT NULL,
+                PRIMARY KEY (key, rule_version)
+            )
+            '''
+        )
+        self._connection.execute(
+            '''
+            CREATE INDEX IF NOT EXISTS extracted_keywords_last_used
+            ON extracted_keywords (last_used_timestamp)
+            '''
+        )
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM extracted_keywords'
+            ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            row = self._connection.execute(
+                '''
+                SELECT keywords_json FROM extracted_keywords
+                WHERE key = ? AND rule_version = ?
+                ''',
+                (key, self.rule_version)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                '''
+                UPDATE extracted_keywords SET last_used_timestamp = ?
+                WHERE key = ? AND rule_version = ?
+                ''',
+                (time.time(), key, self.rule_version)
+            )
+            return json.loads(row[0])
+
+    def put(self, key: str, keywords: List[str]):
+        with self._lock:
+            self._connection.execute(
+                '''
+                INSERT OR REPLACE INTO extracted_keywords
+                (key, rule_version, keywords_json, last_used_timestamp)
+                VALUES (?, ?, ?, ?)
+                ''',
+                (key, self.rule_version, json.dumps(keywords), time.time())
+            )
+
+    def flush(self):
+        # also commits the last used timestamps of the retrieved entries
+        with self._lock:
+            self._connection.commit()
+        if (
+            (self.max_age_days is not None or self.max_entries is not None)
+            and time.time() - self._last_pruned_timestamp >= self.prune_interval_seconds
+        ):
+            self.prune()
+
+    def prune(self):
+        with self._lock:
+            self._last_pruned_timestamp = time.time()
+            if self.max_age_days is not None:
+                self._connection.execute(
+                    'DELETE FROM extracted_keywords WHERE last_used_timestamp < ?',
+                    (time.time() - self.max_age_days * SECONDS_PER_DAY,)
+                )
+            if self.max_entries is not None:
+                self._connection.execute(
+                    '''
+                    DELETE FROM extracted_keywords WHERE rowid IN (
+                        SELECT rowid FROM extracted_keywords
+                        ORDER BY last_used_timestamp DESC
+                        LIMIT -1 OFFSET ?
+                    )
+                    ''',
+                    (self.max_entries,)
+                )
+            self._connection.commit()
+        LOGGER.info(
+            'keyword cache %r contains %d entries after pruning',
+            self.path, len(self)
+        )
+
+    def close(self):
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
@@ -1,43 +1,99 @@
 """
 utils for doing the heavy lifting job of extracting keywords
 """
-import os
 import json
 import math
+import multiprocessing
 import re
 import logging
-from tempfile import TemporaryDirectory
-from pathlib import Path
-from typing import Iterable, Iterator, List, Optional, Tuple, TypeVar
+import threading
+from collections import deque
+from contextlib import nullcontext
+from multiprocessing.pool import AsyncResult, Pool
+from tempfile import SpooledTemporaryFile
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple, TypeVar
 import datetime
-from itertools import tee
 from datetime import timezone
 from abc import ABC, abstractmethod
 
 from google.cloud.bigquery import WriteDisposition
 
-import spacy
 from spacy.language import Language
 
-from peerscout.utils.bq_query_service import BqQuery
+from peerscout.utils.background_worker import BackgroundWorker
+from peerscout.utils.batching import (
+    get_approximate_record_byte_size,
+    iter_get_adaptive_batches,
+    iter_get_batches
+)
+from peerscout.utils.bq_load_format import get_load_format
+from peerscout.utils.bq_query_service import (
+    BqQuery,
+    BqQueryResultMode,
+    DEFAULT_PREFETCH_PAGE_COUNT,
+    get_query_result_mode
+)
+from peerscout.utils.json_serializer import get_json_encode
 from peerscout.utils.bq_data_service import (
-    load_file_into_bq,
-    create_or_extend_table_schema
+    BqLoadJobManager,
+    BqTableSchemaCache
 )
 from peerscout.utils.s3_data_service import (
     upload_s3_object
 )
 from peerscout.keyword_extract.keyword_extract_config import (
-    KeywordExtractConfig
+    KeywordExtractConfig,
+    MultiKeywordExtractConfig
 )
 
+from peerscout.keyword_extract.keyword_load import (
+    get_load_compression_for_load_format,
+    get_max_load_jobs_in_flight,
+    start_load_data_to_bq,
+    write_batch_and_get_schema
+)
+from peerscout.keyword_extract.content_hash_index import (
+    commit_content_hash_index,
+    get_content_hash_index,
+    save_content_hash_index_if_changed,
+    get_keyword_extraction_version
+)
+from peerscout.keyword_extract.sharding import (
+    get_initial_state_value,
+    get_sharded_query_template,
+    get_state_key,
+    get_state_s3_object,
+    get_state_to_upload
+)
+from peerscout.keyword_extract.keyword_cache import (
+    KeywordCache,
+    InMemoryKeywordCache,
+    LayeredKeywordCache,
+    SqliteKeywordCache,
+    get_keyword_cache_key
+)
+from peerscout.keyword_extract.text_chunks import (
+    iter_merge_chunk_keywords_with_context,
+    iter_text_chunks_with_context
+)
+from peerscout.keyword_extract.spacy_language import (
+    SpacyLanguageCache,
+    load_spacy_language
+)
 from peerscout.keyword_extract.spacy_keyword import (
+    SpacyExclusion,
     SpacyKeywordDocumentParser,
-    DEFAULT_SPACY_LANGUAGE_MODEL_NAME
+    SpacyLoadProfile,
+    get_spacy_load_profile,
+    normalize_text,
+    DEFAULT_SPACY_LANGUAGE_MODEL_NAME,
+    KEYWORD_EXTRACTION_RULE_VERSION
 )
 
 LOGGER = logging.getLogger(__name__)
 T = TypeVar('T')
+C = TypeVar('C')
+KeywordExtractorT = TypeVar('KeywordExtractorT', bound='KeywordExtractor')
 
 SOURCE_TYPE_FIELD_NAME_IN_DESTINATION_TABLE = (
     "provenance_source_type"
@@ -49,8 +105,20 @@ SOURCE_TYPE_FIELD_NAME_IN_DESTINATION_TABLE = (
 ETL_STATE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S%z"
 DATA_LOAD_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# the state dict (and state file) may be shared by concurrently running pipelines
+_STATE_UPDATE_LOCK = threading.Lock()
+
 DEFAULT_BATCH_SIZE = 2000
 
+# the number of records passed to the keyword extractor at a time
+DEFAULT_EXTRACTION_BATCH_SIZE = 1000
+
+# the number of extracted batches that may be waiting to be uploaded
+DEFAULT_UPLOAD_QUEUE_SIZE = 1
+
+# batches larger than this are buffered on disk rather than in memory
+DEFAULT_LOAD_BUFFER_MAX_MEMORY_SIZE = 64 * 1024 * 1024
+
 
 def to_unique_keywords(
         keywords: List[str],
@@ -66,6 +134,39 @@ class KeywordExtractor(ABC):
             self, text_list: Iterable[str]) -> Iterable[List[str]]:
         pass
 
+    def iter_extract_keywords_with_context(
+            self,
+            text_and_context_list: Iterable[Tuple[str, C]],
+            batch_size: int = DEFAULT_EXTRACTION_BATCH_SIZE
+    ) -> Iterable[Tuple[List[str], C]]:
+        # Similar to language.pipe(..., as_tuples=True), the context of each
+        # text (e.g. its record) is returned with the extracted keywords.
+        # The next batch is only read once the current batch is complete,
+        # i.e. at most batch_size contexts are held by the extractor.
+        for batch in iter_get_batches(iter(text_and_context_list), batch_size):
+            yield from zip(
+                self.iter_extract_keywords([text for text, _ in batch]),
+                [context for _, context in batch]
+            )
+
+    def get_normalized_text(self, text: str) -> str:
+        # texts with the same normalized text result in the same keywords
+        return text
+
+    def start_workers(self):
+        # starts any worker processes (rather than on first use)
+        pass
+
+    def close(self):
+        # releases any resources held for the life of the extractor (e.g. workers)
+        pass
+
+    def __enter__(self: KeywordExtractorT) -> KeywordExtractorT:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 class SimpleKeywordExtractor(KeywordExtractor):
     def iter_extract_keywords(
@@ -76,24 +177,281 @@ class SimpleKeywordExtractor(KeywordExtractor):
         )
 
 
+DEFAULT_WORKER_BATCH_SIZE = 100
+
+# the keyword extractor used within a worker process
+# (inherited from the parent process when the worker is forked)
+_WORKER_KEYWORD_EXTRACTOR: Optional['SpacyKeywordExtractor'] = None
+
+
+def _init_keyword_extractor_worker(
+        keyword_extractor: 'SpacyKeywordExtractor'):
+    global _WORKER_KEYWORD_EXTRACTOR  # pylint: disable=global-statement
+    _WORKER_KEYWORD_EXTRACTOR = keyword_extractor
+
+
+def _extract_keywords_in_worker(text_list: List[str]) -> List[List[str]]:
+    assert _WORKER_KEYWORD_EXTRACTOR is not None
+    return list(
+        _WORKER_KEYWORD_EXTRACTOR.iter_extract_keywords_in_process(text_list)
+    )
+
+
 class SpacyKeywordExtractor(KeywordExtractor):
-    def __init__(self, language: Language):
-        self.parser = SpacyKeywordDocumentParser(language)
+    def __init__(
+            self,
+            language: Language,
+            worker_count: int = 1,
+            worker_batch_size: int = DEFAULT_WORKER_BATCH_SIZE,
+            exclusion: Optional[SpacyExclusion] = None,
+            length_sort_window_size: Optional[int] = None,
+            max_text_length: Optional[int] = None,
+            reparse_derived_keywords: bool = False,
+            language_lock: Optional[threading.Lock] = None):
+        self.parser = SpacyKeywordDocumentParser(
+            language,
+            reparse_derived_keywords=reparse_derived_keywords,
+            exclusion=exclusion,
+            length_sort_window_size=length_sort_window_size
+        )
+        self.worker_count = worker_count
+        self.worker_batch_size = worker_batch_size
+        # texts longer than max_text_length are processed in chunks
+        self.max_text_length = max_text_length
+        # held while parsing in this process, if the language is shared by pipelines
+        self.language_lock = language_lock
+        # the worker processes are started once and used for all of the texts
+        self._pool: Optional[Pool] = None
+
+    def get_pool(self) -> Pool:
+        if self._pool is None:
+            LOGGER.info('starting keyword extraction workers: %d', self.worker_count)
+            self._pool = multiprocessing.get_context('fork').Pool(
+                self.worker_count,
+                initializer=_init_keyword_extractor_worker,
+                initargs=(self,)
+            )
+        return self._pool
 
-    def iter_extract_keywords(
+    def start_workers(self):
+        if self.worker_count > 1:
+            self.get_pool()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def iter_extract_keywords_in_process(
+            self, text_list: Iterable[str]) -> Iterable[List[str]]:
+        return self.parser.iter_get_keyword_str_list(text_list)
+
+    def iter_extract_keywords_with_context_using_workers(
+            self, text_and_context_list: Iterable[Tuple[str, C]]
+    ) -> Iterable[Tuple[List[str], C]]:
+        # parsing and keyword extraction of batches of texts in worker processes,
+        # with a bounded number of batches in flight (in order of the input),
+        # the contexts are held alongside the pending batches
+        pool = self.get_pool()
+        max_pending_batch_count = 2 * self.worker_count
+        pending_results: Deque[Tuple[AsyncResult, List[C]]] = deque()
+        for batch in iter_get_batches(
+                iter(text_and_context_list), self.worker_batch_size):
+            pending_results.append((
+                pool.apply_async(
+                    _extract_keywords_in_worker,
+                    ([text for text, _ in batch],)
+                ),
+                [context for _, context in batch]
+            ))
+            if len(pending_results) >= max_pending_batch_count:
+                pending_result, contexts = pending_results.popleft()
+                yield from zip(pending_result.get(), contexts)
+        while pending_results:
+            pending_result, contexts = pending_results.popleft()
+            yield from zip(pending_result.get(), contexts)
+
+    def iter_extract_keywords_using_workers(
+            self, text_list: Iterable[str]) -> Iterable[List[str]]:
+        return (
+            keywords
+            for keywords, _ in self.iter_extract_keywords_with_context_using_workers(
+                (text, None) for text in text_list
+            )
+        )
+
+    def iter_extract_keywords_in_process_with_lock(
             self, text_list: Iterable[str]) -> Iterable[List[str]]:
+        # the texts are parsed before releasing the lock
+        # (the texts passed in are a batch)
+        if self.language_lock is None:
+            return self.iter_extract_keywords_in_process(text_list)
+        with self.language_lock:
+            return list(self.iter_extract_keywords_in_process(text_list))
+
+    def iter_extract_keywords_without_chunks(
+            self, text_list: Iterable[str]) -> Iterable[List[str]]:
+        if self.worker_count > 1:
+            return self.iter_extract_keywords_using_workers(text_list)
+        return self.iter_extract_keywords_in_process_with_lock(text_list)
+
+    def iter_extract_keywords_using_chunks(
+            self, text_list: Iterable[str], max_text_length: int
+    ) -> Iterable[List[str]]:
+        # the chunks of all of the texts are passed on as one stream
+        # (allowing the chunks of a long text to be parsed in parallel),
+        # the keywords of the chunks are then merged again for each text
+        # (the contexts of the chunks are held until their keywords are returned)
+        chunk_context_queue: Deque[Any] = deque()
+
+        def iter_chunks() -> Iterable[str]:
+            for chunk, chunk_context in iter_text_chunks_with_context(
+                    ((text, None) for text in text_list), max_text_length):
+                chunk_context_queue.append(chunk_context)
+                yield chunk
+
         return (
-            document.get_keyword_str_list()
-            for document in self.parser.iter_parse_text_list(text_list)
+            keywords
+            for keywords, _ in iter_merge_chunk_keywords_with_context(
+                (chunk_keywords, chunk_context_queue.popleft())
+                for chunk_keywords in self.iter_extract_keywords_without_chunks(
+                    iter_chunks()
+                )
+            )
+        )
+
+    def iter_extract_keywords(
+            self, text_list: Iterable[str]) -> Iterable[List[str]]:
+        if self.max_text_length:
+            return self.iter_extract_keywords_using_chunks(
+                text_list, max_text_length=self.max_text_length
+            )
+        return self.iter_extract_keywords_without_chunks(text_list)
+
+    def iter_extract_keywords_with_context(
+            self,
+            text_and_context_list: Iterable[Tuple[str, C]],
+            batch_size: int = DEFAULT_EXTRACTION_BATCH_SIZE
+    ) -> Iterable[Tuple[List[str], C]]:
+        if self.worker_count <= 1:
+            return super().iter_extract_keywords_with_context(
+                text_and_context_list, batch_size=batch_size
+            )
+        # all of the texts are passed to the same worker pool, holding at most
+        # 2 * worker_count * worker_batch_size contexts (or chunks)
+        if not self.max_text_length:
+            return self.iter_extract_keywords_with_context_using_workers(
+                text_and_context_list
+            )
+        return iter_merge_chunk_keywords_with_context(
+            self.iter_extract_keywords_with_context_using_workers(
+                iter_text_chunks_with_context(
+                    text_and_context_list, self.max_text_length
+                )
+            )
+        )
+
+    def get_normalized_text(self, text: str) -> str:
+        return normalize_text(text)
+
+
+DEFAULT_KEYWORD_CACHE_BATCH_SIZE = 1000
+
+
+class CachingKeywordExtractor(KeywordExtractor):
+    # Only passes texts to the wrapped keyword extractor that are not already
+    # in the keyword cache (looked up by the normalized text and model name).
+    # Texts are processed in batches, with one call to the wrapped keyword
+    # extractor per batch (if it contains any text not already cached).
+    def __init__(
+            self,
+            keyword_extractor: KeywordExtractor,
+            keyword_cache: KeywordCache,
+            model_name: str,
+            batch_size: int = DEFAULT_KEYWORD_CACHE_BATCH_SIZE):
+        self.keyword_extractor = keyword_extractor
+        self.keyword_cache = keyword_cache
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def start_workers(self):
+        self.keyword_extractor.start_workers()
+
+    def close(self):
+        self.keyword_extractor.close()
+
+    def get_normalized_text(self, text: str) -> str:
+        return self.keyword_extractor.get_normalized_text(text)
+
+    def get_cache_key(self, text: str) -> str:
+        return get_keyword_cache_key(
+            self.get_normalized_text(text), self.model_name
         )
 
+    def iter_extract_keywords_for_batch(
+            self, text_batch: List[str]) -> Iterable[List[str]]:
+        key_list = [self.get_cache_key(text) for text in text_batch]
+        keywords_by_key: Dict[str, List[str]] = {}
+        missing_text_by_key: Dict[str, str] = {}
+        for key, text in zip(key_list, text_batch):
+            if key in keywords_by_key or key in missing_text_by_key:
+                continue
+            keywords = self.keyword_cache.get(key)
+            if keywords is None:
+                missing_text_by_key[key] = text
+            else:
+                keywords_by_key[key] = keywords
+        self.miss_count += len(missing_text_by_key)
+        self.hit_count += len(text_batch) - len(missing_text_by_key)
+        if missing_text_by_key:
+            for key, keywords in zip(
+                    missing_text_by_key.keys(),
+                    self.keyword_extractor.iter_extract_keywords(
+                        list(missing_text_by_key.values())
+                    )):
+                self.keyword_cache.put(key, keywords)
+                keywords_by_key[key] = keywords
+        # also if all of the texts were cached (e.g. to save when they were last used)
+        self.keyword_cache.flush()
+        return (keywords_by_key[key] for key in key_list)
+
+    def iter_extract_keywords(
+            self, text_list: Iterable[str]) -> Iterable[List[str]]:
+        for text_batch in iter_get_batches(iter(text_list), self.batch_size):
+            yield from self.iter_extract_keywords_for_batch(text_batch)
+
+
+def get_keyword_cache(
+        keyword_extract_config: KeywordExtractConfig,
+        persistent_keyword_cache: Optional[KeywordCache] = None
+) -> Optional[KeywordCache]:
+    keyword_caches: List[KeywordCache] = []
+    if keyword_extract_config.keyword_cache_size:
+        keyword_caches.append(InMemoryKeywordCache(
+            max_size=keyword_extract_config.keyword_cache_size
+        ))
+    if persistent_keyword_cache is not None:
+        keyword_caches.append(persistent_keyword_cache)
+    if not keyword_caches:
+        return None
+    if len(keyword_caches) == 1:
+        return keyword_caches[0]
+    return LayeredKeywordCache(keyword_caches)
+
 
 def get_keyword_extractor(
-        keyword_extract_config: KeywordExtractConfig) -> KeywordExtractor:
+        keyword_extract_config: KeywordExtractConfig,
+        persistent_keyword_cache: Optional[KeywordCache] = None,
+        spacy_language_cache: Optional[SpacyLanguageCache] = None
+) -> KeywordExtractor:
 
     LOGGER.info(
-        'loading keyword extractor, spacy language model: %s',
-        keyword_extract_config.spacy_language_model
+        'loading keyword extractor, spacy language model: %s (workers: %s)',
+        keyword_extract_config.spacy_language_model,
+        keyword_extract_config.worker_count
     )
     extractor: KeywordExtractor = SimpleKeywordExtractor()
     if keyword_extract_config.spacy_language_model:
@@ -101,12 +459,155 @@ def get_keyword_extractor(
             keyword_extract_config.spacy_language_model
             or DEFAULT_SPACY_LANGUAGE_MODEL_NAME
         )
-        extractor = SpacyKeywordExtractor(spacy.load(
-            spacy_language_model_name
-        ))
+        spacy_load_profile = get_spacy_load_profile(
+            keyword_extract_config.spacy_load_profile
+        )
+        language_lock: Optional[threading.Lock] = None
+        if spacy_language_cache is not None:
+            language, language_lock = spacy_language_cache.get_language_and_lock(
+                spacy_language_model_name, spacy_load_profile
+            )
+        else:
+            language = load_spacy_language(spacy_language_model_name, spacy_load_profile)
+        extractor = SpacyKeywordExtractor(
+            language,
+            worker_count=keyword_extract_config.worker_count or 1,
+            exclusion=SpacyExclusion(
+                rule_based_entity_types=spacy_load_profile.rule_based_entity_types
+            ),
+            length_sort_window_size=keyword_extract_config.length_sort_window_size,
+            max_text_length=keyword_extract_config.max_text_length,
+            reparse_derived_keywords=keyword_extract_config.reparse_derived_keywords,
+            language_lock=language_lock
+        )
+        keyword_cache = get_keyword_cache(
+            keyword_extract_config,
+            persistent_keyword_cache=persistent_keyword_cache
+        )
+        if keyword_cache is not None:
+            extractor = CachingKeywordExtractor(
+                extractor,
+                keyword_cache=keyword_cache,
+                model_name=get_keyword_cache_model_name(
+                    spacy_language_model_name,
+                    spacy_load_profile,
+                    max_text_length=keyword_extract_config.max_text_length,
+                    reparse_derived_keywords=keyword_extract_config.reparse_derived_keywords
+                )
+            )
     return extractor
 
 
+def get_persistent_keyword_cache(
+        multi_keyword_extract_config: MultiKeywordExtractConfig
+) -> Optional[SqliteKeywordCache]:
+    if not multi_keyword_extract_config.keyword_cache_path:
+        return None
+    LOGGER.info(
+        'using persistent keyword cache: %r (rule version: %s)',
+        multi_keyword_extract_config.keyword_cache_path,
+        KEYWORD_EXTRACTION_RULE_VERSION
+    )
+    persistent_keyword_cache = SqliteKeywordCache(
+        multi_keyword_extract_config.keyword_cache_path,
+        rule_version=KEYWORD_EXTRACTION_RULE_VERSION,
+        max_age_days=multi_keyword_extract_config.keyword_cache_max_age_days,
+        max_entries=multi_keyword_extract_config.keyword_cache_max_entries
+    )
+    persistent_keyword_cache.prune()
+    return persistent_keyword_cache
+
+
+def get_keyword_cache_model_name(
+        spacy_language_model_name: str,
+        spacy_load_profile: SpacyLoadProfile,
+        max_text_length: Optional[int] = None,
+        reparse_derived_keywords: bool = False) -> str:
+    # chunked texts or reparsed derived keywords may result in different keywords
+    model_name = f'{spacy_language_model_name}:{spacy_load_profile.name}'
+    if max_text_length:
+        model_name = f'{model_name}:max-text-length-{max_text_length}'
+    if reparse_derived_keywords:
+        model_name = f'{model_name}:reparse-derived-keywords'
+    return model_name
+
+
+def log_keyword_extractor_stats(
+        keyword_extract_config: KeywordExtractConfig,
+        keyword_extractor: KeywordExtractor):
+    if isinstance(keyword_extractor, CachingKeywordExtractor):
+        LOGGER.info(
+            'keyword cache of pipeline %s: %d hits, %d misses',
+            keyword_extract_config.pipeline_id,
+            keyword_extractor.hit_count,
+            keyword_extractor.miss_count
+        )
+
+
+def get_max_records_in_memory(keyword_extract_config: KeywordExtractConfig) -> int:
+    # The approximate maximum number of records held by a pipeline at a time
+    # (its peak memory use is roughly proportional to it):
+    # - the records passed to the keyword extractor (an extraction batch,
+    #   or the batches in flight when using workers without a keyword cache)
+    # - the batch being collected, the batches waiting to be uploaded
+    #   and the batch being uploaded (batchSize being the maximum batch size)
+    worker_count = keyword_extract_config.worker_count or 1
+    extraction_record_count = max(
+        keyword_extract_config.extraction_batch_size or DEFAULT_EXTRACTION_BATCH_SIZE,
+        2 * worker_count * DEFAULT_WORKER_BATCH_SIZE if worker_count > 1 else 0
+    )
+    upload_queue_size = (
+        keyword_extract_config.upload_queue_size
+        if keyword_extract_config.upload_queue_size is not None
+        else DEFAULT_UPLOAD_QUEUE_SIZE
+    )
+    upload_batch_count = upload_queue_size + 2 if upload_queue_size > 0 else 1
+    batch_size = keyword_extract_config.batch_size or DEFAULT_BATCH_SIZE
+    return extraction_record_count + upload_batch_count * batch_size
+
+
+def is_adaptive_batch_size(keyword_extract_config: KeywordExtractConfig) -> bool:
+    return bool(
+        keyword_extract_config.batch_target_bytes
+        or keyword_extract_config.batch_target_seconds
+    )
+
+
+def log_total_rows_and_batch_size(
+        keyword_extract_config: KeywordExtractConfig,
+        total_rows: int):
+    batch_size = keyword_extract_config.batch_size or DEFAULT_BATCH_SIZE
+    if is_adaptive_batch_size(keyword_extract_config):
+        LOGGER.info(
+            'total_rows: %d (adaptive batch size: %d-%d rows,'
+            ' target bytes: %s, target seconds: %s)',
+            total_rows, keyword_extract_config.batch_min_size or 1, batch_size,
+            keyword_extract_config.batch_target_bytes,
+            keyword_extract_config.batch_target_seconds
+        )
+    else:
+        LOGGER.info(
+            'total_rows: %d (batch size: %d, total batch count: %d)',
+            total_rows, batch_size, get_batch_count(total_rows, batch_size)
+        )
+
+
+def iter_get_record_batches(
+        records: Iterable[dict],
+        keyword_extract_config: KeywordExtractConfig) -> Iterable[List[dict]]:
+    batch_size = keyword_extract_config.batch_size or DEFAULT_BATCH_SIZE
+    if is_adaptive_batch_size(keyword_extract_config):
+        return iter_get_adaptive_batches(
+            records,
+            max_size=batch_size,
+            min_size=keyword_extract_config.batch_min_size or 1,
+            target_bytes=keyword_extract_config.batch_target_bytes,
+            target_seconds=keyword_extract_config.batch_target_seconds,
+            get_item_byte_size=get_approximate_record_byte_size
+        )
+    return iter_get_batches(iter(records), batch_size)
+
+
 def get_batch_count(total_count: int, batch_size: int) -> int:
     return math.floor((total_count + batch_size - 1) / batch_size)
 
@@ -118,19 +619,53 @@ def etl_keywords(
         data_pipelines_state: dict,
         state_s3_bucket: Optional[str] = None,
         state_s3_object: Optional[str] = None,
+        persistent_keyword_cache: Optional[KeywordCache] = None,
+        spacy_language_cache: Optional[SpacyLanguageCache] = None,
+        keyword_extractor: Optional[KeywordExtractor] = None
 ):
 
     LOGGER.info(
         'processing keyword extraction pipeline: %s (to %s.%s)',
-        keyword_extract_config.pipeline_id,
+        get_state_key(keyword_extract_config),
         keyword_extract_config.destination_dataset,
         keyword_extract_config.destination_table
     )
-    latest_state_value = data_pipelines_state.get(
-        keyword_extract_config.pipeline_id,
-        keyword_extract_config.default_start_timestamp
+    # a passed in keyword extractor is closed by the caller
+    # (e.g. started before running pipelines concurrently)
+    keyword_extractor_context = (
+        nullcontext(keyword_extractor) if keyword_extractor is not None
+        else get_keyword_extractor(
+            keyword_extract_config,
+            persistent_keyword_cache=persistent_keyword_cache,
+            spacy_language_cache=spacy_language_cache
+        )
+    )
+    with keyword_extractor_context as pipeline_keyword_extractor:
+        # the worker processes are forked before the pipeline starts other threads
+        # (e.g. to upload batches or retrieve pages), which may hold locks
+        # that would never be released in the forked process
+        pipeline_keyword_extractor.start_workers()
+        etl_keywords_using_keyword_extractor(
+            keyword_extract_config=keyword_extract_config,
+            keyword_extractor=pipeline_keyword_extractor,
+            timestamp_as_string=timestamp_as_string,
+            data_pipelines_state=data_pipelines_state,
+            state_s3_bucket=state_s3_bucket,
+            state_s3_object=state_s3_object
+        )
+
+
+def etl_keywords_using_keyword_extractor(
+        keyword_extract_config: KeywordExtractConfig,
+        keyword_extractor: KeywordExtractor,
+        timestamp_as_string: str,
+        data_pipelines_state: dict,
+        state_s3_bucket: Optional[str] = None,
+        state_s3_object: Optional[str] = None
+):
+    latest_state_value = get_initial_state_value(
+        keyword_extract_config, data_pipelines_state
     )
-    keyword_extractor = get_keyword_extractor(keyword_extract_config)
     bq_query_processing = BqQuery(
         project_name=keyword_extract_config.gcp_project)
     LOGGER.info(
@@ -147,19 +682,28 @@ def etl_keywords(
         bq_query_processing=bq_query_processing,
         query_template=" ".join(
             [
-                str(keyword_extract_config.query_template),
+                get_sharded_query_template(
+                    str(keyword_extract_config.query_template),
+                    keyword_extract_config
+                ),
                 keyword_extract_config.limit_return_count
             ]
         ),
         gcp_project=keyword_extract_config.gcp_project,
         source_dataset=keyword_extract_config.source_dataset,
-        latest_state_value=latest_state_value
+        latest_state_value=latest_state_value,
+        result_mode=get_query_result_mode(keyword_extract_config.query_result_mode),
+        page_size=keyword_extract_config.query_page_size,
+        prefetch_page_count=(
+            keyword_extract_config.query_prefetch_page_count
+            if keyword_extract_config.query_prefetch_page_count is not None
+            else DEFAULT_PREFETCH_PAGE_COUNT
+        )
     )
-    batch_size = keyword_extract_config.batch_size or DEFAULT_BATCH_SIZE
-    total_batch_count = get_batch_count(total_rows, batch_size)
+    log_total_rows_and_batch_size(keyword_extract_config, total_rows)
     LOGGER.info(
-        'total_rows: %d (batch size: %d, total batch count: %d)',
-        total_rows, batch_size, total_batch_count
+        'max records held in memory: ~%d',
+        get_max_records_in_memory(keyword_extract_config)
     )
 
     data_with_timestamp = add_timestamp(
@@ -172,11 +716,25 @@ def etl_keywords(
         keyword_extract_config.provenance_fieldname_in_source_data,
         keyword_extract_config.provenance_value_from_config,
     )
+    content_hash_index = get_content_hash_index(keyword_extract_config, state_s3_bucket)
+    data_to_extract: Iterable[dict] = data_with_provenance
+    if content_hash_index is not None:
+        data_to_extract = content_hash_index.iter_changed_records(
+            data_with_provenance,
+            id_field=str(keyword_extract_config.id_field),
+            text_field=keyword_extract_config.text_field,
+            existing_keyword_field=keyword_extract_config.existing_keywords_field,
+            extraction_version=get_keyword_extraction_version(keyword_extract_config)
+        )
     data_with_extracted_keywords = add_extracted_keywords(
-        record_list=data_with_provenance,
+        record_list=data_to_extract,
         text_field=keyword_extract_config.text_field,
         existing_keyword_field=keyword_extract_config.existing_keywords_field,
-        keyword_extractor=keyword_extractor
+        keyword_extractor=keyword_extractor,
+        extraction_batch_size=(
+            keyword_extract_config.extraction_batch_size
+            or DEFAULT_EXTRACTION_BATCH_SIZE
+        )
     )
 
     write_disposition = (
@@ -184,43 +742,118 @@ def etl_keywords(
         if keyword_extract_config.table_write_append
         else WriteDisposition.WRITE_TRUNCATE
     )
-    data_with_extracted_keywords_batches = iter_get_batches(
-        data_with_extracted_keywords, batch_size
+    data_with_extracted_keywords_batches = iter_get_record_batches(
+        data_with_extracted_keywords, keyword_extract_config
+    )
+
+    # the destination table schema is only looked up once per run
+    schema_cache = BqTableSchemaCache()
+    load_job_manager = BqLoadJobManager(
+        max_in_flight_count=get_max_load_jobs_in_flight(
+            keyword_extract_config, write_disposition
+        )
+    )
+
+    load_buffer_max_memory_size = (
+        keyword_extract_config.load_buffer_max_memory_size
+        or DEFAULT_LOAD_BUFFER_MAX_MEMORY_SIZE
+    )
+    load_format = get_load_format(keyword_extract_config.load_format)
+    load_compression = get_load_compression_for_load_format(
+        keyword_extract_config, load_format
     )
-    progress_monitor = 1
-    for data_batch in data_with_extracted_keywords_batches:
+    json_encode = get_json_encode(keyword_extract_config.json_encoder)
+
+    uploaded_row_count = 0
+
+    def upload_batch_and_update_state(batch_number_and_data: Tuple[int, List[dict]]):
+        nonlocal uploaded_row_count
+        batch_number, data_batch = batch_number_and_data
+        uploaded_row_count += len(data_batch)
         LOGGER.info(
-            "uploading batch %d of %d (%.1f%%, batch size: %s)",
-            progress_monitor,
-            total_batch_count,
-            (100.0 * progress_monitor / total_batch_count),
-            batch_size
+            "uploading batch %d (batch size: %d, %d of %d rows, %.1f%%)",
+            batch_number,
+            len(data_batch),
+            uploaded_row_count,
+            total_rows,
+            (100.0 * uploaded_row_count / max(1, total_rows))
         )
-        progress_monitor += 1
         latest_timestamp = get_latest_state(
             data_batch,
             keyword_extract_config.state_timestamp_field
         )
-        with TemporaryDirectory() as tempdir:
-            temp_processed_jsonl_path = os.fspath(
-                Path(tempdir, "downloaded_rows_data")
-            )
-            write_to_jsonl_file(
+        record_ids = (
+            [record.get(keyword_extract_config.id_field) for record in data_batch]
+            if content_hash_index is not None else []
+        )
+        # the batch is only kept in memory, unless it exceeds the memory limit
+        # ("r+b" as the BigQuery client rejects uploads from files in a write mode)
+        with SpooledTemporaryFile(
+                max_size=load_buffer_max_memory_size, mode="r+b") as load_buffer:
+            schema = write_batch_and_get_schema(
                 data_batch,
-                temp_processed_jsonl_path,
-                keyword_extract_config
+                load_buffer,
+                keyword_extract_config,
+                load_format,
+                json_encode=json_encode,
+                load_compression=load_compression
             )
-            load_data_to_bq(
+            # the next load job is only started once it is within the in-flight limit
+            load_job_manager.wait_for_capacity()
+            load_job = start_load_data_to_bq(
                 keyword_extract_config,
-                temp_processed_jsonl_path,
-                write_disposition
+                load_buffer,
+                write_disposition,
+                schema=schema,
+                schema_cache=schema_cache,
+                load_format=load_format
             )
-        update_state(
-            latest_timestamp,
-            keyword_extract_config,
-            data_pipelines_state,
-            state_s3_bucket,
-            state_s3_object
+
+        def on_load_success():
+            if content_hash_index is not None:
+                # the hashes of the loaded rows are committed before the state is saved
+                commit_content_hash_index(
+                    content_hash_index, record_ids, keyword_extract_config
+                )
+            update_state(
+                latest_timestamp,
+                keyword_extract_config,
+                data_pipelines_state,
+                state_s3_bucket,
+                state_s3_object
+            )
+
+        # the state is only updated once this and all previous load jobs succeeded
+        load_job_manager.submit(load_job, on_success=on_load_success)
+
+    upload_queue_size = (
+        keyword_extract_config.upload_queue_size
+        if keyword_extract_config.upload_queue_size is not None
+        else DEFAULT_UPLOAD_QUEUE_SIZE
+    )
+    if upload_queue_size > 0:
+        # extraction of the next batches continues while a batch is uploaded,
+        # batches are uploaded (and the state updated) in order
+        with BackgroundWorker(
+                upload_batch_and_update_state,
+                max_queue_size=upload_queue_size,
+                name='keyword-upload') as upload_worker:
+            for batch_number_and_data in enumerate(
+                    data_with_extracted_keywords_batches, start=1):
+                upload_worker.submit(batch_number_and_data)
+    else:
+        for batch_number_and_data in enumerate(
+                data_with_extracted_keywords_batches, start=1):
+            upload_batch_and_update_state(batch_number_and_data)
+    load_job_manager.wait_for_all()
+    log_keyword_extractor_stats(keyword_extract_config, keyword_extractor)
+    if content_hash_index is not None:
+        save_content_hash_index_if_changed(content_hash_index)
+        LOGGER.info(
+            'content hash index of pipeline %s: %d changed rows, %d unchanged rows skipped',
+            keyword_extract_config.pipeline_id,
+            content_hash_index.changed_count,
+            content_hash_index.unchanged_count
         )
 
 
@@ -235,17 +868,22 @@ def update_state(
             keyword_extract_config.state_timestamp_field
             and latest_timestamp
     ):
-        state_dict[keyword_extract_config.pipeline_id] = (
-            latest_timestamp.strftime(ETL_STATE_TIMESTAMP_FORMAT)
-        )
-        state_as_string = json.dumps(
-            state_dict, ensure_ascii=False, indent=4
-        )
-        upload_s3_object(
-            bucket=state_s3_bucket,
-            object_key=state_s3_object,
-            data_object=state_as_string,
-        )
+        # the state of concurrently running pipelines is uploaded one at a time,
+        # the last upload always contains the state of all of the pipelines
+        with _STATE_UPDATE_LOCK:
+            state_dict[get_state_key(keyword_extract_config)] = (
+                latest_timestamp.strftime(ETL_STATE_TIMESTAMP_FORMAT)
+            )
+            state_as_string = json.dumps(
+                get_state_to_upload(state_dict, keyword_extract_config),
+                ensure_ascii=False,
+                indent=4
+            )
+            upload_s3_object(
+                bucket=state_s3_bucket,
+                object_key=get_state_s3_object(state_s3_object, keyword_extract_config),
+                data_object=state_as_string,
+            )
 
 
 def current_timestamp_as_string():
@@ -258,14 +896,20 @@ def download_data_and_get_total_rows(
         query_template,
         gcp_project,
         source_dataset,
-        latest_state_value
+        latest_state_value,
+        result_mode: str = BqQueryResultMode.ROWS,
+        page_size: Optional[int] = None,
+        prefetch_page_count: int = DEFAULT_PREFETCH_PAGE_COUNT
 ) -> Tuple[Iterable[dict], int]:
 
     result = bq_query_processing.simple_query(
         query_template=query_template,
         gcp_project=gcp_project,
         dataset=source_dataset,
-        latest_state_value=latest_state_value
+        latest_state_value=latest_state_value,
+        result_mode=result_mode,
+        page_size=page_size,
+        prefetch_page_count=prefetch_page_count
     )
     return result, result.total_rows
 
@@ -306,55 +950,6 @@ def get_latest_state(
     return latest_timestamp
 
 
-def write_to_jsonl_file(
-        data_with_extracted_keywords,
-        full_temp_file_location,
-        keyword_extract_config
-):
-    with open(full_temp_file_location, "w", encoding="UTF-8") as write_file:
-        for record in data_with_extracted_keywords:
-            record.pop(keyword_extract_config.existing_keywords_field, None)
-            record.pop(keyword_extract_config.text_field, None)
-            record.pop(keyword_extract_config.state_timestamp_field, None)
-            record = {key: value for key, value in record.items() if value}
-            write_file.write(json.dumps(record, ensure_ascii=False))
-            write_file.write("\n")
-
-
-def iter_get_batches(iterator: Iterator[T], size: int) -> Iterable[Iterable[T]]:
-    while True:
-        chunk = []
-        for _ in range(size):
-            try:
-                chunk.append(next(iterator))
-            except StopIteration:
-                if chunk:
-                    yield chunk
-                return
-        yield chunk
-
-
-def load_data_to_bq(
-        keyword_extract_config,
-        temp_processed_jsonl_path,
-        write_disposition
-):
-    create_or_extend_table_schema(
-        keyword_extract_config.gcp_project,
-        keyword_extract_config.destination_dataset,
-        keyword_extract_config.destination_table,
-        temp_processed_jsonl_path
-    )
-    load_file_into_bq(
-        filename=temp_processed_jsonl_path,
-        table_name=keyword_extract_config.destination_table,
-        auto_detect_schema=False,
-        dataset_name=keyword_extract_config.destination_dataset,
-        write_mode=write_disposition,
-        project_name=keyword_extract_config.gcp_project
-    )
-
-
 def parse_keyword_list(keywords_str: str, separator: str = ","):
     if not keywords_str or not keywords_str.strip():
         return []
@@ -371,14 +966,16 @@ def add_extracted_keywords(
         existing_keyword_field: Optional[str] = None,
         existing_keyword_split_pattern: str = ",",
         extracted_keyword_field_name: str = "extracted_keywords",
+        extraction_batch_size: int = DEFAULT_EXTRACTION_BATCH_SIZE
 ):
-    text_record_list, record_list = tee(record_list, 2)
-    text_list = (
-        record.get(text_field, "")
-        for record in text_record_list
+    # the records are passed through the keyword extractor with their texts,
+    # which holds a bounded number of them (see iter_extract_keywords_with_context)
+    text_and_record_list = (
+        (record.get(text_field, ""), record)
+        for record in record_list
     )
-    text_keywords_list = keyword_extractor.iter_extract_keywords(text_list)
-    for record, keywords in zip(record_list, text_keywords_list):
+    for keywords, record in keyword_extractor.iter_extract_keywords_with_context(
+            text_and_record_list, batch_size=extraction_batch_size):
         additional_keywords = parse_keyword_list(
             record.get(existing_keyword_field, ""),
             separator=existing_keyword_split_pattern
@@ -32,6 +32,16 @@ class MultiKeywordExtractConfig:
         self.keyword_extract_config = (
             updated_config.get("keywordExtractionPipelines")
         )
+        self.keyword_cache_path = updated_config.get(
+            "keywordCache", {}).get("path")
+        self.keyword_cache_max_age_days = updated_config.get(
+            "keywordCache", {}).get("maxAgeDays")
+        self.keyword_cache_max_entries = updated_config.get(
+            "keywordCache", {}).get("maxEntries")
+        # the number of pipelines run concurrently (one at a time by default)
+        self.pipeline_parallelism = updated_config.get(
+            "pipelineParallelism"
+        )
 
 
 class KeywordExtractConfig:
@@ -43,9 +53,14 @@ class KeywordExtractConfig:
             query_template: Optional[str] = None,
             limit_count_value: Optional[int] = None,
             spacy_language_model: Optional[str] = None,
-            import_timestamp_field_name: Optional[str] = None
+            import_timestamp_field_name: Optional[str] = None,
+            shard_index: Optional[int] = None,
+            shard_count: Optional[int] = None
     ):
         self.pipeline_id = config["pipelineID"]
+        # the rows of the pipeline may be split across shards (by the id field)
+        self.shard_index = shard_index
+        self.shard_count = shard_count
         self.default_start_timestamp = config.get(
             "defaultStartTimestamp"
         )
@@ -86,6 +101,9 @@ class KeywordExtractConfig:
         self.state_timestamp_field = config.get("stateTimestampField")
         self.existing_keywords_field = config.get("existingKeywordsField")
         self.id_field = config.get("idField")
+        # rows with unchanged content (by id) are skipped if configured
+        self.content_hash_index_object_name = config.get("contentHashIndexObjectName")
+        self.content_hash_index_save_interval = config.get("contentHashIndexSaveInterval")
         self.data_load_timestamp_field = (
             import_timestamp_field_name or
             config.get(
@@ -101,10 +119,34 @@ class KeywordExtractConfig:
         )
         self.limit_return_count = " ".join(["Limit ", str(limit_count)]) \
             if limit_count else ""
+        self.query_result_mode = config.get("queryResultMode")
+        self.query_page_size = config.get("queryPageSize")
+        self.query_prefetch_page_count = config.get("queryPrefetchPageCount")
         self.batch_size = config.get("batchSize")
+        self.extraction_batch_size = config.get("extractionBatchSize")
+        # adaptive batch size (batchSize being the maximum number of rows)
+        self.batch_min_size = config.get("batchMinSize")
+        self.batch_target_bytes = config.get("batchTargetBytes")
+        self.batch_target_seconds = config.get("batchTargetSeconds")
+        self.upload_queue_size = config.get("uploadQueueSize")
+        self.max_load_jobs_in_flight = config.get("maxLoadJobsInFlight")
+        self.load_buffer_max_memory_size = config.get("loadBufferMaxMemorySize")
+        self.load_format = config.get("loadFormat")
+        self.load_compression = config.get("loadCompression")
+        self.json_encoder = config.get("jsonEncoder")
+        self.worker_count = config.get("workerCount")
+        self.length_sort_window_size = config.get("lengthSortWindowSize")
+        self.max_text_length = config.get("maxTextLength")
         self.spacy_language_model = (
             spacy_language_model or config.get("spacyLanguageModel")
         )
+        self.spacy_load_profile = config.get("spacyLoadProfile")
+        # parse the individual and shorter keywords on their own,
+        # rather than using the annotations within the source text
+        self.reparse_derived_keywords = (
+            str(config.get("reparseDerivedKeywords", "false")).lower() == "true"
+        )
+        self.keyword_cache_size = config.get("keywordCacheSize")
 
 
 class ExternalTriggerConfig:
@@ -0,0 +1,141 @@
+import logging
+from typing import IO, Iterable, List, Optional
+
+from google.cloud.bigquery import LoadJob, WriteDisposition
+
+from peerscout.keyword_extract.keyword_extract_config import KeywordExtractConfig
+from peerscout.utils.bq_data_service import (
+    BqTableSchemaCache,
+    create_or_extend_table_schema,
+    generate_schema_from_records,
+    start_load_file_object_into_bq
+)
+from peerscout.utils.bq_load_format import (
+    LoadFormat,
+    get_source_format,
+    write_columnar_records
+)
+from peerscout.utils.json_serializer import (
+    JsonEncode,
+    JsonLinesWriter,
+    LoadCompression,
+    get_load_compression
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# the number of BigQuery load jobs that may be running at the same time
+DEFAULT_MAX_LOAD_JOBS_IN_FLIGHT = 1
+
+
+def get_load_compression_for_load_format(
+        keyword_extract_config: KeywordExtractConfig,
+        load_format: str) -> str:
+    load_compression = get_load_compression(keyword_extract_config.load_compression)
+    if load_compression != LoadCompression.NONE and load_format != LoadFormat.JSON:
+        raise ValueError(
+            f'load compression {load_compression} is only supported'
+            f' for the {LoadFormat.JSON} load format (not {load_format})'
+        )
+    return load_compression
+
+
+def iter_get_output_records(
+        data_with_extracted_keywords,
+        keyword_extract_config
+) -> Iterable[dict]:
+    for record in data_with_extracted_keywords:
+        record.pop(keyword_extract_config.existing_keywords_field, None)
+        record.pop(keyword_extract_config.text_field, None)
+        record.pop(keyword_extract_config.state_timestamp_field, None)
+        # empty fields are removed in place, rather than copying the record
+        for key in [key for key, value in record.items() if not value]:
+            del record[key]
+        yield record
+
+
+def iter_write_jsonl_records(
+        data_with_extracted_keywords,
+        write_file: IO[bytes],
+        keyword_extract_config,
+        json_encode: Optional[JsonEncode] = None,
+        load_compression: str = LoadCompression.NONE
+) -> Iterable[dict]:
+    # yields the records as written (e.g. to generate the schema)
+    with JsonLinesWriter(
+            write_file,
+            encode=json_encode,
+            compression=load_compression) as jsonl_writer:
+        for record in iter_get_output_records(
+                data_with_extracted_keywords, keyword_extract_config):
+            jsonl_writer.write(record)
+            yield record
+
+
+def write_batch_and_get_schema(
+        data_batch: List[dict],
+        write_file: IO[bytes],
+        keyword_extract_config,
+        load_format: str = LoadFormat.JSON,
+        json_encode: Optional[JsonEncode] = None,
+        load_compression: str = LoadCompression.NONE
+) -> list:
+    if load_format == LoadFormat.JSON:
+        # the schema is generated while writing the records
+        return generate_schema_from_records(iter_write_jsonl_records(
+            data_batch,
+            write_file,
+            keyword_extract_config,
+            json_encode=json_encode,
+            load_compression=load_compression
+        ))
+    # the columnar formats require the schema before writing the records
+    output_records = list(iter_get_output_records(data_batch, keyword_extract_config))
+    schema = generate_schema_from_records(output_records)
+    write_columnar_records(output_records, write_file, load_format, schema)
+    return schema
+
+
+def get_max_load_jobs_in_flight(
+        keyword_extract_config: KeywordExtractConfig,
+        write_disposition: str) -> int:
+    if write_disposition == WriteDisposition.WRITE_TRUNCATE:
+        # the order in which the jobs complete matters when truncating the table
+        return 1
+    return (
+        keyword_extract_config.max_load_jobs_in_flight
+        or DEFAULT_MAX_LOAD_JOBS_IN_FLIGHT
+    )
+
+
+def start_load_data_to_bq(
+        keyword_extract_config,
+        load_buffer: IO[bytes],
+        write_disposition,
+        schema: list,
+        schema_cache: Optional[BqTableSchemaCache] = None,
+        load_format: str = LoadFormat.JSON
+) -> Optional[LoadJob]:
+    if not load_buffer.tell():
+        LOGGER.info("No data to load.")
+        return None
+    create_or_extend_table_schema(
+        keyword_extract_config.gcp_project,
+        keyword_extract_config.destination_dataset,
+        keyword_extract_config.destination_table,
+        None,
+        schema_cache=schema_cache,
+        schema=schema
+    )
+    load_buffer.seek(0)
+    return start_load_file_object_into_bq(
+        load_buffer,
+        source_format=get_source_format(load_format),
+        table_name=keyword_extract_config.destination_table,
+        auto_detect_schema=False,
+        dataset_name=keyword_extract_config.destination_dataset,
+        write_mode=write_disposition,
+        project_name=keyword_extract_config.gcp_project
+    )
@@ -0,0 +1,111 @@
+from typing import Optional
+
+from peerscout.keyword_extract.keyword_extract_config import KeywordExtractConfig
+
+
+def is_sharded(keyword_extract_config: KeywordExtractConfig) -> bool:
+    return bool(keyword_extract_config.shard_count)
+
+
+def validate_shard(shard_index: Optional[int], shard_count: Optional[int]):
+    if shard_index is None and shard_count is None:
+        return
+    if shard_index is None or not shard_count:
+        raise ValueError(
+            f'shard index and shard count are required together'
+            f' (shard index: {shard_index}, shard count: {shard_count})'
+        )
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(
+            f'shard index must be between 0 and {shard_count - 1}: {shard_index}'
+        )
+
+
+def get_shard_name(shard_index: Optional[int], shard_count: Optional[int]) -> str:
+    return f'shard-{shard_index}-of-{shard_count}'
+
+
+def get_state_key(keyword_extract_config: KeywordExtractConfig) -> str:
+    # each shard keeps its own state
+    if not is_sharded(keyword_extract_config):
+        return keyword_extract_config.pipeline_id
+    return '/'.join([
+        keyword_extract_config.pipeline_id,
+        get_shard_name(keyword_extract_config.shard_index, keyword_extract_config.shard_count)
+    ])
+
+
+def get_shard_state_s3_object(
+        state_s3_object: str,
+        shard_index: Optional[int],
+        shard_count: Optional[int]) -> str:
+    # Each shard uploads its state to its own state object, which no other shard
+    # updates (the shards of a pipeline usually run at the same time,
+    # e.g. in separate pods). The state of the pipeline is only read.
+    if not shard_count:
+        return state_s3_object
+    return '.'.join([state_s3_object, get_shard_name(shard_index, shard_count)])
+
+
+def get_state_s3_object(
+        state_s3_object: str,
+        keyword_extract_config: KeywordExtractConfig) -> str:
+    return get_shard_state_s3_object(
+        state_s3_object,
+        keyword_extract_config.shard_index,
+        keyword_extract_config.shard_count
+    )
+
+
+def get_state_to_upload(
+        state_dict: dict,
+        keyword_extract_config: KeywordExtractConfig) -> dict:
+    # the state object of a shard only contains the state of the shard
+    # (of each pipeline)
+    if not is_sharded(keyword_extract_config):
+        return state_dict
+    shard_key_suffix = '/' + get_shard_name(
+        keyword_extract_config.shard_index, keyword_extract_config.shard_count
+    )
+    return {
+        key: value
+        for key, value in state_dict.items()
+        if key.endswith(shard_key_suffix)
+    }
+
+
+def get_initial_state_value(
+        keyword_extract_config: KeywordExtractConfig,
+        data_pipelines_state: dict) -> Optional[str]:
+    # a shard without its own state continues from the state of the pipeline
+    return data_pipelines_state.get(
+        get_state_key(keyword_extract_config),
+        data_pipelines_state.get(
+            keyword_extract_config.pipeline_id,
+            keyword_extract_config.default_start_timestamp
+        )
+    )
+
+
+def get_sharded_query_template(
+        query_template: str,
+        keyword_extract_config: KeywordExtractConfig) -> str:
+    # only selects the rows of the shard, using a stable hash of the id field
+    if not is_sharded(keyword_extract_config):
+        return query_template
+    if not keyword_extract_config.id_field:
+        raise ValueError(
+            f'idField is required for sharding (pipeline: {keyword_extract_config.pipeline_id})'
+        )
+    shard_filter = (
+        f'ABS(MOD(FARM_FINGERPRINT(CAST({keyword_extract_config.id_field} AS STRING)),'
+        f' {keyword_extract_config.shard_count})) = {keyword_extract_config.shard_index}'
+    )
+    sharded_query_lines = ['SELECT * FROM (', query_template, ')', f'WHERE {shard_filter}']
+    if keyword_extract_config.state_timestamp_field:
+        # the order of the subquery is not kept, the state assumes ascending timestamps
+        # (also before any limit is applied)
+        sharded_query_lines.append(
+            f'ORDER BY {keyword_extract_config.state_timestamp_field} ASC'
+        )
+    return '\n'.join(sharded_query_lines)
@@ -1,6 +1,14 @@
 import re
 import logging
-from typing import Iterable, List, Optional, Set
+from collections import OrderedDict, deque
+from functools import cached_property
+from itertools import islice
+from typing import (
+    Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union, cast
+)
+
+import numpy
+from thinc.types import Ints2d
 
 from spacy.language import Language
 from spacy.tokens import Doc, Span, Token
@@ -26,8 +34,18 @@ from spacy.symbols import (  # pylint: disable=no-name-in-module
     PERCENT
 )
 
+# token attribute ids (e.g. for Doc.from_array)
+from spacy.attrs import (  # pylint: disable=no-name-in-module
+    DEP,
+    ENT_IOB,
+    ENT_TYPE,
+    HEAD,
+    LEMMA,
+    POS as POS_ATTR,
+    TAG
+)
 
-from peerscout.utils.html import strip_tags
+from peerscout.utils.html import strip_tags, strip_tags_list
 
 
 LOGGER = logging.getLogger(__name__)
@@ -35,6 +53,103 @@ LOGGER = logging.getLogger(__name__)
 
 DEFAULT_SPACY_LANGUAGE_MODEL_NAME = "en_core_web_lg"
 
+# increase when changing the keyword rules in this module,
+# to invalidate previously persisted keywords (see SqliteKeywordCache)
+KEYWORD_EXTRACTION_RULE_VERSION = "1"
+
+
+class SpacyLoadProfile:
+    # Which pipeline components of the language model to load, either all but
+    # the excluded components, or only the included components (if specified).
+    # Excluded components are not loaded at all (unlike disabled components).
+    # The keyword rules read the following token attributes:
+    # - pos, tag, lemma: tagger
+    # - dependency children, conjuncts (and noun chunks): parser
+    # - ent_type (exclusion of e.g. numbers and names): ner
+    # - is_stop: lexical attribute (always available)
+    def __init__(
+            self,
+            name: str,
+            keyword_attributes: List[str],
+            excluded_components: Optional[List[str]] = None,
+            included_components: Optional[List[str]] = None,
+            rule_based_entity_types: bool = False):
+        self.name = name
+        self.excluded_components = excluded_components or []
+        self.included_components = included_components
+        self.keyword_attributes = keyword_attributes
+        self.rule_based_entity_types = rule_based_entity_types
+
+    def get_excluded_components(self, component_names: List[str]) -> List[str]:
+        # component_names: all of the components of the language model
+        if self.included_components is None:
+            return self.excluded_components
+        return [
+            component_name
+            for component_name in component_names
+            if component_name not in self.included_components
+        ]
+
+    def __repr__(self) -> str:
+        return (
+            f'{type(self).__name__}(name={self.name!r},'
+            f' excluded_components={self.excluded_components!r},'
+            f' included_components={self.included_components!r})'
+        )
+
+
+FULL_SPACY_LOAD_PROFILE = SpacyLoadProfile(
+    name='full',
+    keyword_attributes=[
+        'pos', 'tag', 'lemma', 'is_stop', 'ent_type', 'children', 'conjuncts'
+    ]
+)
+
+# without the named entity recognizer, CARDINAL, DATE and PERCENT entities
+# are approximated using rules (names such as PERSON and GPE are not excluded)
+NO_NER_SPACY_LOAD_PROFILE = SpacyLoadProfile(
+    name='no-ner',
+    excluded_components=['ner'],
+    keyword_attributes=[
+        'pos', 'tag', 'lemma', 'is_stop', 'children', 'conjuncts'
+    ],
+    rule_based_entity_types=True
+)
+
+# only the tagger and parser, and the components they depend on
+# (any other components of the model are excluded, e.g. ner and senter)
+TAGGER_PARSER_ONLY_SPACY_LOAD_PROFILE = SpacyLoadProfile(
+    name='tagger-parser-only',
+    included_components=[
+        'tok2vec', 'tagger', 'attribute_ruler', 'lemmatizer', 'parser'
+    ],
+    keyword_attributes=[
+        'pos', 'tag', 'lemma', 'is_stop', 'children', 'conjuncts'
+    ],
+    rule_based_entity_types=True
+)
+
+SPACY_LOAD_PROFILES = {
+    profile.name: profile
+    for profile in [
+        FULL_SPACY_LOAD_PROFILE,
+        NO_NER_SPACY_LOAD_PROFILE,
+        TAGGER_PARSER_ONLY_SPACY_LOAD_PROFILE
+    ]
+}
+
+DEFAULT_SPACY_LOAD_PROFILE_NAME = FULL_SPACY_LOAD_PROFILE.name
+
+
+def get_spacy_load_profile(name: Optional[str]) -> SpacyLoadProfile:
+    try:
+        return SPACY_LOAD_PROFILES[name or DEFAULT_SPACY_LOAD_PROFILE_NAME]
+    except KeyError as exc:
+        raise ValueError(
+            f'unknown spacy load profile: {name!r}'
+            f' (expected one of {sorted(SPACY_LOAD_PROFILES.keys())})'
+        ) from exc
+
 
 def get_token_lemma(token: Token) -> str:
     lemma = token.lemma_
@@ -86,13 +201,97 @@ def get_text_list(spans: List[Span]) -> List[str]:
     return [span.text for span in spans]
 
 
-def join_spans(spans: List[Span], language: Language) -> Span:
-    # there doesn't seem to be an easy way to create a span
-    # from a list of tokens. parsing the text for now.
-    # (In the future look into doc.retokenize)
-    joined_text = ' '.join([span.text for span in spans])
-    LOGGER.debug('joined_text: %s', joined_text)
-    return language(joined_text)
+# token attributes copied over to the composed doc (see join_spans)
+COMPOSED_DOC_ATTRS = [TAG, POS_ATTR, LEMMA, DEP, HEAD, ENT_IOB, ENT_TYPE]
+
+ENT_IOB_I = 1
+ENT_IOB_O = 2
+ENT_IOB_B = 3
+
+
+def get_span_tokens(span: Union[Span, Token]) -> List[Token]:
+    if isinstance(span, Token):
+        return [span]
+    return list(span)
+
+
+def _get_composed_token_ent_iob(
+        token: Token, previous_token: Optional[Token]) -> int:
+    if not token.ent_type:
+        return ENT_IOB_O
+    if (
+            token.ent_iob_ == 'B'
+            or previous_token is None
+            or previous_token.doc is not token.doc
+            or previous_token.i != token.i - 1
+            or previous_token.ent_type != token.ent_type):
+        return ENT_IOB_B
+    return ENT_IOB_I
+
+
+def _get_composed_token_head_index(
+        token: Token,
+        index: int,
+        token_index_map: Dict[Token, int],
+        root_index: int) -> int:
+    if index == root_index:
+        return root_index
+    head_index = token_index_map.get(token.head, root_index)
+    if head_index == index:
+        # the root of the original doc
+        return root_index
+    return head_index
+
+
+def join_spans(spans: Sequence[Union[Span, Token]]) -> Span:
+    # builds a new (small) doc from the tokens of the passed in spans,
+    # copying over the annotations rather than running the pipeline again.
+    # the resulting text is the same as joining the span texts with a space.
+    # the last token (usually the noun) becomes the root, and tokens with heads
+    # outside of the joined tokens are attached to it (similar to parsing the
+    # joined text as a noun phrase), entities are cut to the joined tokens.
+    span_tokens_list = [get_span_tokens(span) for span in spans]
+    tokens = [token for span_tokens in span_tokens_list for token in span_tokens]
+    if not tokens:
+        raise ValueError('no tokens to join')
+    spaces = [
+        bool(token.whitespace_) if token_index < len(span_tokens) - 1 else True
+        for span_tokens in span_tokens_list
+        for token_index, token in enumerate(span_tokens)
+    ]
+    spaces[-1] = False
+    vocab = tokens[0].doc.vocab
+    token_index_map: Dict[Token, int] = {}
+    for index, token in enumerate(tokens):
+        token_index_map.setdefault(token, index)
+    root_dep = vocab.strings.add('ROOT')
+    values = []
+    head_offsets = []
+    previous_token: Optional[Token] = None
+    for index, token in enumerate(tokens):
+        head_index = _get_composed_token_head_index(
+            token, index, token_index_map, root_index=len(tokens) - 1
+        )
+        head_offsets.append(head_index - index)
+        values.append([
+            token.tag,
+            token.pos,
+            token.lemma,
+            token.dep if head_index != index else root_dep,
+            0,
+            _get_composed_token_ent_iob(token, previous_token),
+            token.ent_type
+        ])
+        previous_token = token
+    array = numpy.array(values, dtype='uint64')
+    # relative heads may be negative, stored as uint64 (like Doc.to_array)
+    array[:, COMPOSED_DOC_ATTRS.index(HEAD)] = numpy.array(
+        head_offsets, dtype='int64'
+    ).astype('uint64')
+    doc = Doc(vocab, words=[token.text for token in tokens], spaces=spaces)
+    doc.from_array(COMPOSED_DOC_ATTRS, cast(Ints2d, array))
+    LOGGER.debug('joined_text: %s', doc.text)
+    return doc[:]
 
 
 def get_noun_tokens(doc: Doc) -> List[Token]:
@@ -127,8 +326,7 @@ def get_noun_chunks(doc: Doc) -> List[Span]:
 
 
 def iter_split_noun_chunk_conjunctions(
-        noun_chunk: Span,
-        language: Language) -> Iterable[Span]:
+        noun_chunk: Span) -> Iterable[Span]:
     previous_start = 0
     previous_end = 0
     for index, token in enumerate(noun_chunk):
@@ -146,7 +344,7 @@ def iter_split_noun_chunk_conjunctions(
             yield join_spans([
                 noun_chunk[previous_start:previous_end],
                 noun_chunk[-1:]
-            ], language=language)
+            ])
             previous_start = index + 1
             previous_end = previous_start
     if previous_end > previous_start:
@@ -155,9 +353,7 @@ def iter_split_noun_chunk_conjunctions(
         yield remaining_span
 
 
-def get_conjuction_noun_chunks(
-        doc: Doc,
-        language: Language) -> List[Span]:
+def get_conjuction_noun_chunks(doc: Doc) -> List[Span]:
     noun_chunks = get_noun_chunks(doc)
     for noun_chunk in list(noun_chunks):
         last_noun_token = noun_chunk[-1]
@@ -186,15 +382,14 @@ def get_conjuction_noun_chunks(
                 continue
             conjunction_span = join_spans([
                 conjunction_token, noun_chunk[-1:]
-            ], language=language)
+            ])
             LOGGER.debug('adding conjunction_span: %s', conjunction_span)
             noun_chunks += [conjunction_span]
     return [
         split_noun_chunk
         for noun_chunk in noun_chunks
         for split_noun_chunk in iter_split_noun_chunk_conjunctions(
-            noun_chunk,
-            language=language
+            noun_chunk
         )
     ]
 
@@ -203,23 +398,139 @@ def get_span_words(span: Span) -> List[str]:
     return span.text.split(' ')
 
 
+def get_span_word_offsets(span: Span) -> Optional[List[Tuple[int, int]]]:
+    # token offsets of the words (as per get_span_words) within the span,
+    # None if the tokens don't line up with the words (e.g. whitespace tokens)
+    word_offsets = []
+    start = 0
+    for index, token in enumerate(span):
+        if token.whitespace_ or index == len(span) - 1:
+            word_offsets.append((start, index + 1))
+            start = index + 1
+    if [
+        span[start:end].text for start, end in word_offsets
+    ] != get_span_words(span):
+        return None
+    return word_offsets
+
+
+def get_individual_keyword_texts(words: List[str]) -> List[str]:
+    if len(words) <= 1:
+        return []
+    return [word for word in words if len(word) >= 2]
+
+
+def get_shorter_keyword_texts(words: List[str]) -> List[str]:
+    return [
+        ' '.join(words[start:])
+        for start in range(1, len(words) - 1)
+    ]
+
+
+# The derived (individual and shorter) keywords are sub-spans of the keyword
+# span by default, i.e. they keep the lemma, norm, pos and entity type
+# assigned in the context of the source doc.
+# With reparse=True (reparseDerivedKeywords in the pipeline config),
+# or if the tokens don't line up with the words, the derived keywords are
+# parsed on their own using the language instead
+# (e.g. where the annotation in isolation is preferred over the context).
+
+
+def get_derived_keyword_texts_to_parse(
+        keyword_span: Span,
+        individual_tokens: bool = True,
+        shorter_keywords: bool = True,
+        reparse: bool = False) -> List[str]:
+    # the derived keyword texts that are parsed on their own (see above)
+    if not reparse and get_span_word_offsets(keyword_span) is not None:
+        return []
+    words = get_span_words(keyword_span)
+    return (
+        (get_individual_keyword_texts(words) if individual_tokens else [])
+        + (get_shorter_keyword_texts(words) if shorter_keywords else [])
+    )
+
+
 def iter_individual_keyword_spans(
         keyword_span: Span,
-        language: Language) -> Iterable[Span]:
-    individual_keywords = get_span_words(keyword_span)
-    if len(individual_keywords) > 1:
-        for individual_keyword in individual_keywords:
-            if len(individual_keyword) < 2:
+        language: Callable[[str], Doc],
+        reparse: bool = False) -> Iterable[Span]:
+    word_offsets = None if reparse else get_span_word_offsets(keyword_span)
+    if word_offsets is None:
+        for individual_keyword in get_individual_keyword_texts(
+                get_span_words(keyword_span)):
+            yield language(individual_keyword)[:]
+        return
+    if len(word_offsets) > 1:
+        for start, end in word_offsets:
+            word_span = keyword_span[start:end]
+            if len(word_span.text) < 2:
                 continue
-            yield language(individual_keyword)
+            yield word_span
 
 
 def iter_shorter_keyword_spans(
         keyword_span: Span,
-        language: Language) -> Iterable[Span]:
-    individual_keywords = get_span_words(keyword_span)
-    for start in range(1, len(individual_keywords) - 1):
-        yield language(' '.join(individual_keywords[start:]))
+        language: Callable[[str], Doc],
+        reparse: bool = False) -> Iterable[Span]:
+    word_offsets = None if reparse else get_span_word_offsets(keyword_span)
+    if word_offsets is None:
+        for shorter_keyword in get_shorter_keyword_texts(
+                get_span_words(keyword_span)):
+            yield language(shorter_keyword)[:]
+        return
+    for start, _ in word_offsets[1:-1]:
+        yield keyword_span[start:]
+
+
+DEFAULT_PARSE_CACHE_SIZE = 10000
+
+
+class SpacyTextParseCache:
+    # Parses (short) texts, e.g. derived keywords, keeping the most recently
+    # used docs. parse_all parses the texts not already cached in one batch.
+    def __init__(
+            self,
+            language: Language,
+            max_size: int = DEFAULT_PARSE_CACHE_SIZE):
+        self.language = language
+        self.max_size = max_size
+        self._doc_by_text: 'OrderedDict[str, Doc]' = OrderedDict()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_by_text)
+
+    def _add(self, text: str, doc: Doc):
+        self._doc_by_text[text] = doc
+        while len(self._doc_by_text) > self.max_size:
+            self._doc_by_text.popitem(last=False)
+
+    def __call__(self, text: str) -> Doc:
+        doc = self._doc_by_text.get(text)
+        if doc is not None:
+            self.hit_count += 1
+            self._doc_by_text.move_to_end(text)
+            return doc
+        self.miss_count += 1
+        doc = self.language(text)
+        self._add(text, doc)
+        return doc
+
+    def parse_all(self, text_list: Iterable[str]):
+        missing_text_list = [
+            text
+            for text in OrderedDict.fromkeys(text_list)
+            if text not in self._doc_by_text
+        ]
+        if not missing_text_list:
+            return
+        LOGGER.debug('parsing %d texts', len(missing_text_list))
+        for text, doc in zip(
+                missing_text_list,
+                self.language.pipe(missing_text_list)):
+            self._add(text, doc)
 
 
 def lstrip_stop_words_and_punct(span: Span) -> Span:
@@ -260,16 +571,61 @@ def strip_stop_words_and_punct(span: Span) -> Span:
     )
 
 
+def _normalize_markup_free_text(text: str) -> str:
+    # str.split uses the same (unicode) whitespace as the regex "\s"
+    return ' '.join(text.replace('/', ', ').split())
+
+
 def normalize_text(text: str) -> str:
-    return re.sub(
-        r'\s+', ' ',
-        strip_tags(text).replace('/', ', ')
-    ).strip()
+    return _normalize_markup_free_text(strip_tags(text))
+
+
+def normalize_text_list(text_list: Iterable[str]) -> List[str]:
+    return [
+        _normalize_markup_free_text(text)
+        for text in strip_tags_list(text_list)
+    ]
 
 
 DEFAULT_EXCLUDED_ENTITY_TYPES = {CARDINAL, DATE, PERSON, GPE, PERCENT}
 
 
+# used as a substitute for the named entity recognizer (see SpacyLoadProfile)
+RULE_BASED_DATE_UNITS = {
+    'day', 'days', 'week', 'weeks', 'month', 'months', 'year', 'years',
+    'decade', 'decades', 'century', 'centuries'
+}
+
+RULE_BASED_MONTH_NAMES = {
+    'January', 'February', 'March', 'April', 'June', 'July', 'August',
+    'September', 'October', 'November', 'December'
+}
+
+RULE_BASED_PERCENT_TEXTS = {'%', 'percent'}
+
+RULE_BASED_YEAR_PATTERN = re.compile(r'(?:1[89]|20)\d\d')
+
+
+def is_previous_token_like_num(token: Token) -> bool:
+    return token.i > 0 and token.doc[token.i - 1].like_num
+
+
+def get_rule_based_entity_type(token: Token) -> int:
+    # covers the entity types we exclude numbers and dates by
+    # (CARDINAL, DATE, PERCENT), e.g. "123", "10 years", "95%", "1990"
+    if (
+            RULE_BASED_YEAR_PATTERN.fullmatch(token.text)
+            or token.text in RULE_BASED_MONTH_NAMES):
+        return DATE
+    if token.like_num:
+        return CARDINAL
+    if token.lower_ in RULE_BASED_PERCENT_TEXTS:
+        return PERCENT if is_previous_token_like_num(token) else 0
+    if token.lower_ in RULE_BASED_DATE_UNITS:
+        return DATE if is_previous_token_like_num(token) else 0
+    return 0
+
+
 class SpacyExclusion:
     def __init__(
             self,
@@ -277,7 +633,8 @@ class SpacyExclusion:
             exclude_entity_types: Optional[Set[int]] = None,
             exclude_pronoun: bool = True,
             exclude_stop_words: bool = True,
-            min_word_length: int = 2):
+            min_word_length: int = 2,
+            rule_based_entity_types: bool = False):
         self.exclusion_list = exclusion_list or set()
         self.exclude_entity_types = (
             exclude_entity_types if exclude_entity_types is not None
@@ -286,6 +643,14 @@ class SpacyExclusion:
         self.exclude_pronoun = exclude_pronoun
         self.exclude_stop_words = exclude_stop_words
         self.min_word_length = min_word_length
+        # whether to fall back to rules if there is no entity type
+        # (e.g. without the named entity recognizer)
+        self.rule_based_entity_types = rule_based_entity_types
+
+    def get_entity_type(self, token: Token) -> int:
+        if token.ent_type or not self.rule_based_entity_types:
+            return token.ent_type
+        return get_rule_based_entity_type(token)
 
     def should_exclude(self, span: Span) -> bool:
         last_token = span[-1]
@@ -293,7 +658,7 @@ class SpacyExclusion:
             'should_exclude: %s (pos: %s, ent_type: %s)',
             span, last_token.pos_, last_token.ent_type_
         )
-        if last_token.ent_type in self.exclude_entity_types:
+        if self.get_entity_type(last_token) in self.exclude_entity_types:
             return True
         if self.exclude_stop_words and last_token.is_stop:
             return True
@@ -309,9 +674,14 @@ class SpacyExclusion:
 
 
 class SpacyKeywordList:
-    def __init__(self, language: Language, keyword_spans: List[Span]):
+    def __init__(
+            self,
+            language: Callable[[str], Doc],
+            keyword_spans: List[Span],
+            reparse_derived_keywords: bool = False):
         self.language = language
         self.keyword_spans = keyword_spans
+        self.reparse_derived_keywords = reparse_derived_keywords
 
     @property
     def text_list(self) -> List[str]:
@@ -323,7 +693,10 @@ class SpacyKeywordList:
 
     def with_keyword_spans(
             self, keyword_spans: List[Span]) -> 'SpacyKeywordList':
-        return SpacyKeywordList(self.language, keyword_spans)
+        return SpacyKeywordList(
+            self.language, keyword_spans,
+            reparse_derived_keywords=self.reparse_derived_keywords
+        )
 
     def with_additional_keyword_spans(
             self, additional_keyword_spans: List[Span]) -> 'SpacyKeywordList':
@@ -351,7 +724,8 @@ class SpacyKeywordList:
             for keyword_span in self.keyword_spans
             for individual_keyword_span in iter_individual_keyword_spans(
                 keyword_span,
-                language=self.language
+                language=self.language,
+                reparse=self.reparse_derived_keywords
             )
         ])
 
@@ -362,24 +736,68 @@ class SpacyKeywordList:
             for keyword_span in self.keyword_spans
             for shorter_keyword_span in iter_shorter_keyword_spans(
                 keyword_span,
-                language=self.language
+                language=self.language,
+                reparse=self.reparse_derived_keywords
             )
         ])
 
 
 class SpacyKeywordDocument:
-    def __init__(self, language: Language, doc: Doc):
+    def __init__(
+            self,
+            language: Callable[[str], Doc],
+            doc: Doc,
+            reparse_derived_keywords: bool = False,
+            exclusion: Optional[SpacyExclusion] = None):
         self.language = language
         self.doc = doc
+        self.reparse_derived_keywords = reparse_derived_keywords
+        self.exclusion = exclusion
 
-    @property
+    @cached_property
     def compound_keywords(self) -> SpacyKeywordList:
         return SpacyKeywordList(
-            self.language, get_conjuction_noun_chunks(
-                self.doc, language=self.language
-            )
+            self.language, get_conjuction_noun_chunks(self.doc),
+            reparse_derived_keywords=self.reparse_derived_keywords
         )
 
+    def get_exclusion(self, exclude: Optional[SpacyExclusion] = None) -> SpacyExclusion:
+        if exclude is None:
+            return self.exclusion or SpacyExclusion()
+        return exclude
+
+    def get_source_keyword_list(  # pylint: disable=redefined-outer-name
+            self,
+            strip_stop_words_and_punct: bool,
+            exclude: SpacyExclusion) -> SpacyKeywordList:
+        # the keywords the individual and shorter keywords are derived from
+        keyword_list = self.compound_keywords
+        if strip_stop_words_and_punct:
+            keyword_list = keyword_list.with_stripped_stop_words_and_punct
+        # exclude whole keyword spans
+        return keyword_list.exclude(exclude)
+
+    def get_derived_keyword_text_list(  # pylint: disable=redefined-outer-name
+            self,
+            strip_stop_words_and_punct: bool = True,
+            individual_tokens: bool = True,
+            shorter_keywords: bool = True,
+            exclude: Optional[SpacyExclusion] = None) -> List[str]:
+        # the derived keyword texts that get_keyword_str_list (with the same
+        # arguments) parses on their own, e.g. to parse them beforehand in a batch
+        return [
+            text
+            for keyword_span in self.get_source_keyword_list(
+                strip_stop_words_and_punct, self.get_exclusion(exclude)
+            ).keyword_spans
+            for text in get_derived_keyword_texts_to_parse(
+                keyword_span,
+                individual_tokens=individual_tokens,
+                shorter_keywords=shorter_keywords,
+                reparse=self.reparse_derived_keywords
+            )
+        ]
+
     def get_keyword_str_list(  # pylint: disable=redefined-outer-name
             self,
             strip_stop_words_and_punct: bool = True,
@@ -388,14 +806,8 @@ class SpacyKeywordDocument:
             normalize_text: bool = True,
             exclude: Optional[SpacyExclusion] = None) -> List[str]:
 
-        if exclude is None:
-            exclude = SpacyExclusion()
-
-        keyword_list = self.compound_keywords
-        if strip_stop_words_and_punct:
-            keyword_list = keyword_list.with_stripped_stop_words_and_punct
-        # exclude whole keyword spans
-        keyword_list = keyword_list.exclude(exclude)
+        exclude = self.get_exclusion(exclude)
+        keyword_list = self.get_source_keyword_list(strip_stop_words_and_punct, exclude)
         if individual_tokens:
             keyword_list = keyword_list.with_individual_tokens
         if shorter_keywords:
@@ -407,24 +819,116 @@ class SpacyKeywordDocument:
         return keyword_list.text_list
 
 
+# the derived keyword texts of a batch of documents should fit into the parse cache
+DEFAULT_DERIVED_KEYWORD_BATCH_SIZE = 100
+
+DEFAULT_NORMALIZE_TEXT_BATCH_SIZE = 1000
+
+
 class SpacyKeywordDocumentParser:
-    def __init__(self, language: Language):
+    def __init__(
+            self,
+            language: Language,
+            reparse_derived_keywords: bool = False,
+            parse_cache_size: int = DEFAULT_PARSE_CACHE_SIZE,
+            derived_keyword_batch_size: int = DEFAULT_DERIVED_KEYWORD_BATCH_SIZE,
+            exclusion: Optional[SpacyExclusion] = None,
+            length_sort_window_size: Optional[int] = None):
         self.language = language
+        # texts within a window are passed to the language pipe sorted by length,
+        # for more uniform batches (the order of the output is not affected)
+        self.length_sort_window_size = length_sort_window_size
+        self.exclusion = exclusion
+        self.reparse_derived_keywords = reparse_derived_keywords
+        self.parse_cache = SpacyTextParseCache(
+            language, max_size=parse_cache_size
+        )
+        self.derived_keyword_batch_size = derived_keyword_batch_size
 
     def normalize_text_list(self, text_list: Iterable[str]) -> Iterable[str]:
-        return (normalize_text(text) for text in text_list)
+        # normalize in batches, without consuming the whole (lazy) text list
+        text_iterator = iter(text_list)
+        while True:
+            batch = list(islice(text_iterator, DEFAULT_NORMALIZE_TEXT_BATCH_SIZE))
+            if not batch:
+                return
+            yield from normalize_text_list(batch)
 
     def parse_text(self, text: str) -> SpacyKeywordDocument:
         return list(self.iter_parse_text_list([text]))[0]
 
+    def iter_pipe_text_list(self, text_list: Iterable[str]) -> Iterable[Doc]:
+        return self.language.pipe(text_list)
+
+    def iter_pipe_text_list_sorted_by_length(
+            self, text_list: Iterable[str], window_size: int) -> Iterable[Doc]:
+        text_iterator = iter(text_list)
+        # the original positions of the texts of each window, in pipe order
+        # (added before the first text of the window is passed to the pipe)
+        window_indices_queue: Deque[List[int]] = deque()
+
+        def iter_sorted_texts() -> Iterable[str]:
+            while True:
+                window = list(islice(text_iterator, window_size))
+                if not window:
+                    return
+                window_indices = sorted(
+                    range(len(window)),
+                    key=lambda index: len(window[index])
+                )
+                window_indices_queue.append(window_indices)
+                yield from (window[index] for index in window_indices)
+
+        doc_iterator = iter(self.iter_pipe_text_list(iter_sorted_texts()))
+        for first_doc in doc_iterator:
+            window_indices = window_indices_queue.popleft()
+            sorted_docs = [first_doc] + list(
+                islice(doc_iterator, len(window_indices) - 1)
+            )
+            assert len(sorted_docs) == len(window_indices)
+            yield from (
+                doc
+                for _, doc in sorted(
+                    zip(window_indices, sorted_docs),
+                    key=lambda index_and_doc: index_and_doc[0]
+                )
+            )
+
     def iter_parse_text_list(
             self, text_list: Iterable[str]) -> Iterable[SpacyKeywordDocument]:
+        normalized_text_list = self.normalize_text_list(text_list)
+        if self.length_sort_window_size and self.length_sort_window_size > 1:
+            docs = self.iter_pipe_text_list_sorted_by_length(
+                normalized_text_list, window_size=self.length_sort_window_size
+            )
+        else:
+            docs = self.iter_pipe_text_list(normalized_text_list)
         return (
             SpacyKeywordDocument(
-                self.language,
-                doc
-            )
-            for doc in self.language.pipe(
-                self.normalize_text_list(text_list)
+                self.parse_cache,
+                doc,
+                reparse_derived_keywords=self.reparse_derived_keywords,
+                exclusion=self.exclusion
             )
+            for doc in docs
         )
+
+    def iter_get_keyword_str_list(
+            self,
+            text_list: Iterable[str],
+            exclude: Optional[SpacyExclusion] = None) -> Iterable[List[str]]:
+        # The derived keywords of a batch of documents that are parsed on their own
+        # are parsed in one go, using language.pipe (populating the parse cache),
+        # with the same exclusion as the extracted keywords.
+        document_iterator = iter(self.iter_parse_text_list(text_list))
+        while True:
+            batch = list(islice(document_iterator, self.derived_keyword_batch_size))
+            if not batch:
+                return
+            self.parse_cache.parse_all(
+                text
+                for document in batch
+                for text in document.get_derived_keyword_text_list(exclude=exclude)
+            )
+            for document in batch:
+                yield document.get_keyword_str_list(exclude=exclude)
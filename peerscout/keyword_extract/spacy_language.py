@@ -0,0 +1,69 @@
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import spacy
+from spacy.language import Language
+
+from peerscout.keyword_extract.spacy_keyword import SpacyLoadProfile
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_spacy_language_component_names(spacy_language_model_name: str) -> List[str]:
+    # the components of an installed model package (or model directory),
+    # read from its meta data without loading the model
+    model_path = (
+        spacy.util.get_package_path(spacy_language_model_name)
+        if spacy.util.is_package(spacy_language_model_name)
+        else Path(spacy_language_model_name)
+    )
+    model_meta = spacy.util.get_model_meta(model_path)
+    return list(model_meta.get('components') or model_meta.get('pipeline') or [])
+
+
+def load_spacy_language(
+        spacy_language_model_name: str,
+        spacy_load_profile: SpacyLoadProfile) -> Language:
+    LOGGER.info(
+        'loading spacy language model: %s (profile: %r)',
+        spacy_language_model_name, spacy_load_profile
+    )
+    # the model meta data is only read to exclude all but the included components
+    component_names = (
+        get_spacy_language_component_names(spacy_language_model_name)
+        if spacy_load_profile.included_components is not None
+        else []
+    )
+    return spacy.load(
+        spacy_language_model_name,
+        exclude=spacy_load_profile.get_excluded_components(component_names)
+    )
+
+
+class SpacyLanguageCache:
+    # Loads each spaCy language model (and load profile) once, for all pipelines.
+    # Parsing using a shared language is serialized by the lock of the language
+    # (worker processes use their own copy).
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._language_and_lock_by_key: Dict[
+            Tuple[str, str], Tuple[Language, threading.Lock]
+        ] = {}
+
+    def get_language_and_lock(
+            self,
+            spacy_language_model_name: str,
+            spacy_load_profile: SpacyLoadProfile) -> Tuple[Language, threading.Lock]:
+        key = (spacy_language_model_name, spacy_load_profile.name)
+        with self._lock:
+            language_and_lock = self._language_and_lock_by_key.get(key)
+            if language_and_lock is None:
+                language_and_lock = (
+                    load_spacy_language(spacy_language_model_name, spacy_load_profile),
+                    threading.Lock()
+                )
+                self._language_and_lock_by_key[key] = language_and_lock
+            return language_and_lock
@@ -0,0 +1,102 @@
+import logging
+import re
+from typing import Any, Iterable, List, Tuple
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# a sentence end followed by whitespace (where a long text may be split)
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def _iter_split_text_at_whitespace(text: str, max_length: int) -> Iterable[str]:
+    while len(text) > max_length:
+        split_position = text.rfind(' ', 0, max_length + 1)
+        if split_position <= 0:
+            split_position = max_length
+        yield text[:split_position]
+        text = text[split_position:].lstrip()
+    if text:
+        yield text
+
+
+def _iter_sentences(text: str) -> Iterable[str]:
+    start = 0
+    for match in SENTENCE_BOUNDARY_PATTERN.finditer(text):
+        # do not split within markup (the text is not normalized yet)
+        if text.rfind('<', start, match.start()) > text.rfind('>', start, match.start()):
+            continue
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
+
+
+def get_sentence_bounded_text_chunks(text: str, max_length: int) -> List[str]:
+    # sentences are combined into chunks of up to max_length characters,
+    # longer sentences are split at whitespace
+    if len(text) <= max_length:
+        return [text]
+    chunks: List[str] = []
+    current_chunk = ''
+    for sentence in _iter_sentences(text):
+        if current_chunk and len(current_chunk) + 1 + len(sentence) <= max_length:
+            current_chunk += ' ' + sentence
+            continue
+        if current_chunk:
+            chunks.append(current_chunk)
+            current_chunk = ''
+        if len(sentence) <= max_length:
+            current_chunk = sentence
+        else:
+            chunks.extend(_iter_split_text_at_whitespace(sentence, max_length))
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def merge_keyword_lists(keyword_lists: Iterable[List[str]]) -> List[str]:
+    return list(dict.fromkeys(
+        keyword
+        for keyword_list in keyword_lists
+        for keyword in keyword_list
+    ))
+
+
+class _PartialTextContext:
+    pass
+
+
+# the context of the chunks of a text, other than its last chunk
+PARTIAL_TEXT_CONTEXT = _PartialTextContext()
+
+
+def iter_text_chunks_with_context(
+        text_and_context_list: Iterable[Tuple[str, Any]],
+        max_text_length: int) -> Iterable[Tuple[str, Any]]:
+    # only the last chunk of a text carries the context of the text
+    for text, context in text_and_context_list:
+        chunks = get_sentence_bounded_text_chunks(text, max_text_length)
+        if len(chunks) > 1:
+            LOGGER.debug(
+                'split text of length %d into %d chunks',
+                len(text), len(chunks)
+            )
+        for chunk in chunks[:-1]:
+            yield chunk, PARTIAL_TEXT_CONTEXT
+        yield chunks[-1], context
+
+
+def iter_merge_chunk_keywords_with_context(
+        keywords_and_context_list: Iterable[Tuple[List[str], Any]]
+) -> Iterable[Tuple[List[str], Any]]:
+    chunk_keyword_lists: List[List[str]] = []
+    for keywords, context in keywords_and_context_list:
+        chunk_keyword_lists.append(keywords)
+        if context is PARTIAL_TEXT_CONTEXT:
+            continue
+        if len(chunk_keyword_lists) == 1:
+            yield keywords, context
+        else:
+            yield merge_keyword_lists(chunk_keyword_lists), context
+        chunk_keyword_lists = []
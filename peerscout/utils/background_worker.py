@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from typing import Callable, Generic, Iterable, List, Optional, TypeVar
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+T = TypeVar('T')
+
+
+class _EndOfItems:
+    pass
+
+
+END_OF_ITEMS = _EndOfItems()
+
+
+class BackgroundWorker(Generic[T]):
+    # Processes submitted items one at a time in a background thread,
+    # in the order they were submitted. At most max_queue_size items are
+    # waiting to be processed, submit blocks otherwise.
+    # After an error, remaining items are skipped and the error is raised
+    # by the next call to submit or close.
+    def __init__(
+            self,
+            process_item: Callable[[T], None],
+            max_queue_size: int = 1,
+            name: str = 'background-worker'):
+        self.process_item = process_item
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is END_OF_ITEMS:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self.process_item(item)
+            except BaseException as exc:  # pylint: disable=broad-except
+                LOGGER.warning('background processing failed: %r', exc)
+                self._error = exc
+
+    def _raise_error_if_any(self):
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, item: T):
+        self._raise_error_if_any()
+        self._queue.put(item)
+
+    def close(self):
+        self._queue.put(END_OF_ITEMS)
+        self._thread.join()
+        self._raise_error_if_any()
+
+    def __enter__(self) -> 'BackgroundWorker[T]':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        # skip any remaining items, the original exception is raised
+        self._error = self._error or exc_value
+        self._queue.put(END_OF_ITEMS)
+        self._thread.join()
+
+
+class _PrefetchError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+# how often a blocked prefetch thread checks whether it should stop
+PREFETCH_STOP_CHECK_INTERVAL_SECONDS = 0.1
+
+
+def iter_prefetched(
+        iterable: Iterable[T],
+        max_prefetch_count: int = 1,
+        name: str = 'prefetch') -> Iterable[T]:
+    # Retrieves the items in a background thread, while the previous items are
+    # being consumed, with at most max_prefetch_count items waiting to be consumed.
+    # Errors are raised when the consumer reaches the failed item.
+    if max_prefetch_count <= 0:
+        yield from iterable
+        return
+    item_queue: queue.Queue = queue.Queue(maxsize=max_prefetch_count)
+    stop_event = threading.Event()
+
+    def put(item) -> bool:
+        while not stop_event.is_set():
+            try:
+                item_queue.put(item, timeout=PREFETCH_STOP_CHECK_INTERVAL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as exc:  # pylint: disable=broad-except
+            put(_PrefetchError(exc))
+            return
+        put(END_OF_ITEMS)
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = item_queue.get()
+            if item is END_OF_ITEMS:
+                return
+            if isinstance(item, _PrefetchError):
+                raise item.error
+            yield item
+    finally:
+        # e.g. if the consumer stopped early
+        stop_event.set()
+
+
+def run_concurrently(
+        process_item: Callable[[T], None],
+        items: Iterable[T],
+        max_workers: int = 1,
+        name: str = 'concurrent'):
+    # Processes the items in up to max_workers threads (in the current thread
+    # if max_workers is one). After an error, items that have not started yet
+    # are skipped and the first error (in the order of the items) is raised
+    # once the items already being processed are complete.
+    if max_workers <= 1:
+        for item in items:
+            process_item(item)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name) as executor:
+        futures: List[Future] = [executor.submit(process_item, item) for item in items]
+        wait(futures, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            future.cancel()
+    for future in futures:
+        if not future.cancelled():
+            future.result()
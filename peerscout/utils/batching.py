@@ -0,0 +1,74 @@
+import logging
+from time import monotonic
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+def iter_get_batches(iterator: Iterator[T], size: int) -> Iterable[List[T]]:
+    while True:
+        chunk = []
+        for _ in range(size):
+            try:
+                chunk.append(next(iterator))
+            except StopIteration:
+                if chunk:
+                    yield chunk
+                return
+        yield chunk
+
+
+def get_approximate_record_byte_size(record: dict) -> int:
+    # the length of the values, without serializing the record
+    return sum(
+        sum(len(str(item)) for item in value)
+        if isinstance(value, list) else len(str(value))
+        for value in record.values()
+    )
+
+
+def iter_get_adaptive_batches(
+        iterable: Iterable[T],
+        max_size: int,
+        min_size: int = 1,
+        target_bytes: Optional[int] = None,
+        target_seconds: Optional[float] = None,
+        get_item_byte_size: Callable[[T], int] = lambda item: len(str(item))
+) -> Iterable[List[T]]:
+    # A batch is complete once it reaches the target (approximate) byte size
+    # or the target duration (time spent retrieving the items, e.g. including
+    # the keyword extraction), with at least min_size and at most max_size items.
+    batch: List[T] = []
+    batch_byte_size = 0
+    batch_start_time = monotonic()
+    for item in iterable:
+        batch.append(item)
+        if target_bytes:
+            batch_byte_size += get_item_byte_size(item)
+        batch_duration = monotonic() - batch_start_time
+        reason: Optional[str] = None
+        if len(batch) >= max_size:
+            reason = 'max size'
+        elif len(batch) >= min_size:
+            if target_bytes and batch_byte_size >= target_bytes:
+                reason = 'target bytes'
+            elif target_seconds and batch_duration >= target_seconds:
+                reason = 'target seconds'
+        if reason:
+            LOGGER.info(
+                'batch complete (%s): %d rows, ~%d bytes, %.1f seconds',
+                reason, len(batch), batch_byte_size, batch_duration
+            )
+            yield batch
+            batch = []
+            batch_byte_size = 0
+            batch_start_time = monotonic()
+    if batch:
+        LOGGER.info(
+            'last batch: %d rows, ~%d bytes, %.1f seconds',
+            len(batch), batch_byte_size, monotonic() - batch_start_time
+        )
+        yield batch
@@ -1,24 +1,31 @@
 import logging
 import os
-from typing import List
+from collections import deque
+from typing import IO, Callable, Deque, Dict, Iterable, List, Optional, Tuple
 from google.cloud import bigquery
 from google.cloud.bigquery import (
-    LoadJobConfig, Client,
+    LoadJob, LoadJobConfig, Client,
     SourceFormat, WriteDisposition
 )
+from google.cloud.bigquery.format_options import ParquetOptions
 from google.cloud.bigquery.schema import SchemaField
 from google.cloud.exceptions import NotFound
 from bigquery_schema_generator.generate_schema import SchemaGenerator
 
+from peerscout.utils.client_registry import BIGQUERY_CLIENT_KEY, get_or_create_client
+
 LOGGER = logging.getLogger(__name__)
 
 
 def get_client(project_id: str) -> Client:
-    return Client(project=project_id)
+    return get_or_create_client(
+        (BIGQUERY_CLIENT_KEY, project_id),
+        lambda: Client(project=project_id)
+    )
 
 
 # pylint: disable=too-many-arguments
-def load_file_into_bq(
+def start_load_file_into_bq(
         filename: str,
         project_name: str,
         dataset_name: str,
@@ -27,10 +34,37 @@ def load_file_into_bq(
         write_mode=WriteDisposition.WRITE_APPEND,
         auto_detect_schema=False,
         rows_to_skip=0
-):
+) -> Optional[LoadJob]:
+    # the file is uploaded before returning, but the load job may still be running
     if os.path.isfile(filename) and os.path.getsize(filename) == 0:
         LOGGER.info("File %s is empty.", filename)
-        return
+        return None
+    with open(filename, "rb") as source_file:
+        return start_load_file_object_into_bq(
+            source_file,
+            project_name=project_name,
+            dataset_name=dataset_name,
+            table_name=table_name,
+            source_format=source_format,
+            write_mode=write_mode,
+            auto_detect_schema=auto_detect_schema,
+            rows_to_skip=rows_to_skip
+        )
+
+
+# pylint: disable=too-many-arguments
+def start_load_file_object_into_bq(
+        source_file: IO[bytes],
+        project_name: str,
+        dataset_name: str,
+        table_name: str,
+        source_format=SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_mode=WriteDisposition.WRITE_APPEND,
+        auto_detect_schema=False,
+        rows_to_skip=0
+) -> LoadJob:
+    # the data is read from the current position of the file object
+    # (e.g. an in-memory buffer)
     client = get_client(project_id=project_name)
     dataset_ref = client.dataset(dataset_name)
     table_ref = dataset_ref.table(table_name)
@@ -40,20 +74,101 @@ def load_file_into_bq(
     job_config.autodetect = auto_detect_schema
     if source_format is bigquery.SourceFormat.CSV:
         job_config.skip_leading_rows = rows_to_skip
-    with open(filename, "rb") as source_file:
+    if source_format == SourceFormat.PARQUET:
+        # load lists as repeated fields (rather than a nested list record)
+        parquet_options = ParquetOptions()
+        parquet_options.enable_list_inference = True
+        job_config.parquet_options = parquet_options
+    if source_format == SourceFormat.AVRO:
+        job_config.use_avro_logical_types = True
+    return client.load_table_from_file(
+        source_file, destination=table_ref, job_config=job_config
+    )
 
-        job = client.load_table_from_file(
-            source_file, destination=table_ref, job_config=job_config
-        )
 
-        # Waits for table cloud_data_store to complete
-        job.result()
-        LOGGER.info(
-            "Loaded %s rows into %s:%s.",
-            job.output_rows,
-            dataset_name,
-            table_name
-        )
+def wait_for_load_job(job: LoadJob):
+    # Waits for table cloud_data_store to complete
+    job.result()
+    LOGGER.info(
+        "Loaded %s rows into %s:%s.",
+        job.output_rows,
+        job.destination.dataset_id,
+        job.destination.table_id
+    )
+
+
+# pylint: disable=too-many-arguments
+def load_file_into_bq(
+        filename: str,
+        project_name: str,
+        dataset_name: str,
+        table_name: str,
+        source_format=SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_mode=WriteDisposition.WRITE_APPEND,
+        auto_detect_schema=False,
+        rows_to_skip=0
+):
+    job = start_load_file_into_bq(
+        filename=filename,
+        project_name=project_name,
+        dataset_name=dataset_name,
+        table_name=table_name,
+        source_format=source_format,
+        write_mode=write_mode,
+        auto_detect_schema=auto_detect_schema,
+        rows_to_skip=rows_to_skip
+    )
+    if job is not None:
+        wait_for_load_job(job)
+
+
+class BqLoadJobManager:
+    # Keeps track of submitted load jobs, with at most max_in_flight_count
+    # jobs running at the same time (wait_for_capacity, to be called before
+    # starting the next job, waits for the oldest job first).
+    # The on_success callbacks are called in the order the jobs were submitted,
+    # only once the job and all of the previously submitted jobs succeeded.
+    def __init__(self, max_in_flight_count: int = 1):
+        assert max_in_flight_count >= 1
+        self.max_in_flight_count = max_in_flight_count
+        self._pending_jobs: Deque[
+            Tuple[Optional[LoadJob], Optional[Callable[[], None]]]
+        ] = deque()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending_jobs)
+
+    def _complete_oldest_job(self):
+        job, on_success = self._pending_jobs.popleft()
+        if job is not None:
+            wait_for_load_job(job)
+        if on_success is not None:
+            on_success()
+
+    def _complete_done_jobs(self):
+        while self._pending_jobs:
+            job, _ = self._pending_jobs[0]
+            if job is not None and not job.done():
+                return
+            self._complete_oldest_job()
+
+    def wait_for_capacity(self):
+        self._complete_done_jobs()
+        while len(self._pending_jobs) >= self.max_in_flight_count:
+            self._complete_oldest_job()
+
+    def submit(
+            self,
+            job: Optional[LoadJob],
+            on_success: Optional[Callable[[], None]] = None):
+        # job may be None if there was nothing to load (e.g. an empty file)
+        self.wait_for_capacity()
+        self._pending_jobs.append((job, on_success))
+
+    def wait_for_all(self):
+        while self._pending_jobs:
+            self._complete_oldest_job()
 
 
 def create_table(
@@ -140,6 +255,7 @@ def extend_table_schema_with_nested_schema(
     ]
     table.schema = new_schema
     client.update_table(table, ["schema"])  # Make an API request.
+    return new_schema_dict
 
 
 def get_new_merged_schema(
@@ -191,6 +307,78 @@ def get_new_merged_schema(
     return new_schema
 
 
+def get_table_schema_or_none(
+        project_name: str, dataset_name: str, table_name: str
+) -> Optional[List[dict]]:
+    table_id = compose_full_table_name(project_name, dataset_name, table_name)
+    client = get_client(project_id=project_name)
+    try:
+        table = client.get_table(table_id)
+    except NotFound:
+        return None
+    return [schema_field.to_api_repr() for schema_field in table.schema]
+
+
+def has_new_schema_fields(
+        existing_schema: List[dict],
+        update_schema: List[dict]
+) -> bool:
+    existing_schema_dict = {
+        schema_object["name"].lower(): schema_object
+        for schema_object in existing_schema
+    }
+    for schema_object in update_schema:
+        existing_schema_object = existing_schema_dict.get(
+            schema_object["name"].lower()
+        )
+        if existing_schema_object is None:
+            return True
+        update_fields = schema_object.get("fields")
+        if update_fields and has_new_schema_fields(
+            existing_schema_object.get("fields") or [],
+            update_fields
+        ):
+            return True
+    return False
+
+
+class BqTableSchemaCache:
+    # Remembers the schema of destination tables (e.g. for a pipeline run),
+    # to only create or extend a table if the schema contains new fields.
+    # The table schema is fetched again before extending it.
+    def __init__(self):
+        self._schema_by_table_id: Dict[str, Optional[List[dict]]] = {}
+
+    def get_table_schema(
+            self, project_name: str, dataset_name: str, table_name: str
+    ) -> Optional[List[dict]]:
+        table_id = compose_full_table_name(project_name, dataset_name, table_name)
+        if table_id not in self._schema_by_table_id:
+            self._schema_by_table_id[table_id] = get_table_schema_or_none(
+                project_name, dataset_name, table_name
+            )
+        return self._schema_by_table_id[table_id]
+
+    def create_or_extend_table_schema(
+            self,
+            project_name: str,
+            dataset_name: str,
+            table_name: str,
+            schema: List[dict]):
+        table_id = compose_full_table_name(project_name, dataset_name, table_name)
+        existing_schema = self.get_table_schema(project_name, dataset_name, table_name)
+        if existing_schema is None:
+            create_table(project_name, dataset_name, table_name, schema)
+            self._schema_by_table_id[table_id] = schema
+            return
+        if not has_new_schema_fields(existing_schema, schema):
+            return
+        LOGGER.info('extending schema of table: %s', table_id)
+        self._schema_by_table_id[table_id] = extend_table_schema_with_nested_schema(
+            project_name, dataset_name, table_name, schema
+        )
+
+
 def generate_schema_from_file(full_temp_file_location):
     with open(full_temp_file_location, encoding="UTF-8") as file_reader:
         generator = SchemaGenerator(
@@ -204,15 +392,38 @@ def generate_schema_from_file(full_temp_file_location):
         return schema
 
 
+def generate_schema_from_records(records: Iterable[dict]) -> list:
+    # same schema as generate_schema_from_file for the serialized records,
+    # without parsing the JSON again
+    generator = SchemaGenerator(
+        input_format="dict",
+        quoted_values_are_strings=True
+    )
+    schema_map, _ = generator.deduce_schema(records)
+    return generator.flatten_schema(schema_map)
+
+
 def create_or_extend_table_schema(
         gcp_project,
         dataset_name,
         table_name,
         full_temp_file_location,
+        schema_cache: Optional[BqTableSchemaCache] = None,
+        schema: Optional[list] = None
 ):
-    schema = generate_schema_from_file(
-        full_temp_file_location
-    )
+    if schema is None:
+        schema = generate_schema_from_file(
+            full_temp_file_location
+        )
+
+    if schema_cache is not None:
+        schema_cache.create_or_extend_table_schema(
+            gcp_project,
+            dataset_name,
+            table_name,
+            schema
+        )
+        return
 
     if does_bigquery_table_exist(
             gcp_project,
@@ -0,0 +1,234 @@
+import datetime
+import re
+from typing import IO, Any, Dict, Iterable, List, Optional
+
+from google.cloud.bigquery import SourceFormat
+
+
+class LoadFormat:
+    JSON = 'json'
+    PARQUET = 'parquet'
+    AVRO = 'avro'
+
+
+DEFAULT_LOAD_FORMAT = LoadFormat.JSON
+
+SOURCE_FORMAT_BY_LOAD_FORMAT = {
+    LoadFormat.JSON: SourceFormat.NEWLINE_DELIMITED_JSON,
+    LoadFormat.PARQUET: SourceFormat.PARQUET,
+    LoadFormat.AVRO: SourceFormat.AVRO
+}
+
+
+def get_load_format(load_format: Optional[str]) -> str:
+    if not load_format:
+        return DEFAULT_LOAD_FORMAT
+    load_format = load_format.lower()
+    if load_format not in SOURCE_FORMAT_BY_LOAD_FORMAT:
+        raise ValueError(
+            f'unsupported load format: {load_format}'
+            f' (expected one of {list(SOURCE_FORMAT_BY_LOAD_FORMAT.keys())})'
+        )
+    return load_format
+
+
+def get_source_format(load_format: str) -> str:
+    return SOURCE_FORMAT_BY_LOAD_FORMAT[load_format]
+
+
+# the formats recognised by the schema generator (bigquery_schema_generator)
+TIMESTAMP_PATTERN = re.compile(
+    r'^(\d{4})-(\d{1,2})-(\d{1,2})[T ](\d{1,2}):(\d{1,2}):(\d{1,2})(?:\.(\d{1,6}))?'
+    r' *(?:(Z|UTC)|([+-])(\d{1,2})(?::(\d{1,2}))?)?$'
+)
+DATE_PATTERN = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+TIME_PATTERN = re.compile(r'^(\d{1,2}):(\d{1,2}):(\d{1,2})(?:\.(\d{1,6}))?$')
+
+
+def _get_microseconds(fraction: Optional[str]) -> int:
+    return int(fraction.ljust(6, '0')) if fraction else 0
+
+
+def parse_timestamp(value: str) -> datetime.datetime:
+    # timestamps without a timezone are in UTC (as when loading JSON)
+    match = TIMESTAMP_PATTERN.match(value)
+    if not match:
+        raise ValueError(f'invalid timestamp: {value!r}')
+    (
+        year, month, day, hour, minute, second, fraction,
+        _, offset_sign, offset_hours, offset_minutes
+    ) = match.groups()
+    offset = datetime.timedelta(
+        hours=int(offset_hours or 0), minutes=int(offset_minutes or 0)
+    )
+    if offset_sign == '-':
+        offset = -offset
+    return datetime.datetime(
+        int(year), int(month), int(day), int(hour), int(minute), int(second),
+        _get_microseconds(fraction),
+        tzinfo=datetime.timezone(offset)
+    ).astimezone(datetime.timezone.utc)
+
+
+def parse_date(value: str) -> datetime.date:
+    match = DATE_PATTERN.match(value)
+    if not match:
+        raise ValueError(f'invalid date: {value!r}')
+    year, month, day = match.groups()
+    return datetime.date(int(year), int(month), int(day))
+
+
+def parse_time(value: str) -> datetime.time:
+    match = TIME_PATTERN.match(value)
+    if not match:
+        raise ValueError(f'invalid time: {value!r}')
+    hour, minute, second, fraction = match.groups()
+    return datetime.time(
+        int(hour), int(minute), int(second), _get_microseconds(fraction)
+    )
+
+
+def _convert_scalar_value(value: Any, field_type: str) -> Any:
+    if value is None:
+        return None
+    if field_type == 'TIMESTAMP' and isinstance(value, str):
+        return parse_timestamp(value)
+    if field_type == 'DATE' and isinstance(value, str):
+        return parse_date(value)
+    if field_type == 'TIME' and isinstance(value, str):
+        return parse_time(value)
+    if field_type == 'FLOAT':
+        return float(value)
+    return value
+
+
+def _convert_value(value: Any, field: dict) -> Any:
+    if field['type'] == 'RECORD':
+        def convert_item(item):
+            return (
+                convert_record_for_schema(item, field['fields'])
+                if item is not None else None
+            )
+    else:
+        def convert_item(item):
+            return _convert_scalar_value(item, field['type'])
+    if field.get('mode') == 'REPEATED':
+        return [convert_item(item) for item in value or []]
+    return convert_item(value)
+
+
+def convert_record_for_schema(record: dict, schema: List[dict]) -> dict:
+    # converts the JSON values to the python types expected by the columnar
+    # formats (e.g. timestamps), fields not in the schema are ignored
+    value_by_lower_key = {key.lower(): value for key, value in record.items()}
+    return {
+        field['name']: _convert_value(
+            value_by_lower_key.get(field['name'].lower()), field
+        )
+        for field in schema
+    }
+
+
+def _get_arrow_type(field: dict):
+    import pyarrow  # pylint: disable=import-outside-toplevel
+    field_type = field['type']
+    if field_type == 'RECORD':
+        return pyarrow.struct([
+            _get_arrow_field(child_field) for child_field in field['fields']
+        ])
+    return {
+        'STRING': pyarrow.string(),
+        'INTEGER': pyarrow.int64(),
+        'FLOAT': pyarrow.float64(),
+        'BOOLEAN': pyarrow.bool_(),
+        'TIMESTAMP': pyarrow.timestamp('us', tz='UTC'),
+        'DATE': pyarrow.date32(),
+        'TIME': pyarrow.time64('us')
+    }[field_type]
+
+
+def _get_arrow_field(field: dict):
+    import pyarrow  # pylint: disable=import-outside-toplevel
+    arrow_type = _get_arrow_type(field)
+    if field.get('mode') == 'REPEATED':
+        arrow_type = pyarrow.list_(arrow_type)
+    return pyarrow.field(field['name'], arrow_type)
+
+
+def get_arrow_schema(schema: List[dict]):
+    import pyarrow  # pylint: disable=import-outside-toplevel
+    return pyarrow.schema([_get_arrow_field(field) for field in schema])
+
+
+AVRO_TYPE_BY_BQ_TYPE: Dict[str, Any] = {
+    'STRING': 'string',
+    'INTEGER': 'long',
+    'FLOAT': 'double',
+    'BOOLEAN': 'boolean',
+    'TIMESTAMP': {'type': 'long', 'logicalType': 'timestamp-micros'},
+    'DATE': {'type': 'int', 'logicalType': 'date'},
+    'TIME': {'type': 'long', 'logicalType': 'time-micros'}
+}
+
+
+def _get_avro_field(field: dict, parent_name: str) -> dict:
+    if field['type'] == 'RECORD':
+        record_name = '_'.join([parent_name, field['name']])
+        avro_type: Any = {
+            'type': 'record',
+            'name': record_name,
+            'fields': [
+                _get_avro_field(child_field, record_name)
+                for child_field in field['fields']
+            ]
+        }
+    else:
+        avro_type = AVRO_TYPE_BY_BQ_TYPE[field['type']]
+    if field.get('mode') == 'REPEATED':
+        return {
+            'name': field['name'],
+            'type': {'type': 'array', 'items': avro_type},
+            'default': []
+        }
+    return {'name': field['name'], 'type': ['null', avro_type], 'default': None}
+
+
+def get_avro_schema(schema: List[dict], name: str = 'root') -> dict:
+    return {
+        'type': 'record',
+        'name': name,
+        'fields': [_get_avro_field(field, name) for field in schema]
+    }
+
+
+def write_parquet_records(records: Iterable[dict], file: IO[bytes], schema: List[dict]):
+    import pyarrow  # pylint: disable=import-outside-toplevel
+    import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+    table = pyarrow.Table.from_pylist(
+        [convert_record_for_schema(record, schema) for record in records],
+        schema=get_arrow_schema(schema)
+    )
+    pyarrow.parquet.write_table(table, file)
+
+
+def write_avro_records(records: Iterable[dict], file: IO[bytes], schema: List[dict]):
+    import fastavro  # pylint: disable=import-outside-toplevel
+    fastavro.writer(
+        file,
+        fastavro.parse_schema(get_avro_schema(schema)),
+        (convert_record_for_schema(record, schema) for record in records)
+    )
+
+
+def write_columnar_records(
+        records: Iterable[dict],
+        file: IO[bytes],
+        load_format: str,
+        schema: List[dict]):
+    # pyarrow and fastavro are imported lazily, when using the respective format
+    if load_format == LoadFormat.PARQUET:
+        write_parquet_records(records, file, schema)
+    elif load_format == LoadFormat.AVRO:
+        write_avro_records(records, file, schema)
+    else:
+        raise ValueError(f'not a columnar load format: {load_format}')
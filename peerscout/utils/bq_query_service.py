@@ -1,26 +1,112 @@
 import logging
-from typing import Iterable, Optional, Union
+from typing import Any, Iterable, List, Optional, Union
 
 from google.cloud import bigquery
 
+from peerscout.utils.background_worker import iter_prefetched
+from peerscout.utils.client_registry import (
+    BIGQUERY_CLIENT_KEY,
+    BIGQUERY_STORAGE_CLIENT_KEY,
+    get_or_create_client
+)
+
 LOGGER = logging.getLogger(__name__)
 
 
+class BqQueryResultMode:
+    # each row converted to a dict, read via the REST API
+    ROWS = 'rows'
+    # Arrow record batches, read via the Storage Read API (if available)
+    ARROW = 'arrow'
+
+
+DEFAULT_QUERY_RESULT_MODE = BqQueryResultMode.ROWS
+
+# the number of result pages (or record batches) retrieved in the background,
+# while the previous page is being processed
+DEFAULT_PREFETCH_PAGE_COUNT = 1
+
+
+def get_query_result_mode(result_mode: Optional[str]) -> str:
+    if not result_mode:
+        return DEFAULT_QUERY_RESULT_MODE
+    result_mode = result_mode.lower()
+    if result_mode not in {BqQueryResultMode.ROWS, BqQueryResultMode.ARROW}:
+        raise ValueError(
+            f'unsupported query result mode: {result_mode}'
+            f' (expected one of {[BqQueryResultMode.ROWS, BqQueryResultMode.ARROW]})'
+        )
+    return result_mode
+
+
+def get_bigquery_storage_client() -> Optional[Any]:
+    # google-cloud-bigquery-storage is optional, without it the Arrow record
+    # batches are downloaded via the REST API
+    try:
+        # pylint: disable=import-outside-toplevel
+        from google.cloud.bigquery_storage import BigQueryReadClient
+    except ImportError:
+        LOGGER.info(
+            'google-cloud-bigquery-storage not available,'
+            ' downloading record batches via the REST API'
+        )
+        return None
+    return get_or_create_client(
+        BIGQUERY_STORAGE_CLIENT_KEY,
+        BigQueryReadClient
+    )
+
+
 class BqQueryResult:
-    def __init__(self, row_iterator: bigquery.table.RowIterator):
+    def __init__(
+            self,
+            row_iterator: bigquery.table.RowIterator,
+            result_mode: str = DEFAULT_QUERY_RESULT_MODE,
+            prefetch_page_count: int = DEFAULT_PREFETCH_PAGE_COUNT):
         self.row_iterator = row_iterator
         self.total_rows = row_iterator.total_rows
+        self.result_mode = get_query_result_mode(result_mode)
+        self.prefetch_page_count = prefetch_page_count
+
+    def iter_arrow_batches(self) -> Iterable[Any]:
+        # pyarrow.RecordBatch objects, e.g. for stages able to process columns
+        return self.row_iterator.to_arrow_iterable(
+            bqstorage_client=get_bigquery_storage_client()
+        )
+
+    def iter_record_batches(self) -> Iterable[List[dict]]:
+        for arrow_batch in self.iter_arrow_batches():
+            yield arrow_batch.to_pylist()
+
+    def iter_page_records(self) -> Iterable[List[dict]]:
+        # the rows of each result page (each page is one request to the REST API)
+        if self.total_rows == 0:
+            # e.g. the empty row iterator of a query without results does not support pages
+            return
+        for page in self.row_iterator.pages:
+            yield [dict(row) for row in page]
 
     def __iter__(self):
-        for row in self.row_iterator:
-            yield dict(row)
+        record_batches = (
+            self.iter_record_batches()
+            if self.result_mode == BqQueryResultMode.ARROW
+            else self.iter_page_records()
+        )
+        for record_batch in iter_prefetched(
+                record_batches,
+                max_prefetch_count=self.prefetch_page_count,
+                name='bq-query-result-prefetch'):
+            yield from record_batch
 
 
 # pylint: disable=too-few-public-methods
 class BqQuery:
 
     def __init__(self, project_name: Optional[str] = None):
-        self.bigquery_client = bigquery.Client(project=project_name)
+        self.bigquery_client = get_or_create_client(
+            (BIGQUERY_CLIENT_KEY, project_name),
+            lambda: bigquery.Client(project=project_name)
+        )
 
     def simple_query(
             self,
@@ -28,7 +114,10 @@ class BqQuery:
             gcp_project: str,
             dataset: str,
             table: Optional[str] = None,
-            latest_state_value: Optional[str] = None
+            latest_state_value: Optional[str] = None,
+            result_mode: str = DEFAULT_QUERY_RESULT_MODE,
+            page_size: Optional[int] = None,
+            prefetch_page_count: int = DEFAULT_PREFETCH_PAGE_COUNT
     ) -> Union[BqQueryResult, Iterable[dict]]:
         _query = query_template.format(
             project=gcp_project, dataset=dataset, table=table,
@@ -36,4 +125,8 @@ class BqQuery:
         ).strip()
         LOGGER.debug("running query:\n%s", _query)
         query_job = self.bigquery_client.query(_query)
-        return BqQueryResult(query_job.result())
+        return BqQueryResult(
+            query_job.result(page_size=page_size),
+            result_mode=result_mode,
+            prefetch_page_count=prefetch_page_count
+        )
@@ -0,0 +1,34 @@
+import logging
+import threading
+from collections.abc import Hashable
+from typing import Any, Callable, Dict, TypeVar
+
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+# clients are reused for the life of the process (e.g. their connection pools),
+# keyed by service and any parameters the client was created with
+_CLIENT_BY_KEY: Dict[Hashable, Any] = {}
+_CLIENT_REGISTRY_LOCK = threading.Lock()
+
+BIGQUERY_CLIENT_KEY = 'bigquery'
+BIGQUERY_STORAGE_CLIENT_KEY = 'bigquery_storage'
+S3_CLIENT_KEY = 's3'
+
+
+def get_or_create_client(key: Hashable, create_client: Callable[[], T]) -> T:
+    with _CLIENT_REGISTRY_LOCK:
+        client = _CLIENT_BY_KEY.get(key)
+        if client is None:
+            LOGGER.debug('creating client: %r', key)
+            client = create_client()
+            _CLIENT_BY_KEY[key] = client
+        return client
+
+
+def clear_clients():
+    with _CLIENT_REGISTRY_LOCK:
+        _CLIENT_BY_KEY.clear()
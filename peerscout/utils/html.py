@@ -1,4 +1,7 @@
+import re
+from html import unescape
 from html.parser import HTMLParser
+from typing import Iterable, List, Optional
 
 
 class MarkupStrippingHtmlParser(HTMLParser):
@@ -17,7 +20,64 @@ class MarkupStrippingHtmlParser(HTMLParser):
         raise message
 
 
-def strip_tags(text: str) -> str:
+# start or end tags without comments, declarations or unusual attribute syntax
+SIMPLE_TAG_PATTERN = re.compile(
+    r'<(/?)([a-zA-Z][a-zA-Z0-9]*)'
+    r'(?:\s+[a-zA-Z_:][-\w:.]*(?:\s*=\s*(?:"[^"]*"|\'[^\']*\'|[^\s"\'=<>`]+))?)*'
+    r'\s*/?>'
+)
+
+# tags whose content the html parser does not treat as regular markup
+NON_SIMPLE_CONTENT_TAG_NAMES = {
+    'iframe', 'noembed', 'noframes', 'noscript', 'plaintext',
+    'script', 'style', 'textarea', 'title', 'xmp'
+}
+
+# the html parser holds back a trailing char ref that may be incomplete
+# (and the data before it, unless the parser is closed)
+INCOMPLETE_TRAILING_CHAR_REF_PATTERN = re.compile(r'&[^\s;]*$')
+INCOMPLETE_TRAILING_CHAR_REF_MAX_LENGTH = 34
+
+
+def strip_tags_using_html_parser(text: str) -> str:
     stripper = MarkupStrippingHtmlParser()
     stripper.feed(text)
     return stripper.get_data()
+
+
+def _strip_simple_tags(text: str) -> Optional[str]:
+    # returns None if the text requires the html parser
+    data_list = []
+    position = 0
+    for match in SIMPLE_TAG_PATTERN.finditer(text):
+        if match.group(2).lower() in NON_SIMPLE_CONTENT_TAG_NAMES:
+            return None
+        data_list.append(text[position:match.start()])
+        position = match.end()
+    tail = text[position:]
+    if INCOMPLETE_TRAILING_CHAR_REF_PATTERN.search(
+        tail[-INCOMPLETE_TRAILING_CHAR_REF_MAX_LENGTH:]
+    ):
+        return None
+    data_list.append(tail)
+    if any('<' in data for data in data_list):
+        return None
+    return ''.join(
+        unescape(data) if '&' in data else data
+        for data in data_list
+    )
+
+
+def strip_tags(text: str) -> str:
+    # same result as strip_tags_using_html_parser, without creating a parser
+    # for texts without markup or with simple tags only
+    if '<' not in text and '&' not in text:
+        return text
+    result = _strip_simple_tags(text)
+    if result is None:
+        return strip_tags_using_html_parser(text)
+    return result
+
+
+def strip_tags_list(text_list: Iterable[str]) -> List[str]:
+    return [strip_tags(text) for text in text_list]
@@ -0,0 +1,127 @@
+import gzip
+import json
+import json.encoder
+from typing import IO, Any, Callable, Optional, Union
+
+
+JsonEncode = Callable[[Any], str]
+
+
+class JsonEncoderName:
+    FAST = 'fast'
+    STDLIB = 'stdlib'
+
+
+DEFAULT_JSON_ENCODER_NAME = JsonEncoderName.FAST
+
+
+class LoadCompression:
+    NONE = 'none'
+    GZIP = 'gzip'
+
+
+DEFAULT_GZIP_COMPRESS_LEVEL = 6
+
+
+def get_stdlib_json_encode() -> JsonEncode:
+    # same output as json.dumps(value, ensure_ascii=False),
+    # without creating an encoder for every call
+    return json.JSONEncoder(ensure_ascii=False).encode
+
+
+def get_fast_json_encode() -> Optional[JsonEncode]:
+    # the C accelerated encoder of the json module, created once and without
+    # the check for circular references (None if the accelerator is not available)
+    c_make_encoder = getattr(json.encoder, 'c_make_encoder', None)
+    c_encode_basestring = getattr(json.encoder, 'c_encode_basestring', None)
+    if c_make_encoder is None or c_encode_basestring is None:
+        return None
+    stdlib_encoder = json.JSONEncoder(ensure_ascii=False)
+    iterencode = c_make_encoder(
+        None,
+        stdlib_encoder.default,
+        c_encode_basestring,
+        None,
+        stdlib_encoder.key_separator,
+        stdlib_encoder.item_separator,
+        stdlib_encoder.sort_keys,
+        stdlib_encoder.skipkeys,
+        stdlib_encoder.allow_nan
+    )
+
+    def encode(value: Any) -> str:
+        if isinstance(value, str):
+            return c_encode_basestring(value)
+        return ''.join(iterencode(value, 0))
+    return encode
+
+
+def get_json_encode(encoder_name: Optional[str] = None) -> JsonEncode:
+    encoder_name = (encoder_name or DEFAULT_JSON_ENCODER_NAME).lower()
+    if encoder_name == JsonEncoderName.FAST:
+        return get_fast_json_encode() or get_stdlib_json_encode()
+    if encoder_name == JsonEncoderName.STDLIB:
+        return get_stdlib_json_encode()
+    raise ValueError(
+        f'unsupported json encoder: {encoder_name}'
+        f' (expected one of {[JsonEncoderName.FAST, JsonEncoderName.STDLIB]})'
+    )
+
+
+def get_load_compression(compression: Optional[str]) -> str:
+    if not compression:
+        return LoadCompression.NONE
+    compression = compression.lower()
+    if compression not in {LoadCompression.NONE, LoadCompression.GZIP}:
+        raise ValueError(
+            f'unsupported load compression: {compression}'
+            f' (expected one of {[LoadCompression.NONE, LoadCompression.GZIP]})'
+        )
+    return compression
+
+
+class JsonLinesWriter:
+    # Writes records as newline delimited JSON (UTF-8), optionally gzip compressed.
+    # Nothing is written to the file if no records were written.
+    def __init__(
+            self,
+            write_file: IO[bytes],
+            encode: Optional[JsonEncode] = None,
+            compression: str = LoadCompression.NONE,
+            compress_level: int = DEFAULT_GZIP_COMPRESS_LEVEL):
+        self.write_file = write_file
+        self.encode = encode or get_json_encode()
+        self.compression = get_load_compression(compression)
+        self.compress_level = compress_level
+        self.record_count = 0
+        self._target_file: Optional[Union[IO[bytes], gzip.GzipFile]] = None
+
+    def _get_target_file(self) -> Union[IO[bytes], gzip.GzipFile]:
+        if self._target_file is None:
+            if self.compression == LoadCompression.GZIP:
+                # mtime=0 for reproducible output, the write file is not closed
+                self._target_file = gzip.GzipFile(
+                    fileobj=self.write_file,
+                    mode='wb',
+                    compresslevel=self.compress_level,
+                    mtime=0
+                )
+            else:
+                self._target_file = self.write_file
+        return self._target_file
+
+    def write(self, record: Any):
+        self._get_target_file().write((self.encode(record) + '\n').encode('utf-8'))
+        self.record_count += 1
+
+    def close(self):
+        if self._target_file is not None and self._target_file is not self.write_file:
+            # writes the remaining compressed data and the gzip trailer
+            self._target_file.close()
+        self._target_file = None
+
+    def __enter__(self) -> 'JsonLinesWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,12 +1,21 @@
+import json
 from contextlib import contextmanager
+from typing import Any
+
 import yaml
 import boto3
 from botocore.exceptions import ClientError
 
+from peerscout.utils.client_registry import S3_CLIENT_KEY, get_or_create_client
+
+
+def get_s3_client():
+    return get_or_create_client(S3_CLIENT_KEY, lambda: boto3.client("s3"))
+
 
 @contextmanager
 def s3_open_binary_read(bucket: str, object_key: str):
-    s3_client = boto3.client("s3")
+    s3_client = get_s3_client()
     response = s3_client.get_object(Bucket=bucket, Key=object_key)
     streaming_body = response["Body"]
     try:
@@ -22,6 +31,13 @@ def download_s3_yaml_object_as_json(bucket: str, object_key: str) -> dict:
         return yaml.safe_load(streaming_body)
 
 
+def download_s3_json_object(bucket: str, object_key: str) -> Any:
+    with s3_open_binary_read(
+            bucket=bucket, object_key=object_key
+    ) as streaming_body:
+        return json.load(streaming_body)
+
+
 def get_stored_state(
         state_file_bucket_name,
         state_file_object_name
@@ -44,12 +60,12 @@ def get_stored_state(
 
 
 def upload_s3_object(bucket: str, object_key: str, data_object):
-    s3_client = boto3.client("s3")
+    s3_client = get_s3_client()
     s3_client.put_object(Body=data_object, Bucket=bucket, Key=object_key)
 
 
 def delete_s3_object(bucket, object_key):
-    s3_client = boto3.client('s3')
+    s3_client = get_s3_client()
     s3_client.delete_object(
         Bucket=bucket,
         Key=object_key
@@ -1,8 +1,15 @@
-from unittest.mock import patch
+from typing import List
+from unittest.mock import patch, MagicMock
 import pytest
 
+from google.cloud.exceptions import NotFound
+
 from peerscout.utils.bq_data_service import (
+    BqLoadJobManager,
+    BqTableSchemaCache,
+    has_new_schema_fields,
     load_file_into_bq,
+    start_load_file_object_into_bq,
 )
 import peerscout.utils.bq_data_service \
     as bq_data_service_module
@@ -68,3 +75,172 @@ def test_load_file_into_bq(
     mock_bq_client.load_table_from_file.assert_called_with(
         source_file, destination=table_ref,
         job_config=mock_load_job_config.return_value)
+
+
+def test_start_load_file_object_into_bq(
+        mock_load_job_config,
+        mock_bq_client_class):
+    source_file = MagicMock(name='source_file')
+    load_job = start_load_file_object_into_bq(
+        source_file,
+        dataset_name="dataset_name",
+        table_name="table_name",
+        project_name="project_name")
+    mock_bq_client = mock_bq_client_class.return_value
+    table_ref = mock_bq_client.dataset("dataset_name").table("table_name")
+    mock_bq_client.load_table_from_file.assert_called_with(
+        source_file, destination=table_ref,
+        job_config=mock_load_job_config.return_value)
+    assert load_job == mock_bq_client.load_table_from_file.return_value
+
+
+def _get_load_job_mock(name: str, done: bool = False) -> MagicMock:
+    job = MagicMock(name=name)
+    job.done.return_value = done
+    return job
+
+
+class TestBqLoadJobManager:
+    def test_should_not_wait_for_jobs_below_in_flight_limit(self):
+        job_1 = _get_load_job_mock('job_1')
+        job_2 = _get_load_job_mock('job_2')
+        load_job_manager = BqLoadJobManager(max_in_flight_count=2)
+        load_job_manager.submit(job_1)
+        load_job_manager.submit(job_2)
+        job_1.result.assert_not_called()
+        assert load_job_manager.pending_count == 2
+
+    def test_should_wait_for_oldest_job_when_reaching_in_flight_limit(self):
+        job_1 = _get_load_job_mock('job_1')
+        job_2 = _get_load_job_mock('job_2')
+        load_job_manager = BqLoadJobManager(max_in_flight_count=1)
+        load_job_manager.submit(job_1)
+        load_job_manager.submit(job_2)
+        job_1.result.assert_called()
+        job_2.result.assert_not_called()
+
+    def test_should_wait_for_oldest_job_before_starting_job_at_in_flight_limit(self):
+        called: List[str] = []
+        job_1 = _get_load_job_mock('job_1')
+        load_job_manager = BqLoadJobManager(max_in_flight_count=1)
+        load_job_manager.submit(job_1, on_success=lambda: called.append('job_1'))
+        load_job_manager.wait_for_capacity()
+        job_1.result.assert_called()
+        assert called == ['job_1']
+        assert load_job_manager.pending_count == 0
+
+    def test_should_call_on_success_callbacks_in_order(self):
+        called: List[str] = []
+        load_job_manager = BqLoadJobManager(max_in_flight_count=3)
+        load_job_manager.submit(
+            _get_load_job_mock('job_1'), on_success=lambda: called.append('job_1')
+        )
+        load_job_manager.submit(
+            _get_load_job_mock('job_2', done=True), on_success=lambda: called.append('job_2')
+        )
+        assert not called
+        load_job_manager.wait_for_all()
+        assert called == ['job_1', 'job_2']
+        assert load_job_manager.pending_count == 0
+
+    def test_should_complete_done_jobs_when_submitting(self):
+        called: List[str] = []
+        load_job_manager = BqLoadJobManager(max_in_flight_count=3)
+        load_job_manager.submit(
+            _get_load_job_mock('job_1', done=True), on_success=lambda: called.append('job_1')
+        )
+        load_job_manager.submit(_get_load_job_mock('job_2'))
+        assert called == ['job_1']
+
+    def test_should_call_on_success_callback_without_job(self):
+        called: List[str] = []
+        load_job_manager = BqLoadJobManager()
+        load_job_manager.submit(None, on_success=lambda: called.append('no job'))
+        load_job_manager.wait_for_all()
+        assert called == ['no job']
+
+    def test_should_not_call_on_success_of_later_jobs_after_failure(self):
+        called: List[str] = []
+        job_1 = _get_load_job_mock('job_1')
+        job_1.result.side_effect = RuntimeError('load failed')
+        load_job_manager = BqLoadJobManager(max_in_flight_count=3)
+        load_job_manager.submit(job_1, on_success=lambda: called.append('job_1'))
+        load_job_manager.submit(
+            _get_load_job_mock('job_2', done=True), on_success=lambda: called.append('job_2')
+        )
+        with pytest.raises(RuntimeError):
+            load_job_manager.wait_for_all()
+        assert not called
+
+
+SCHEMA_1 = [{'name': 'field1', 'type': 'STRING', 'mode': 'NULLABLE'}]
+SCHEMA_WITH_NEW_FIELD = SCHEMA_1 + [
+    {'name': 'field2', 'type': 'STRING', 'mode': 'NULLABLE'}
+]
+RECORD_SCHEMA_1 = [{
+    'name': 'record1', 'type': 'RECORD', 'mode': 'NULLABLE', 'fields': SCHEMA_1
+}]
+RECORD_SCHEMA_WITH_NEW_FIELD = [{
+    'name': 'record1', 'type': 'RECORD', 'mode': 'NULLABLE', 'fields': SCHEMA_WITH_NEW_FIELD
+}]
+
+
+class TestHasNewSchemaFields:
+    def test_should_return_false_for_same_schema(self):
+        assert not has_new_schema_fields(SCHEMA_1, SCHEMA_1)
+
+    def test_should_return_false_for_fewer_fields(self):
+        assert not has_new_schema_fields(SCHEMA_WITH_NEW_FIELD, SCHEMA_1)
+
+    def test_should_ignore_case_of_field_names(self):
+        assert not has_new_schema_fields(
+            SCHEMA_1, [{**SCHEMA_1[0], 'name': 'FIELD1'}]
+        )
+
+    def test_should_return_true_for_new_field(self):
+        assert has_new_schema_fields(SCHEMA_1, SCHEMA_WITH_NEW_FIELD)
+
+    def test_should_return_true_for_new_nested_field(self):
+        assert has_new_schema_fields(RECORD_SCHEMA_1, RECORD_SCHEMA_WITH_NEW_FIELD)
+
+
+class TestBqTableSchemaCache:
+    def test_should_create_table_only_once_if_it_does_not_exist(
+            self, mock_bq_client_class):
+        mock_bq_client = mock_bq_client_class.return_value
+        mock_bq_client.get_table.side_effect = NotFound('not found')
+        schema_cache = BqTableSchemaCache()
+        for _ in range(3):
+            schema_cache.create_or_extend_table_schema(
+                'project1', 'dataset1', 'table1', SCHEMA_1
+            )
+        mock_bq_client.get_table.assert_called_once()
+        mock_bq_client.create_table.assert_called_once()
+
+    def test_should_not_update_table_without_new_fields(
+            self, mock_bq_client_class):
+        mock_bq_client = mock_bq_client_class.return_value
+        mock_bq_client.get_table.return_value.schema = [
+            MagicMock(**{'to_api_repr.return_value': SCHEMA_1[0]})
+        ]
+        schema_cache = BqTableSchemaCache()
+        for _ in range(3):
+            schema_cache.create_or_extend_table_schema(
+                'project1', 'dataset1', 'table1', SCHEMA_1
+            )
+        mock_bq_client.get_table.assert_called_once()
+        mock_bq_client.create_table.assert_not_called()
+        mock_bq_client.update_table.assert_not_called()
+
+    def test_should_update_table_once_with_new_fields(
+            self, mock_bq_client_class):
+        mock_bq_client = mock_bq_client_class.return_value
+        mock_bq_client.get_table.return_value.schema = [
+            MagicMock(**{'to_api_repr.return_value': SCHEMA_1[0]})
+        ]
+        schema_cache = BqTableSchemaCache()
+        for _ in range(3):
+            schema_cache.create_or_extend_table_schema(
+                'project1', 'dataset1', 'table1', SCHEMA_WITH_NEW_FIELD
+            )
+        mock_bq_client.update_table.assert_called_once()
@@ -2,6 +2,8 @@ import logging
 
 import pytest
 
+from peerscout.utils.client_registry import clear_clients
+
 
 @pytest.fixture(scope='session', autouse=True)
 def setup_logging():
@@ -9,3 +11,11 @@ def setup_logging():
     logging.basicConfig(level='INFO')
     logging.getLogger('tests').setLevel('DEBUG')
     logging.getLogger('peerscout').setLevel('DEBUG')
+
+
+@pytest.fixture(autouse=True)
+def _clear_clients():
+    # clients may otherwise be (mock) clients created by previous tests
+    clear_clients()
+    yield
+    clear_clients()
@@ -0,0 +1,180 @@
+import json
+from unittest.mock import patch, MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+
+import peerscout.keyword_extract.content_hash_index as content_hash_index_module
+from peerscout.keyword_extract.keyword_extract_config import KeywordExtractConfig
+from peerscout.keyword_extract.content_hash_index import (
+    ContentHashIndex,
+    commit_content_hash_index,
+    get_content_hash,
+    get_content_hash_index,
+    get_content_hash_index_object_name,
+    get_keyword_extraction_version
+)
+
+
+KEYWORD_EXTRACT_CONFIG_DICT = {
+    'pipelineID': 'pipeline1',
+    'contentHashIndexObjectName': 'index1.json',
+    'textField': 'text',
+    'idField': 'id',
+    'tableWriteAppend': 'true'
+}
+
+EXTRACTION_VERSION = 'version1'
+
+
+def _iter_changed_records(content_hash_index: ContentHashIndex, records: list) -> list:
+    return list(content_hash_index.iter_changed_records(
+        records,
+        id_field='id',
+        text_field='text',
+        existing_keyword_field='existing_keywords',
+        extraction_version=EXTRACTION_VERSION
+    ))
+
+
+@pytest.fixture(name='download_s3_json_object_mock')
+def _download_s3_json_object_mock():
+    with patch.object(content_hash_index_module, 'download_s3_json_object') as mock:
+        yield mock
+
+
+@pytest.fixture(name='upload_s3_object_mock')
+def _upload_s3_object_mock():
+    with patch.object(content_hash_index_module, 'upload_s3_object') as mock:
+        yield mock
+
+
+class TestGetContentHash:
+    def test_should_return_same_hash_for_same_content(self):
+        assert (
+            get_content_hash('text1', 'keyword1', EXTRACTION_VERSION)
+            == get_content_hash('text1', 'keyword1', EXTRACTION_VERSION)
+        )
+
+    def test_should_return_different_hash_for_changed_content(self):
+        content_hash = get_content_hash('text1', 'keyword1', EXTRACTION_VERSION)
+        assert get_content_hash('text2', 'keyword1', EXTRACTION_VERSION) != content_hash
+        assert get_content_hash('text1', 'keyword2', EXTRACTION_VERSION) != content_hash
+        assert get_content_hash('text1', 'keyword1', 'version2') != content_hash
+
+
+class TestGetKeywordExtractionVersion:
+    def test_should_depend_on_spacy_language_model(self):
+        assert get_keyword_extraction_version(KeywordExtractConfig(
+            KEYWORD_EXTRACT_CONFIG_DICT, spacy_language_model='model1'
+        )) != get_keyword_extraction_version(KeywordExtractConfig(
+            KEYWORD_EXTRACT_CONFIG_DICT, spacy_language_model='model2'
+        ))
+
+    def test_should_depend_on_max_text_length(self):
+        assert get_keyword_extraction_version(KeywordExtractConfig(
+            KEYWORD_EXTRACT_CONFIG_DICT
+        )) != get_keyword_extraction_version(KeywordExtractConfig(
+            {**KEYWORD_EXTRACT_CONFIG_DICT, 'maxTextLength': 1000}
+        ))
+
+    def test_should_depend_on_reparse_derived_keywords(self):
+        assert get_keyword_extraction_version(KeywordExtractConfig(
+            KEYWORD_EXTRACT_CONFIG_DICT
+        )) != get_keyword_extraction_version(KeywordExtractConfig(
+            {**KEYWORD_EXTRACT_CONFIG_DICT, 'reparseDerivedKeywords': True}
+        ))
+
+
+class TestContentHashIndex:
+    def test_should_pass_on_new_and_changed_records_only(self):
+        content_hash_index = ContentHashIndex({
+            '1': get_content_hash('text1', None, EXTRACTION_VERSION),
+            '2': get_content_hash('text2', None, EXTRACTION_VERSION)
+        })
+        records = [
+            {'id': 1, 'text': 'text1'},
+            {'id': 2, 'text': 'changed text2'},
+            {'id': 3, 'text': 'text3'},
+            {'text': 'without id'}
+        ]
+        assert _iter_changed_records(content_hash_index, records) == records[1:]
+        assert content_hash_index.unchanged_count == 1
+        assert content_hash_index.changed_count == 2
+
+    def test_should_only_update_hashes_of_committed_ids(self):
+        content_hash_index = ContentHashIndex()
+        _iter_changed_records(content_hash_index, [
+            {'id': 1, 'text': 'text1'}, {'id': 2, 'text': 'text2'}
+        ])
+        content_hash_index.commit([1, None])
+        assert content_hash_index.hash_by_id == {
+            '1': get_content_hash('text1', None, EXTRACTION_VERSION)
+        }
+        assert _iter_changed_records(content_hash_index, [
+            {'id': 1, 'text': 'text1'}, {'id': 2, 'text': 'text2'}
+        ]) == [{'id': 2, 'text': 'text2'}]
+
+    def test_should_serialize_as_json(self):
+        assert json.loads(ContentHashIndex({'1': 'hash1'}).to_json()) == {'1': 'hash1'}
+
+
+class TestCommitContentHashIndex:
+    def test_should_only_save_index_every_save_interval_commits(
+            self, upload_s3_object_mock: MagicMock):
+        keyword_extract_config = KeywordExtractConfig({
+            **KEYWORD_EXTRACT_CONFIG_DICT, 'contentHashIndexSaveInterval': 2
+        })
+        content_hash_index = ContentHashIndex(bucket='bucket1', object_name='index1.json')
+        _iter_changed_records(content_hash_index, [{'id': 1, 'text': 'text1'}])
+        commit_content_hash_index(content_hash_index, [], keyword_extract_config)
+        upload_s3_object_mock.assert_not_called()
+        commit_content_hash_index(content_hash_index, [1], keyword_extract_config)
+        upload_s3_object_mock.assert_called_once()
+        assert upload_s3_object_mock.call_args[1]['object_key'] == 'index1.json'
+        assert json.loads(upload_s3_object_mock.call_args[1]['data_object']) == {
+            '1': get_content_hash('text1', None, EXTRACTION_VERSION)
+        }
+        assert content_hash_index.unsaved_commit_count == 0
+
+
+class TestGetContentHashIndexObjectName:
+    def test_should_return_none_if_not_configured(self):
+        assert get_content_hash_index_object_name(KeywordExtractConfig({
+            **KEYWORD_EXTRACT_CONFIG_DICT, 'contentHashIndexObjectName': None
+        })) is None
+
+    def test_should_add_shard_to_object_name(self):
+        assert get_content_hash_index_object_name(KeywordExtractConfig(
+            KEYWORD_EXTRACT_CONFIG_DICT, shard_index=1, shard_count=2
+        )) == 'index1.json.shard-1-of-2'
+
+
+class TestGetContentHashIndex:
+    def test_should_load_stored_index(self, download_s3_json_object_mock: MagicMock):
+        download_s3_json_object_mock.return_value = {'1': 'hash1'}
+        content_hash_index = get_content_hash_index(
+            KeywordExtractConfig(KEYWORD_EXTRACT_CONFIG_DICT), 'bucket1'
+        )
+        assert content_hash_index is not None
+        assert content_hash_index.hash_by_id == {'1': 'hash1'}
+        assert content_hash_index.bucket == 'bucket1'
+        assert content_hash_index.object_name == 'index1.json'
+        download_s3_json_object_mock.assert_called_with('bucket1', 'index1.json')
+
+    def test_should_return_empty_index_if_not_stored_yet(
+            self, download_s3_json_object_mock: MagicMock):
+        download_s3_json_object_mock.side_effect = ClientError(
+            {'Error': {'Code': 'NoSuchKey'}}, 'GetObject'
+        )
+        content_hash_index = get_content_hash_index(
+            KeywordExtractConfig(KEYWORD_EXTRACT_CONFIG_DICT), 'bucket1'
+        )
+        assert content_hash_index is not None
+        assert not content_hash_index.hash_by_id
+
+    def test_should_require_table_write_append(self):
+        with pytest.raises(ValueError):
+            get_content_hash_index(KeywordExtractConfig({
+                **KEYWORD_EXTRACT_CONFIG_DICT, 'tableWriteAppend': 'false'
+            }), 'bucket1')
@@ -0,0 +1,164 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from peerscout.keyword_extract import keyword_cache as keyword_cache_module
+from peerscout.keyword_extract.keyword_cache import (
+    SECONDS_PER_DAY,
+    get_keyword_cache_key,
+    InMemoryKeywordCache,
+    LayeredKeywordCache,
+    SqliteKeywordCache
+)
+
+
+@pytest.fixture(name='time_mock')
+def _time_mock():
+    with patch.object(keyword_cache_module, 'time') as mock:
+        mock.time.return_value = 1000.0
+        yield mock.time
+
+
+class TestGetKeywordCacheKey:
+    def test_should_return_same_key_for_same_text_and_model(self):
+        assert (
+            get_keyword_cache_key('text1', 'model1')
+            == get_keyword_cache_key('text1', 'model1')
+        )
+
+    def test_should_return_different_key_for_different_model(self):
+        assert (
+            get_keyword_cache_key('text1', 'model1')
+            != get_keyword_cache_key('text1', 'model2')
+        )
+
+
+class TestInMemoryKeywordCache:
+    def test_should_return_none_for_missing_key(self):
+        assert InMemoryKeywordCache().get('key1') is None
+
+    def test_should_return_put_keywords(self):
+        keyword_cache = InMemoryKeywordCache()
+        keyword_cache.put('key1', ['keyword1'])
+        assert keyword_cache.get('key1') == ['keyword1']
+
+    def test_should_remove_least_recently_used_keywords(self):
+        keyword_cache = InMemoryKeywordCache(max_size=2)
+        keyword_cache.put('key1', ['keyword1'])
+        keyword_cache.put('key2', ['keyword2'])
+        keyword_cache.get('key1')
+        keyword_cache.put('key3', ['keyword3'])
+        assert len(keyword_cache) == 2
+        assert keyword_cache.get('key1') == ['keyword1']
+        assert keyword_cache.get('key2') is None
+
+
+class TestLayeredKeywordCache:
+    def test_should_return_keywords_of_later_layer_and_add_to_earlier_layer(self):
+        first_keyword_cache = InMemoryKeywordCache()
+        second_keyword_cache = InMemoryKeywordCache()
+        second_keyword_cache.put('key1', ['keyword1'])
+        keyword_cache = LayeredKeywordCache([first_keyword_cache, second_keyword_cache])
+        assert keyword_cache.get('key1') == ['keyword1']
+        assert first_keyword_cache.get('key1') == ['keyword1']
+
+    def test_should_put_keywords_into_all_layers(self):
+        first_keyword_cache = InMemoryKeywordCache()
+        second_keyword_cache = InMemoryKeywordCache()
+        keyword_cache = LayeredKeywordCache([first_keyword_cache, second_keyword_cache])
+        keyword_cache.put('key1', ['keyword1'])
+        assert first_keyword_cache.get('key1') == ['keyword1']
+        assert second_keyword_cache.get('key1') == ['keyword1']
+
+    def test_should_return_none_if_missing_in_all_layers(self):
+        keyword_cache = LayeredKeywordCache([InMemoryKeywordCache(), InMemoryKeywordCache()])
+        assert keyword_cache.get('key1') is None
+
+
+class TestSqliteKeywordCache:
+    def test_should_return_none_for_missing_key(self, tmp_path: Path):
+        keyword_cache = SqliteKeywordCache(str(tmp_path / 'cache.db'), rule_version='1')
+        assert keyword_cache.get('key1') is None
+
+    def test_should_return_keywords_persisted_by_previous_instance(self, tmp_path: Path):
+        path = str(tmp_path / 'cache.db')
+        keyword_cache = SqliteKeywordCache(path, rule_version='1')
+        keyword_cache.put('key1', ['keyword1', 'keyword2'])
+        keyword_cache.close()
+        keyword_cache = SqliteKeywordCache(path, rule_version='1')
+        assert keyword_cache.get('key1') == ['keyword1', 'keyword2']
+
+    def test_should_ignore_keywords_of_different_rule_version(self, tmp_path: Path):
+        path = str(tmp_path / 'cache.db')
+        keyword_cache = SqliteKeywordCache(path, rule_version='1')
+        keyword_cache.put('key1', ['keyword1'])
+        keyword_cache.close()
+        keyword_cache = SqliteKeywordCache(path, rule_version='2')
+        assert keyword_cache.get('key1') is None
+
+    def test_should_prune_least_recently_used_entries_beyond_max_entries(
+            self, tmp_path: Path, time_mock):
+        keyword_cache = SqliteKeywordCache(
+            str(tmp_path / 'cache.db'), rule_version='1', max_entries=2
+        )
+        time_mock.return_value = 1000.0
+        keyword_cache.put('key1', ['keyword1'])
+        time_mock.return_value = 1001.0
+        keyword_cache.put('key2', ['keyword2'])
+        time_mock.return_value = 1002.0
+        keyword_cache.put('key3', ['keyword3'])
+        time_mock.return_value = 1003.0
+        keyword_cache.get('key1')
+        keyword_cache.prune()
+        assert len(keyword_cache) == 2
+        assert keyword_cache.get('key1') == ['keyword1']
+        assert keyword_cache.get('key2') is None
+
+    def test_should_prune_entries_older_than_max_age_days(
+            self, tmp_path: Path, time_mock):
+        keyword_cache = SqliteKeywordCache(
+            str(tmp_path / 'cache.db'), rule_version='1', max_age_days=1
+        )
+        time_mock.return_value = 1000.0
+        keyword_cache.put('key1', ['keyword1'])
+        time_mock.return_value = 1000.0 + SECONDS_PER_DAY
+        keyword_cache.put('key2', ['keyword2'])
+        time_mock.return_value = 1000.0 + 1.5 * SECONDS_PER_DAY
+        keyword_cache.prune()
+        assert keyword_cache.get('key1') is None
+        assert keyword_cache.get('key2') == ['keyword2']
+
+    def test_should_commit_last_used_timestamp_on_flush(self, tmp_path: Path, time_mock):
+        path = str(tmp_path / 'cache.db')
+        keyword_cache = SqliteKeywordCache(path, rule_version='1')
+        keyword_cache.put('key1', ['keyword1'])
+        time_mock.return_value = 1001.0
+        keyword_cache.put('key2', ['keyword2'])
+        keyword_cache.flush()
+        time_mock.return_value = 1002.0
+        keyword_cache.get('key1')
+        keyword_cache.flush()
+        # a second connection, as if used by another run
+        other_keyword_cache = SqliteKeywordCache(path, rule_version='1', max_entries=1)
+        other_keyword_cache.prune()
+        assert other_keyword_cache.get('key1') == ['keyword1']
+        other_keyword_cache.close()
+        keyword_cache.close()
+
+    def test_should_prune_on_flush_after_prune_interval(self, tmp_path: Path, time_mock):
+        keyword_cache = SqliteKeywordCache(
+            str(tmp_path / 'cache.db'),
+            rule_version='1',
+            max_entries=1,
+            prune_interval_seconds=60
+        )
+        keyword_cache.put('key1', ['keyword1'])
+        time_mock.return_value = 1001.0
+        keyword_cache.put('key2', ['keyword2'])
+        keyword_cache.flush()
+        assert len(keyword_cache) == 2
+        time_mock.return_value = 1060.0
+        keyword_cache.flush()
+        assert len(keyword_cache) == 1
+        assert keyword_cache.get('key2') == ['keyword2']
@@ -1,4 +1,8 @@
-from unittest.mock import patch, MagicMock
+import datetime
+import json
+import threading
+from typing import List, Set
+from unittest.mock import call, patch, MagicMock
 from copy import deepcopy
 
 import pytest
@@ -6,13 +10,31 @@ import pytest
 from spacy.language import Language
 
 import peerscout.keyword_extract.keyword_extract as keyword_extract_module
+import peerscout.keyword_extract.spacy_language as spacy_language_module
+from peerscout.keyword_extract.keyword_extract_config import (
+    KeywordExtractConfig
+)
+from peerscout.keyword_extract.keyword_cache import InMemoryKeywordCache
+from peerscout.keyword_extract.spacy_keyword import get_spacy_load_profile
+from peerscout.keyword_extract.spacy_language import SpacyLanguageCache
 from peerscout.keyword_extract.keyword_extract import (
-    iter_get_batches,
+    DEFAULT_WORKER_BATCH_SIZE,
+    CachingKeywordExtractor,
+    get_keyword_cache_model_name,
+    get_keyword_extractor,
+    get_max_records_in_memory,
     to_unique_keywords,
     SimpleKeywordExtractor,
     SpacyKeywordExtractor,
     parse_keyword_list,
-    add_extracted_keywords
+    add_extracted_keywords,
+    etl_keywords,
+    update_state
+)
+from peerscout.utils.client_registry import (
+    BIGQUERY_CLIENT_KEY,
+    S3_CLIENT_KEY,
+    get_or_create_client
 )
 
 
@@ -29,21 +51,100 @@ def _spacy_keyword_document_parser_mock(
     return spacy_keyword_document_parser_class_mock.return_value
 
 
-class TestIterGetBatches:
-    def test_should_not_return_any_batches_if_iterator_produces_no_items(self):
-        assert not list(iter_get_batches(iter([]), 2))
+@pytest.fixture(name="text_keyword_parser_mock")
+def _text_keyword_parser_mock(
+        spacy_keyword_document_parser_mock: MagicMock) -> MagicMock:
+    # the keywords of each text are the text itself and a keyword common to all texts
+    spacy_keyword_document_parser_mock.iter_get_keyword_str_list.side_effect = (
+        lambda text_list: [[text, 'common'] for text in text_list]
+    )
+    return spacy_keyword_document_parser_mock
+
+
+MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT = {
+    'pipelineID': 'pipeline1',
+    'textField': 'text',
+    'tableWriteAppend': 'true'
+}
+
+
+@pytest.fixture(name="spacy_load_mock")
+def _spacy_load_mock():
+    with patch.object(spacy_language_module.spacy, "load") as mock:
+        yield mock
+
+
+@pytest.fixture(name="get_spacy_language_component_names_mock", autouse=True)
+def _get_spacy_language_component_names_mock():
+    with patch.object(
+            spacy_language_module, "get_spacy_language_component_names") as mock:
+        mock.return_value = [
+            'tok2vec', 'tagger', 'parser', 'senter', 'attribute_ruler', 'lemmatizer', 'ner'
+        ]
+        yield mock
+
 
-    def test_should_return_full_batches(self):
-        assert list(iter_get_batches(
-            iter([1, 2, 3, 4]),
-            2
-        )) == [[1, 2], [3, 4]]
+class TestGetKeywordExtractor:
+    def test_should_return_simple_keyword_extractor_without_spacy_model(self):
+        assert isinstance(
+            get_keyword_extractor(KeywordExtractConfig(
+                MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT
+            )),
+            SimpleKeywordExtractor
+        )
 
-    def test_should_return_last_partial_batch(self):
-        assert list(iter_get_batches(
-            iter([1, 2, 3, 4, 5]),
-            2
-        )) == [[1, 2], [3, 4], [5]]
+    def test_should_load_spacy_model_without_components_of_profile(
+            self, spacy_load_mock: MagicMock):
+        keyword_extractor = get_keyword_extractor(KeywordExtractConfig({
+            **MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'spacyLanguageModel': 'model1',
+            'spacyLoadProfile': 'no-ner'
+        }))
+        spacy_load_mock.assert_called_with('model1', exclude=['ner'])
+        assert isinstance(keyword_extractor, SpacyKeywordExtractor)
+        exclusion = keyword_extractor.parser.exclusion
+        assert exclusion is not None
+        assert exclusion.rule_based_entity_types
+
+    def test_should_only_load_included_components_of_profile(
+            self, spacy_load_mock: MagicMock):
+        get_keyword_extractor(KeywordExtractConfig({
+            **MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'spacyLanguageModel': 'model1',
+            'spacyLoadProfile': 'tagger-parser-only'
+        }))
+        spacy_load_mock.assert_called_with('model1', exclude=['senter', 'ner'])
+
+    def test_should_pass_reparse_derived_keywords_to_parser(
+            self, spacy_load_mock: MagicMock):
+        keyword_extractor = get_keyword_extractor(KeywordExtractConfig({
+            **MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'spacyLanguageModel': 'model1',
+            'reparseDerivedKeywords': True
+        }))
+        spacy_load_mock.assert_called()
+        assert isinstance(keyword_extractor, SpacyKeywordExtractor)
+        assert keyword_extractor.parser.reparse_derived_keywords
+
+    def test_should_load_spacy_model_once_using_language_cache(
+            self, spacy_load_mock: MagicMock):
+        spacy_language_cache = SpacyLanguageCache()
+        keyword_extract_config = KeywordExtractConfig({
+            **MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'spacyLanguageModel': 'model1'
+        })
+        keyword_extractors = [
+            get_keyword_extractor(
+                keyword_extract_config, spacy_language_cache=spacy_language_cache
+            )
+            for _ in range(2)
+        ]
+        spacy_load_mock.assert_called_once()
+        assert all(
+            isinstance(keyword_extractor, SpacyKeywordExtractor)
+            and keyword_extractor.language_lock is not None
+            for keyword_extractor in keyword_extractors
+        )
 
 
 class TestToUniqueKeywords:
@@ -81,6 +182,28 @@ class TestSimpleKeywordExtractor:
         )
 
 
+class TestSimpleKeywordExtractorWithContext:
+    def test_should_return_keywords_with_context(self):
+        assert list(SimpleKeywordExtractor().iter_extract_keywords_with_context(
+            [('keyword1', 'context1'), ('keyword2', 'context2')]
+        )) == [(['keyword1'], 'context1'), (['keyword2'], 'context2')]
+
+    def test_should_only_read_next_batch_once_current_batch_is_complete(self):
+        read_texts = []
+
+        def iter_text_and_context_list():
+            for index in range(5):
+                read_texts.append(f'text{index}')
+                yield f'text{index}', index
+
+        result_iterator = iter(SimpleKeywordExtractor().iter_extract_keywords_with_context(
+            iter_text_and_context_list(), batch_size=2
+        ))
+        assert next(result_iterator) == (['text0'], 0)
+        assert read_texts == ['text0', 'text1']
+        assert [context for _, context in result_iterator] == [1, 2, 3, 4]
+
+
 class TestSpacyKeywordExtractor:
     def test_should_normalize_keywords(self, spacy_language_en: Language):
         assert (
@@ -100,13 +223,78 @@ class TestSpacyKeywordExtractor:
             ) == [['keyword'], ['technology']]
         )
 
-    def test_should_call_iter_parse_text_list(
+    def test_should_call_iter_get_keyword_str_list(
             self, spacy_language_en: Language,
             spacy_keyword_document_parser_mock: MagicMock):
         list(SpacyKeywordExtractor(
             language=spacy_language_en
         ).iter_extract_keywords(['using keyword', 'other keyword']))
-        spacy_keyword_document_parser_mock.iter_parse_text_list.assert_called()
+        spacy_keyword_document_parser_mock.iter_get_keyword_str_list.assert_called()
+
+    @pytest.mark.usefixtures('text_keyword_parser_mock')
+    def test_should_extract_keywords_using_workers_in_order(self):
+        with SpacyKeywordExtractor(
+                language=MagicMock(name='language'),
+                worker_count=2,
+                worker_batch_size=2) as keyword_extractor:
+            assert list(keyword_extractor.iter_extract_keywords(
+                ['text1', 'text2', 'text3', 'text4', 'text5']
+            )) == [[f'text{index}', 'common'] for index in range(1, 6)]
+
+    @pytest.mark.usefixtures('text_keyword_parser_mock')
+    def test_should_reuse_worker_pool_until_closed(self):
+        with SpacyKeywordExtractor(
+                language=MagicMock(name='language'),
+                worker_count=2) as keyword_extractor:
+            assert list(keyword_extractor.iter_extract_keywords(['text1'])) == [
+                ['text1', 'common']
+            ]
+            pool = keyword_extractor.get_pool()
+            assert list(keyword_extractor.iter_extract_keywords(['text2'])) == [
+                ['text2', 'common']
+            ]
+            assert keyword_extractor.get_pool() is pool
+        assert keyword_extractor.get_pool() is not pool
+        keyword_extractor.close()
+
+    @pytest.mark.usefixtures('text_keyword_parser_mock')
+    def test_should_start_worker_pool_before_first_use(self):
+        with SpacyKeywordExtractor(
+                language=MagicMock(name='language'),
+                worker_count=2) as keyword_extractor:
+            keyword_extractor.start_workers()
+            pool = keyword_extractor.get_pool()
+            assert list(keyword_extractor.iter_extract_keywords(['text1'])) == [
+                ['text1', 'common']
+            ]
+            assert keyword_extractor.get_pool() is pool
+
+    @pytest.mark.usefixtures('text_keyword_parser_mock')
+    def test_should_merge_keywords_of_chunks_of_long_texts(self):
+        assert list(SpacyKeywordExtractor(
+            language=MagicMock(name='language'),
+            max_text_length=20
+        ).iter_extract_keywords(['Short text.', 'Long sentence. Another sentence.'])) == [
+            ['Short text.', 'common'],
+            ['Long sentence.', 'common', 'Another sentence.']
+        ]
+
+    @pytest.mark.usefixtures('text_keyword_parser_mock')
+    def test_should_extract_keywords_with_context_using_workers_and_chunks(self):
+        with SpacyKeywordExtractor(
+                language=MagicMock(name='language'),
+                worker_count=2,
+                worker_batch_size=1,
+                max_text_length=20) as keyword_extractor:
+            assert list(keyword_extractor.iter_extract_keywords_with_context([
+                ('Short text.', 'context1'),
+                ('Long sentence. Another sentence.', 'context2'),
+                ('Other text.', 'context3')
+            ])) == [
+                (['Short text.', 'common'], 'context1'),
+                (['Long sentence.', 'common', 'Another sentence.'], 'context2'),
+                (['Other text.', 'common'], 'context3')
+            ]
 
     def test_should_extract_individual_words_and_shorter_keywords(
             self, spacy_language_en: Language):
@@ -123,6 +311,71 @@ class TestSpacyKeywordExtractor:
         }
 
 
+class TestCachingKeywordExtractor:
+    def test_should_close_wrapped_keyword_extractor(self):
+        keyword_extractor = MagicMock(name='keyword_extractor')
+        with CachingKeywordExtractor(
+                keyword_extractor,
+                keyword_cache=InMemoryKeywordCache(),
+                model_name='model1'):
+            pass
+        keyword_extractor.close.assert_called_once()
+
+    def test_should_extract_keywords_of_texts_not_in_cache(self):
+        keyword_extractor = MagicMock(wraps=SimpleKeywordExtractor())
+        keyword_extractor.get_normalized_text.side_effect = lambda text: text
+        assert list(CachingKeywordExtractor(
+            keyword_extractor,
+            keyword_cache=InMemoryKeywordCache(),
+            model_name='model1'
+        ).iter_extract_keywords(['keyword1', 'keyword2'])) == [
+            ['keyword1'], ['keyword2']
+        ]
+
+    def test_should_extract_keywords_of_repeated_text_only_once(self):
+        keyword_extractor = MagicMock(wraps=SimpleKeywordExtractor())
+        keyword_extractor.get_normalized_text.side_effect = lambda text: text
+        caching_keyword_extractor = CachingKeywordExtractor(
+            keyword_extractor,
+            keyword_cache=InMemoryKeywordCache(),
+            model_name='model1',
+            batch_size=2
+        )
+        assert list(caching_keyword_extractor.iter_extract_keywords(
+            ['keyword1', 'keyword1', 'keyword2', 'keyword1']
+        )) == [['keyword1'], ['keyword1'], ['keyword2'], ['keyword1']]
+        assert keyword_extractor.iter_extract_keywords.call_args_list == [
+            call(['keyword1']), call(['keyword2'])
+        ]
+        assert caching_keyword_extractor.hit_count == 2
+        assert caching_keyword_extractor.miss_count == 2
+
+    def test_should_flush_keyword_cache_if_all_texts_were_cached(self):
+        keyword_cache = MagicMock(name='keyword_cache')
+        keyword_cache.get.return_value = ['keyword1']
+        assert list(CachingKeywordExtractor(
+            SimpleKeywordExtractor(),
+            keyword_cache=keyword_cache,
+            model_name='model1'
+        ).iter_extract_keywords(['keyword1'])) == [['keyword1']]
+        keyword_cache.put.assert_not_called()
+        keyword_cache.flush.assert_called_once()
+
+
+class TestGetKeywordCacheModelName:
+    def test_should_include_max_text_length_if_texts_are_chunked(self):
+        spacy_load_profile = get_spacy_load_profile(None)
+        assert get_keyword_cache_model_name('model1', spacy_load_profile) == 'model1:full'
+        assert get_keyword_cache_model_name(
+            'model1', spacy_load_profile, max_text_length=1000
+        ) == 'model1:full:max-text-length-1000'
+
+    def test_should_include_reparse_derived_keywords_if_enabled(self):
+        assert get_keyword_cache_model_name(
+            'model1', get_spacy_load_profile(None), reparse_derived_keywords=True
+        ) == 'model1:full:reparse-derived-keywords'
+
+
 class TestParseKeywordList:
     def test_should_return_empty_list_if_keywords_str_is_none(self):
         assert parse_keyword_list("") == []
@@ -197,3 +450,297 @@ class TestAddExtractedKeywords:
             keyword_extractor=SimpleKeywordExtractor()
         ))
         assert records == records_copy
+
+    def test_should_pass_records_as_context_with_extraction_batch_size(self):
+        keyword_extractor = MagicMock(wraps=SimpleKeywordExtractor())
+        records = [{'text': 'keyword1'}, {'text': 'keyword2'}]
+        records_with_keywords = list(add_extracted_keywords(
+            record_list=records,
+            text_field='text',
+            keyword_extractor=keyword_extractor,
+            extraction_batch_size=123
+        ))
+        assert [record['extracted_keywords'] for record in records_with_keywords] == [
+            ['keyword1'], ['keyword2']
+        ]
+        keyword_extractor.iter_extract_keywords_with_context.assert_called_once()
+        _, kwargs = keyword_extractor.iter_extract_keywords_with_context.call_args
+        assert kwargs['batch_size'] == 123
+
+
+class TestGetMaxRecordsInMemory:
+    def test_should_add_extraction_batch_and_upload_batches(self):
+        assert get_max_records_in_memory(KeywordExtractConfig({
+            **MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'extractionBatchSize': 100,
+            'batchSize': 1000,
+            'uploadQueueSize': 2
+        })) == 100 + 4 * 1000
+
+    def test_should_only_hold_one_batch_when_uploading_inline(self):
+        assert get_max_records_in_memory(KeywordExtractConfig({
+            **MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'extractionBatchSize': 100,
+            'batchSize': 1000,
+            'uploadQueueSize': 0
+        })) == 100 + 1000
+
+    def test_should_use_batches_in_flight_of_workers_if_larger(self):
+        assert get_max_records_in_memory(KeywordExtractConfig({
+            **MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'extractionBatchSize': 100,
+            'workerCount': 4,
+            'batchSize': 1000,
+            'uploadQueueSize': 0
+        })) == 2 * 4 * DEFAULT_WORKER_BATCH_SIZE + 1000
+
+
+@pytest.fixture(name="upload_s3_object_mock")
+def _upload_s3_object_mock():
+    with patch.object(keyword_extract_module, "upload_s3_object") as mock:
+        yield mock
+
+
+class TestUpdateState:
+    LATEST_TIMESTAMP = datetime.datetime(2021, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc)
+    LATEST_STATE_VALUE = '2021-02-03 04:05:06+0000'
+
+    def test_should_replace_state_of_pipeline(
+            self,
+            upload_s3_object_mock: MagicMock):
+        state_dict = {'other': 'value1'}
+        update_state(
+            self.LATEST_TIMESTAMP,
+            KeywordExtractConfig({
+                **MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT,
+                'stateTimestampField': 'timestamp'
+            }),
+            state_dict,
+            'bucket1',
+            'object1'
+        )
+        assert upload_s3_object_mock.call_args[1]['object_key'] == 'object1'
+        assert json.loads(upload_s3_object_mock.call_args[1]['data_object']) == {
+            'other': 'value1', 'pipeline1': self.LATEST_STATE_VALUE
+        }
+
+    def test_should_upload_state_of_shard_to_state_object_of_shard(
+            self,
+            upload_s3_object_mock: MagicMock):
+        state_dict = {
+            'other': 'value1',
+            'pipeline1': 'value2',
+            'pipeline1/shard-0-of-2': 'value3',
+            'other/shard-1-of-2': 'value4'
+        }
+        update_state(
+            self.LATEST_TIMESTAMP,
+            KeywordExtractConfig(
+                {**MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT, 'stateTimestampField': 'timestamp'},
+                shard_index=1,
+                shard_count=2
+            ),
+            state_dict,
+            'bucket1',
+            'object1'
+        )
+        assert upload_s3_object_mock.call_args[1]['object_key'] == 'object1.shard-1-of-2'
+        assert json.loads(upload_s3_object_mock.call_args[1]['data_object']) == {
+            'other/shard-1-of-2': 'value4',
+            'pipeline1/shard-1-of-2': self.LATEST_STATE_VALUE
+        }
+
+
+class _LoadJobs:
+    # Load jobs started via the mock BigQuery client,
+    # which are running until their result is retrieved
+    def __init__(self):
+        self.started_count = 0
+        self.running_jobs: List[MagicMock] = []
+        self.max_running_count = 0
+        self.failing_job_numbers: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def _complete(self, job: MagicMock, job_number: int):
+        with self._lock:
+            if job in self.running_jobs:
+                self.running_jobs.remove(job)
+        if job_number in self.failing_job_numbers:
+            raise RuntimeError(f'load job {job_number} failed')
+
+    def start(self, *_, **__) -> MagicMock:
+        with self._lock:
+            self.started_count += 1
+            job_number = self.started_count
+            job = MagicMock(name=f'job_{job_number}')
+            job.done.return_value = False
+            job.result.side_effect = lambda: self._complete(job, job_number)
+            self.running_jobs.append(job)
+            self.max_running_count = max(self.max_running_count, len(self.running_jobs))
+            return job
+
+
+ETL_GCP_PROJECT = 'project1'
+
+ETL_KEYWORD_EXTRACT_CONFIG_DICT = {
+    **MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT,
+    'sourceDataset': 'source_dataset1',
+    'destinationDataset': 'destination_dataset1',
+    'destinationTable': 'destination_table1',
+    'queryTemplate': 'query1',
+    'stateTimestampField': 'timestamp',
+    'importedTimestampFieldName': 'imported_timestamp',
+    'batchSize': 1
+}
+
+
+def _get_etl_source_records(count: int) -> List[dict]:
+    return [
+        {
+            'id': str(index),
+            'text': f'keyword{index}',
+            'timestamp': datetime.datetime(
+                2021, 2, 3, 4, 5, index, tzinfo=datetime.timezone.utc
+            )
+        }
+        for index in range(1, count + 1)
+    ]
+
+
+@pytest.fixture(name="bq_client_mock")
+def _bq_client_mock():
+    return get_or_create_client((BIGQUERY_CLIENT_KEY, ETL_GCP_PROJECT), MagicMock)
+
+
+@pytest.fixture(name="s3_client_mock")
+def _s3_client_mock():
+    return get_or_create_client(S3_CLIENT_KEY, MagicMock)
+
+
+@pytest.fixture(name="load_jobs")
+def _load_jobs(bq_client_mock: MagicMock) -> _LoadJobs:
+    load_jobs = _LoadJobs()
+    bq_client_mock.load_table_from_file.side_effect = load_jobs.start
+    return load_jobs
+
+
+def _set_query_result_records(bq_client_mock: MagicMock, records: List[dict]):
+    row_iterator = bq_client_mock.query.return_value.result.return_value
+    row_iterator.total_rows = len(records)
+    row_iterator.pages = [records]
+
+
+def _get_uploaded_state_values(s3_client_mock: MagicMock) -> List[str]:
+    return [
+        json.loads(put_object_call.kwargs['Body'])['pipeline1']
+        for put_object_call in s3_client_mock.put_object.call_args_list
+    ]
+
+
+def _run_etl_keywords(config_dict: dict):
+    etl_keywords(
+        KeywordExtractConfig(config_dict, gcp_project=ETL_GCP_PROJECT),
+        timestamp_as_string='2021-02-03 00:00:00',
+        data_pipelines_state={},
+        state_s3_bucket='bucket1',
+        state_s3_object='object1'
+    )
+
+
+@pytest.mark.usefixtures('s3_client_mock')
+class TestEtlKeywords:
+    @pytest.mark.parametrize('upload_queue_size', [0, 1])
+    def test_should_not_exceed_default_of_one_load_job_in_flight(
+            self,
+            bq_client_mock: MagicMock,
+            load_jobs: _LoadJobs,
+            upload_queue_size: int):
+        _set_query_result_records(bq_client_mock, _get_etl_source_records(5))
+        _run_etl_keywords({
+            **ETL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'uploadQueueSize': upload_queue_size
+        })
+        assert load_jobs.started_count == 5
+        assert load_jobs.max_running_count == 1
+        assert not load_jobs.running_jobs
+
+    def test_should_not_exceed_max_load_jobs_in_flight(
+            self,
+            bq_client_mock: MagicMock,
+            load_jobs: _LoadJobs):
+        _set_query_result_records(bq_client_mock, _get_etl_source_records(5))
+        _run_etl_keywords({
+            **ETL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'maxLoadJobsInFlight': 2
+        })
+        assert load_jobs.started_count == 5
+        assert load_jobs.max_running_count == 2
+
+    def test_should_only_run_one_load_job_at_a_time_when_truncating(
+            self,
+            bq_client_mock: MagicMock,
+            load_jobs: _LoadJobs):
+        _set_query_result_records(bq_client_mock, _get_etl_source_records(5))
+        _run_etl_keywords({
+            **ETL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'tableWriteAppend': 'false',
+            'maxLoadJobsInFlight': 2
+        })
+        assert load_jobs.started_count == 5
+        assert load_jobs.max_running_count == 1
+
+    @pytest.mark.parametrize('max_load_jobs_in_flight', [1, 3])
+    def test_should_upload_state_in_batch_order(
+            self,
+            bq_client_mock: MagicMock,
+            s3_client_mock: MagicMock,
+            load_jobs: _LoadJobs,
+            max_load_jobs_in_flight: int):
+        _set_query_result_records(bq_client_mock, _get_etl_source_records(3))
+        _run_etl_keywords({
+            **ETL_KEYWORD_EXTRACT_CONFIG_DICT,
+            'maxLoadJobsInFlight': max_load_jobs_in_flight
+        })
+        assert load_jobs.started_count == 3
+        assert _get_uploaded_state_values(s3_client_mock) == [
+            '2021-02-03 04:05:01+0000',
+            '2021-02-03 04:05:02+0000',
+            '2021-02-03 04:05:03+0000'
+        ]
+
+    @pytest.mark.parametrize('upload_queue_size', [0, 1])
+    def test_should_not_advance_state_after_failed_load_job(
+            self,
+            bq_client_mock: MagicMock,
+            s3_client_mock: MagicMock,
+            load_jobs: _LoadJobs,
+            upload_queue_size: int):
+        _set_query_result_records(bq_client_mock, _get_etl_source_records(4))
+        load_jobs.failing_job_numbers.add(2)
+        with pytest.raises(RuntimeError):
+            _run_etl_keywords({
+                **ETL_KEYWORD_EXTRACT_CONFIG_DICT,
+                'maxLoadJobsInFlight': 3,
+                'uploadQueueSize': upload_queue_size
+            })
+        assert _get_uploaded_state_values(s3_client_mock) == [
+            '2021-02-03 04:05:01+0000'
+        ]
+
+    def test_should_use_passed_in_keyword_extractor_without_closing_it(
+            self,
+            bq_client_mock: MagicMock,
+            load_jobs: _LoadJobs):
+        _set_query_result_records(bq_client_mock, _get_etl_source_records(2))
+        keyword_extractor = MagicMock(wraps=SimpleKeywordExtractor())
+        etl_keywords(
+            KeywordExtractConfig(ETL_KEYWORD_EXTRACT_CONFIG_DICT, gcp_project=ETL_GCP_PROJECT),
+            timestamp_as_string='2021-02-03 00:00:00',
+            data_pipelines_state={},
+            state_s3_bucket='bucket1',
+            state_s3_object='object1',
+            keyword_extractor=keyword_extractor
+        )
+        keyword_extractor.iter_extract_keywords_with_context.assert_called()
+        keyword_extractor.close.assert_not_called()
+        assert load_jobs.started_count == 2
@@ -0,0 +1,79 @@
+import gzip
+import json
+from copy import deepcopy
+from io import BytesIO
+from pathlib import Path
+
+from peerscout.keyword_extract.keyword_extract_config import KeywordExtractConfig
+from peerscout.keyword_extract.keyword_load import (
+    iter_write_jsonl_records,
+    write_batch_and_get_schema
+)
+from peerscout.utils.bq_data_service import (
+    generate_schema_from_file,
+    generate_schema_from_records
+)
+
+
+MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT = {
+    'pipelineID': 'pipeline1',
+    'textField': 'text',
+    'tableWriteAppend': 'true'
+}
+
+
+class TestIterWriteJsonlRecords:
+    def test_should_write_records_without_text_and_empty_fields(self):
+        keyword_extract_config = KeywordExtractConfig(MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT)
+        jsonl_buffer = BytesIO()
+        written_records = list(iter_write_jsonl_records(
+            [{'id': '1', 'text': 'text1', 'empty': '', 'keywords': ['keyword1']}],
+            jsonl_buffer,
+            keyword_extract_config
+        ))
+        assert written_records == [{'id': '1', 'keywords': ['keyword1']}]
+        assert [
+            json.loads(line) for line in jsonl_buffer.getvalue().splitlines()
+        ] == written_records
+
+    def test_should_generate_same_schema_as_from_file(self, tmp_path: Path):
+        jsonl_path = tmp_path / 'data.jsonl'
+        keyword_extract_config = KeywordExtractConfig(MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT)
+        records = [
+            {'id': '1', 'count': 1, 'score': 1.5, 'flag': True, 'keywords': ['keyword1']},
+            {'id': '2', 'count': '2', 'nested': {'date': '2021-01-01', 'list': [{'a': 1}]}},
+            {'id': '3', 'timestamp': '2021-01-01 10:11:12', 'count': 3}
+        ]
+        with jsonl_path.open('wb') as jsonl_file:
+            schema_from_records = generate_schema_from_records(iter_write_jsonl_records(
+                deepcopy(records), jsonl_file, keyword_extract_config
+            ))
+        assert schema_from_records == generate_schema_from_file(str(jsonl_path))
+
+    def test_should_write_gzip_compressed_records(self):
+        keyword_extract_config = KeywordExtractConfig(MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT)
+        jsonl_buffer = BytesIO()
+        written_records = list(iter_write_jsonl_records(
+            [{'id': '1', 'keywords': ['keyword1']}, {'id': '2'}],
+            jsonl_buffer,
+            keyword_extract_config,
+            load_compression='gzip'
+        ))
+        assert gzip.decompress(jsonl_buffer.getvalue()) == b''.join(
+            json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+            for record in written_records
+        )
+
+
+class TestWriteBatchAndGetSchema:
+    def test_should_write_parquet_and_return_schema(self):
+        keyword_extract_config = KeywordExtractConfig(MINIMAL_KEYWORD_EXTRACT_CONFIG_DICT)
+        parquet_buffer = BytesIO()
+        schema = write_batch_and_get_schema(
+            [{'id': '1', 'text': 'text1', 'extracted_keywords': ['keyword1']}],
+            parquet_buffer,
+            keyword_extract_config,
+            load_format='parquet'
+        )
+        assert [field['name'] for field in schema] == ['extracted_keywords', 'id']
+        assert parquet_buffer.getvalue().startswith(b'PAR1')
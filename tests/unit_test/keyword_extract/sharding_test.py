@@ -0,0 +1,117 @@
+import pytest
+
+from peerscout.keyword_extract.keyword_extract_config import KeywordExtractConfig
+from peerscout.keyword_extract.sharding import (
+    get_initial_state_value,
+    get_shard_state_s3_object,
+    get_sharded_query_template,
+    get_state_key,
+    validate_shard
+)
+
+
+KEYWORD_EXTRACT_CONFIG_DICT = {
+    'pipelineID': 'pipeline1',
+    'textField': 'text',
+    'idField': 'id',
+    'tableWriteAppend': 'true',
+    'defaultStartTimestamp': '2000-01-01 00:00:00+0000'
+}
+
+QUERY_TEMPLATE = 'SELECT id, text FROM `{project}.{dataset}.table1`'
+
+
+def _get_config(**kwargs) -> KeywordExtractConfig:
+    return KeywordExtractConfig(KEYWORD_EXTRACT_CONFIG_DICT, **kwargs)
+
+
+class TestValidateShard:
+    def test_should_accept_no_shard(self):
+        validate_shard(None, None)
+
+    def test_should_accept_valid_shard(self):
+        validate_shard(0, 2)
+        validate_shard(1, 2)
+
+    @pytest.mark.parametrize('shard_index,shard_count', [
+        (None, 2), (0, None), (2, 2), (-1, 2)
+    ])
+    def test_should_reject_invalid_shard(self, shard_index: int, shard_count: int):
+        with pytest.raises(ValueError):
+            validate_shard(shard_index, shard_count)
+
+
+class TestGetStateKey:
+    def test_should_use_pipeline_id_without_shard(self):
+        assert get_state_key(_get_config()) == 'pipeline1'
+
+    def test_should_include_shard(self):
+        assert get_state_key(
+            _get_config(shard_index=1, shard_count=4)
+        ) == 'pipeline1/shard-1-of-4'
+
+
+class TestGetShardStateS3Object:
+    def test_should_use_state_object_without_shard(self):
+        assert get_shard_state_s3_object('state.json', None, None) == 'state.json'
+
+    def test_should_use_separate_state_object_of_shard(self):
+        assert get_shard_state_s3_object('state.json', 1, 4) == 'state.json.shard-1-of-4'
+
+
+class TestGetInitialStateValue:
+    def test_should_use_state_of_shard(self):
+        assert get_initial_state_value(
+            _get_config(shard_index=1, shard_count=4),
+            {'pipeline1': 'value1', 'pipeline1/shard-1-of-4': 'value2'}
+        ) == 'value2'
+
+    def test_should_fall_back_to_state_of_pipeline(self):
+        assert get_initial_state_value(
+            _get_config(shard_index=1, shard_count=4),
+            {'pipeline1': 'value1'}
+        ) == 'value1'
+
+    def test_should_fall_back_to_default_start_timestamp(self):
+        assert get_initial_state_value(
+            _get_config(shard_index=1, shard_count=4), {}
+        ) == '2000-01-01 00:00:00+0000'
+
+
+class TestGetShardedQueryTemplate:
+    def test_should_not_change_query_template_without_shard(self):
+        assert get_sharded_query_template(QUERY_TEMPLATE, _get_config()) == QUERY_TEMPLATE
+
+    def test_should_filter_on_hash_of_id_field(self):
+        sharded_query_template = get_sharded_query_template(
+            QUERY_TEMPLATE, _get_config(shard_index=1, shard_count=4)
+        )
+        assert sharded_query_template == '\n'.join([
+            'SELECT * FROM (',
+            QUERY_TEMPLATE,
+            ')',
+            'WHERE ABS(MOD(FARM_FINGERPRINT(CAST(id AS STRING)), 4)) = 1'
+        ])
+        # the placeholders are still replaced when running the query
+        assert '`project1.dataset1.table1`' in sharded_query_template.format(
+            project='project1', dataset='dataset1'
+        )
+
+    def test_should_keep_ascending_order_of_state_timestamp_field(self):
+        sharded_query_template = get_sharded_query_template(
+            QUERY_TEMPLATE + ' ORDER BY modified_timestamp ASC',
+            KeywordExtractConfig(
+                {**KEYWORD_EXTRACT_CONFIG_DICT, 'stateTimestampField': 'modified_timestamp'},
+                shard_index=1,
+                shard_count=4
+            )
+        )
+        assert sharded_query_template.splitlines()[-1] == 'ORDER BY modified_timestamp ASC'
+
+    def test_should_require_id_field(self):
+        with pytest.raises(ValueError):
+            get_sharded_query_template(QUERY_TEMPLATE, KeywordExtractConfig(
+                {**KEYWORD_EXTRACT_CONFIG_DICT, 'idField': None},
+                shard_index=1,
+                shard_count=4
+            ))
@@ -1,9 +1,11 @@
-from unittest.mock import MagicMock
+from typing import List
+from unittest.mock import MagicMock, patch
 
 import pytest
 
 from spacy.language import Language
-from spacy.tokens import Span
+from spacy.tokens import Doc, Span
+from spacy.vocab import Vocab  # pylint: disable=no-name-in-module
 
 from peerscout.keyword_extract.spacy_keyword import (
     get_span_without_apostrophe,
@@ -21,9 +23,12 @@ from peerscout.keyword_extract.spacy_keyword import (
     rstrip_punct,
     strip_stop_words_and_punct,
     normalize_text,
+    normalize_text_list,
+    get_spacy_load_profile,
     SpacyExclusion,
     SpacyKeywordList,
-    SpacyKeywordDocumentParser
+    SpacyKeywordDocumentParser,
+    SpacyTextParseCache
 )
 
 
@@ -91,17 +96,69 @@ class TestIsConjunctionToken:
         ] == [False, True, False]
 
 
+def _get_parsed_conjunction_doc() -> Doc:
+    # a doc with the parse of "advanced and special technology" (without a model)
+    return Doc(
+        Vocab(),
+        words=['advanced', 'and', 'special', 'technology'],
+        heads=[3, 0, 0, 3],
+        deps=['amod', 'cc', 'conj', 'ROOT'],
+        pos=['ADJ', 'CCONJ', 'ADJ', 'NOUN']
+    )
+
+
 class TestJoinSpans:
+    def test_should_attach_tokens_with_heads_outside_of_joined_span_to_last_token(self):
+        doc = _get_parsed_conjunction_doc()
+        joined_span = join_spans([doc[2], doc[-1:]])
+        assert joined_span.text == 'special technology'
+        assert [token.text for token in joined_span[-1].children] == ['special']
+        assert joined_span[-1].dep_ == 'ROOT'
+        assert joined_span[0].dep_ == 'conj'
+
+    def test_should_keep_heads_within_joined_span(self):
+        doc = _get_parsed_conjunction_doc()
+        joined_span = join_spans([doc[0], doc[-1:]])
+        assert [token.text for token in joined_span[-1].children] == ['advanced']
+        assert not list(joined_span[0].children)
+        assert [token.pos_ for token in joined_span] == ['ADJ', 'NOUN']
+
     def test_should_join_two_spans(
             self, spacy_language_en: Language):
         assert join_spans(
             [
                 spacy_language_en('the joined'),
                 spacy_language_en('span')
-            ],
-            language=spacy_language_en
+            ]
         ).text == 'the joined span'
 
+    def test_should_join_token_and_span(
+            self, spacy_language_en: Language):
+        doc = spacy_language_en('advanced and special technology')
+        assert join_spans([doc[0], doc[-1:]]).text == 'advanced technology'
+
+    def test_should_keep_token_attributes_of_original_doc(
+            self, spacy_language_en: Language):
+        doc = spacy_language_en('advanced and special technologies')
+        joined_span = join_spans([doc[0], doc[-1:]])
+        assert [token.pos_ for token in joined_span] == [
+            doc[0].pos_, doc[-1].pos_
+        ]
+        assert joined_span[-1].lemma_ == doc[-1].lemma_
+        assert joined_span[-1].is_stop == doc[-1].is_stop
+
+    def test_should_only_keep_children_within_joined_span(
+            self, spacy_language_en: Language):
+        doc = spacy_language_en('advanced and special technology')
+        joined_span = join_spans([doc[0], doc[-1:]])
+        assert not list(joined_span[0].children)
+
+    def test_should_keep_entity_type(
+            self, spacy_language_en: Language):
+        doc = spacy_language_en('technology that account for 123')
+        joined_span = join_spans([doc[0], doc[-1:]])
+        assert joined_span[-1].ent_type == doc[-1].ent_type
+
 
 class TestGetNounChunkForNounToken:
     def test_should_return_span_for_noun_token(
@@ -144,22 +201,19 @@ class TestIterSplitNounChunkConjunctions:
     def test_should_not_split_noun_chunk_without_conjunctions(
             self, spacy_language_en: Language):
         assert [span.text for span in iter_split_noun_chunk_conjunctions(
-            spacy_language_en('advanced technology'),
-            language=spacy_language_en
+            spacy_language_en('advanced technology')
         )] == ['advanced technology']
 
     def test_should_split_and_join_noun_chunk_on_conjunction(
             self, spacy_language_en: Language):
         assert [span.text for span in iter_split_noun_chunk_conjunctions(
-            spacy_language_en('advanced and special technology'),
-            language=spacy_language_en
+            spacy_language_en('advanced and special technology')
         )] == ['advanced technology', 'special technology']
 
     def test_should_not_split_hyphenated_noun_chunk_on_conjunction(
             self, spacy_language_en: Language):
         assert [span.text for span in iter_split_noun_chunk_conjunctions(
-            spacy_language_en('advanced-and-special technology'),
-            language=spacy_language_en
+            spacy_language_en('advanced-and-special technology')
         )] == ['advanced-and-special technology']
 
 
@@ -167,29 +221,25 @@ class TestGetConjuctionNounChunks:
     def test_should_not_split_noun_chunk_without_conjunctions(
             self, spacy_language_en: Language):
         assert [span.text for span in get_conjuction_noun_chunks(
-            spacy_language_en('advanced technology'),
-            language=spacy_language_en
+            spacy_language_en('advanced technology')
         )] == ['advanced technology']
 
     def test_should_split_and_join_noun_chunk_on_conjunction_without_comma(
             self, spacy_language_en: Language):
         assert [span.text for span in get_conjuction_noun_chunks(
-            spacy_language_en('advanced and special technology'),
-            language=spacy_language_en
+            spacy_language_en('advanced and special technology')
         )] == ['advanced technology', 'special technology']
 
     def test_should_split_and_join_noun_chunk_on_conjunction_with_comma(
             self, spacy_language_en: Language):
         assert {span.text for span in get_conjuction_noun_chunks(
-            spacy_language_en('advanced, and special technology'),
-            language=spacy_language_en
+            spacy_language_en('advanced, and special technology')
         )} == {'advanced technology', 'special technology'}
 
     def test_should_return_two_noun_chunk_separated_by_comma_no_sentence(
             self, spacy_language_en: Language):
         assert {span.text for span in get_conjuction_noun_chunks(
-            spacy_language_en('advanced technology, special approach'),
-            language=spacy_language_en
+            spacy_language_en('advanced technology, special approach')
         )} == {'advanced technology', 'special approach'}
 
 
@@ -229,6 +279,25 @@ class TestIterIndividualKeywordSpans:
             language=spacy_language_en
         )] == ['simple-and-advanced', 'technology']
 
+    def test_should_not_parse_individual_words_again(
+            self, spacy_language_en: Language,
+            spacy_language_mock: MagicMock):
+        doc = spacy_language_en('advanced technologies')
+        individual_keyword_spans = list(iter_individual_keyword_spans(
+            doc,
+            language=spacy_language_mock
+        ))
+        spacy_language_mock.assert_not_called()
+        assert individual_keyword_spans[-1][0].lemma_ == doc[-1].lemma_
+
+    def test_should_parse_individual_words_again_if_reparse_is_enabled(
+            self, spacy_language_en: Language):
+        assert [span.text for span in iter_individual_keyword_spans(
+            spacy_language_en('advanced technology'),
+            language=spacy_language_en,
+            reparse=True
+        )] == ['advanced', 'technology']
+
 
 class TestIterShorterKeywordSpans:
     def test_should_return_no_results_if_keyword_is_not_compound(
@@ -259,6 +328,23 @@ class TestIterShorterKeywordSpans:
             language=spacy_language_en
         )] == ['extra advanced technology', 'advanced technology']
 
+    def test_should_not_parse_shorter_keywords_again(
+            self, spacy_language_en: Language,
+            spacy_language_mock: MagicMock):
+        assert [span.text for span in iter_shorter_keyword_spans(
+            spacy_language_en('very advanced technology'),
+            language=spacy_language_mock
+        )] == ['advanced technology']
+        spacy_language_mock.assert_not_called()
+
+    def test_should_parse_shorter_keywords_again_if_reparse_is_enabled(
+            self, spacy_language_en: Language):
+        assert [span.text for span in iter_shorter_keyword_spans(
+            spacy_language_en('very advanced technology'),
+            language=spacy_language_en,
+            reparse=True
+        )] == ['advanced technology']
+
 
 class TestLstripStopWordsAndPunct:
     def test_should_strip_leading_stop_words(
@@ -348,6 +434,17 @@ class TestNormalizeText:
     def test_should_replace_slash_with_comma(self):
         assert normalize_text('the/keyword') == 'the, keyword'
 
+    def test_should_strip_tags(self):
+        assert normalize_text('the <i>keyword</i>') == 'the keyword'
+
+
+class TestNormalizeTextList:
+    def test_should_return_same_result_as_normalize_text(self):
+        text_list = ['the\nkeyword', 'the/keyword', 'the <i>keyword</i> &amp; more', '']
+        assert normalize_text_list(text_list) == [
+            normalize_text(text) for text in text_list
+        ]
+
 
 class TestSpacyExclusion:
     def test_should_not_match_different_word(
@@ -386,6 +483,54 @@ class TestSpacyExclusion:
             spacy_language_en('xy')
         )
 
+    def test_should_exclude_number_using_rules_without_entity_type(
+            self, spacy_language_en: Language):
+        assert SpacyExclusion(rule_based_entity_types=True).should_exclude(
+            spacy_language_en.make_doc('account for 123')[-1:]
+        )
+
+    def test_should_exclude_percentage_using_rules_without_entity_type(
+            self, spacy_language_en: Language):
+        assert SpacyExclusion(rule_based_entity_types=True).should_exclude(
+            spacy_language_en.make_doc('account for 95%')[-1:]
+        )
+
+    def test_should_exclude_number_of_years_using_rules_without_entity_type(
+            self, spacy_language_en: Language):
+        assert SpacyExclusion(rule_based_entity_types=True).should_exclude(
+            spacy_language_en.make_doc('10 years')[-1:]
+        )
+
+    def test_should_not_exclude_word_using_rules_without_entity_type(
+            self, spacy_language_en: Language):
+        assert not SpacyExclusion(rule_based_entity_types=True).should_exclude(
+            spacy_language_en.make_doc('technology')[-1:]
+        )
+
+
+class TestGetSpacyLoadProfile:
+    def test_should_return_full_profile_by_default(self):
+        profile = get_spacy_load_profile(None)
+        assert profile.name == 'full'
+        assert not profile.get_excluded_components(['tagger', 'parser', 'ner'])
+
+    def test_should_disable_ner_and_use_rule_based_entity_types(self):
+        profile = get_spacy_load_profile('no-ner')
+        assert profile.get_excluded_components(['tagger', 'parser', 'ner']) == ['ner']
+        assert 'ent_type' not in profile.keyword_attributes
+        assert profile.rule_based_entity_types
+
+    def test_should_exclude_all_but_tagger_and_parser_components(self):
+        profile = get_spacy_load_profile('tagger-parser-only')
+        assert profile.get_excluded_components([
+            'tok2vec', 'tagger', 'parser', 'senter', 'attribute_ruler', 'lemmatizer', 'ner'
+        ]) == ['senter', 'ner']
+        assert profile.rule_based_entity_types
+
+    def test_should_raise_error_for_unknown_profile(self):
+        with pytest.raises(ValueError):
+            get_spacy_load_profile('unknown')
+
 
 class TestSpacyKeywordList:
     def test_should_extract_individual_tokens_from_single_keyword_span(
@@ -722,6 +867,41 @@ class TestSpacyKeywordDocument:
         ) == ['something']
 
 
+class TestSpacyTextParseCache:
+    def test_should_parse_same_text_only_once(
+            self, spacy_language_mock: MagicMock):
+        parse_cache = SpacyTextParseCache(spacy_language_mock)
+        first_doc = parse_cache('technology')
+        second_doc = parse_cache('technology')
+        spacy_language_mock.assert_called_once_with('technology')
+        assert first_doc == second_doc
+
+    def test_should_parse_distinct_missing_texts_using_pipe(
+            self, spacy_language_mock: MagicMock):
+        spacy_language_mock.pipe.side_effect = lambda text_list: [
+            MagicMock(name=text) for text in text_list
+        ]
+        parse_cache = SpacyTextParseCache(spacy_language_mock)
+        parse_cache('cell')
+        parse_cache.parse_all(['cell', 'protein', 'protein', 'neuron'])
+        spacy_language_mock.pipe.assert_called_once_with(['protein', 'neuron'])
+        parse_cache('protein')
+        parse_cache('neuron')
+        spacy_language_mock.assert_called_once_with('cell')
+
+    def test_should_remove_least_recently_used_doc(
+            self, spacy_language_mock: MagicMock):
+        parse_cache = SpacyTextParseCache(spacy_language_mock, max_size=2)
+        parse_cache('cell')
+        parse_cache('protein')
+        parse_cache('cell')
+        parse_cache('neuron')
+        assert len(parse_cache) == 2
+        spacy_language_mock.reset_mock()
+        parse_cache('protein')
+        spacy_language_mock.assert_called_once_with('protein')
+
+
 class TestSpacyKeywordDocumentParser:
     def test_should_parse_multiple_documents(
             self, spacy_keyword_document_parser: SpacyKeywordDocumentParser):
@@ -741,6 +921,24 @@ class TestSpacyKeywordDocumentParser:
         ).iter_parse_text_list(text_list))
         spacy_language_mock.pipe.assert_called()
 
+    def test_should_pass_texts_sorted_by_length_within_window_and_keep_order(
+            self, spacy_language_mock: MagicMock):
+        piped_text_list: List[str] = []
+
+        def pipe(text_list, **_):
+            for text in text_list:
+                piped_text_list.append(text)
+                yield MagicMock(name=text, text=text)
+
+        spacy_language_mock.pipe.side_effect = pipe
+        text_list = ['ccc', '', 'a', 'bb', 'dddd', '']
+        documents = list(SpacyKeywordDocumentParser(
+            language=spacy_language_mock,
+            length_sort_window_size=4
+        ).iter_parse_text_list(text_list))
+        assert piped_text_list == ['', 'a', 'bb', 'ccc', '', 'dddd']
+        assert [document.doc.text for document in documents] == text_list
+
     def test_should_strip_tags(
             self, spacy_keyword_document_parser: SpacyKeywordDocumentParser):
         assert (
@@ -748,3 +946,52 @@ class TestSpacyKeywordDocumentParser:
             .parse_text('<i>italic</i>')
             .doc.text == 'italic'
         )
+
+    def test_should_extract_derived_keywords_if_reparse_is_enabled(
+            self, spacy_language_en: Language):
+        assert set(
+            SpacyKeywordDocumentParser(
+                spacy_language_en, reparse_derived_keywords=True
+            )
+            .parse_text('using very advanced technology')
+            .get_keyword_str_list(normalize_text=False)
+        ) == {'advanced technology', 'advanced', 'technology'}
+
+    def test_should_parse_derived_keywords_of_batch_using_pipe_with_same_exclusion(
+            self, spacy_language_mock: MagicMock):
+        spacy_language_mock.pipe.side_effect = lambda text_list: [
+            MagicMock(name=text) for text in text_list
+        ]
+        exclusion = SpacyExclusion()
+        documents = [
+            MagicMock(**{
+                'get_derived_keyword_text_list.return_value': [f'derived{index}', 'common'],
+                'get_keyword_str_list.return_value': [f'keyword{index}']
+            })
+            for index in range(3)
+        ]
+        parser = SpacyKeywordDocumentParser(
+            spacy_language_mock, derived_keyword_batch_size=2
+        )
+        with patch.object(parser, 'iter_parse_text_list', return_value=iter(documents)):
+            assert list(parser.iter_get_keyword_str_list(
+                ['text0', 'text1', 'text2'], exclude=exclusion
+            )) == [['keyword0'], ['keyword1'], ['keyword2']]
+        assert [
+            list(pipe_call.args[0]) for pipe_call in spacy_language_mock.pipe.call_args_list
+        ] == [['derived0', 'common', 'derived1'], ['derived2']]
+        for document in documents:
+            document.get_derived_keyword_text_list.assert_called_once_with(exclude=exclusion)
+            document.get_keyword_str_list.assert_called_once_with(exclude=exclusion)
+
+    def test_should_extract_reparsed_derived_keywords_parsed_in_batch(
+            self, spacy_language_en: Language):
+        parser = SpacyKeywordDocumentParser(
+            spacy_language_en, reparse_derived_keywords=True
+        )
+        text_list = ['using very advanced technology', 'using advanced cell biology']
+        assert list(parser.iter_get_keyword_str_list(text_list)) == [
+            document.get_keyword_str_list()
+            for document in parser.iter_parse_text_list(text_list)
+        ]
+        assert parser.parse_cache.miss_count == 0
@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import peerscout.keyword_extract.spacy_language as spacy_language_module
+from peerscout.keyword_extract.spacy_keyword import get_spacy_load_profile
+from peerscout.keyword_extract.spacy_language import (
+    get_spacy_language_component_names,
+    load_spacy_language
+)
+
+
+@pytest.fixture(name="spacy_load_mock")
+def _spacy_load_mock():
+    with patch.object(spacy_language_module.spacy, "load") as mock:
+        yield mock
+
+
+@pytest.fixture(name="get_spacy_language_component_names_mock")
+def _get_spacy_language_component_names_mock():
+    with patch.object(
+            spacy_language_module, "get_spacy_language_component_names") as mock:
+        mock.return_value = ['tok2vec', 'tagger', 'parser', 'senter', 'ner']
+        yield mock
+
+
+class TestGetSpacyLanguageComponentNames:
+    def test_should_read_components_from_model_meta(self, tmp_path: Path):
+        (tmp_path / 'meta.json').write_text(json.dumps({
+            'lang': 'en',
+            'name': 'model1',
+            'version': '1.0.0',
+            'pipeline': ['tagger', 'parser'],
+            'components': ['tagger', 'parser', 'senter']
+        }))
+        assert get_spacy_language_component_names(str(tmp_path)) == [
+            'tagger', 'parser', 'senter'
+        ]
+
+
+class TestLoadSpacyLanguage:
+    def test_should_not_read_model_meta_without_included_components(
+            self,
+            spacy_load_mock: MagicMock,
+            get_spacy_language_component_names_mock: MagicMock):
+        load_spacy_language('model1', get_spacy_load_profile('no-ner'))
+        get_spacy_language_component_names_mock.assert_not_called()
+        spacy_load_mock.assert_called_with('model1', exclude=['ner'])
+
+    def test_should_exclude_components_not_included(
+            self,
+            spacy_load_mock: MagicMock,
+            get_spacy_language_component_names_mock: MagicMock):
+        load_spacy_language('model1', get_spacy_load_profile('tagger-parser-only'))
+        get_spacy_language_component_names_mock.assert_called_with('model1')
+        spacy_load_mock.assert_called_with('model1', exclude=['senter', 'ner'])
@@ -0,0 +1,60 @@
+from peerscout.keyword_extract.text_chunks import (
+    PARTIAL_TEXT_CONTEXT,
+    get_sentence_bounded_text_chunks,
+    iter_merge_chunk_keywords_with_context,
+    iter_text_chunks_with_context,
+    merge_keyword_lists
+)
+
+
+class TestGetSentenceBoundedTextChunks:
+    def test_should_not_split_short_text(self):
+        assert get_sentence_bounded_text_chunks(
+            'Sentence one. Sentence two.', max_length=100
+        ) == ['Sentence one. Sentence two.']
+
+    def test_should_combine_sentences_up_to_max_length(self):
+        assert get_sentence_bounded_text_chunks(
+            'Sentence one. Sentence two. Sentence three.', max_length=30
+        ) == ['Sentence one. Sentence two.', 'Sentence three.']
+
+    def test_should_split_long_sentence_at_whitespace(self):
+        assert get_sentence_bounded_text_chunks(
+            'one two three four', max_length=9
+        ) == ['one two', 'three', 'four']
+
+    def test_should_not_split_within_markup(self):
+        assert get_sentence_bounded_text_chunks(
+            'First <a title="a. b">sentence</a>. Second.', max_length=40
+        ) == ['First <a title="a. b">sentence</a>.', 'Second.']
+
+
+class TestMergeKeywordLists:
+    def test_should_merge_keyword_lists_without_duplicates(self):
+        assert merge_keyword_lists([
+            ['keyword1', 'keyword2'], ['keyword2', 'keyword3']
+        ]) == ['keyword1', 'keyword2', 'keyword3']
+
+
+class TestIterTextChunksWithContext:
+    def test_should_pass_context_with_last_chunk_only(self):
+        assert list(iter_text_chunks_with_context(
+            [('Short text.', 'context1'), ('Long sentence. Another sentence.', 'context2')],
+            max_text_length=20
+        )) == [
+            ('Short text.', 'context1'),
+            ('Long sentence.', PARTIAL_TEXT_CONTEXT),
+            ('Another sentence.', 'context2')
+        ]
+
+
+class TestIterMergeChunkKeywordsWithContext:
+    def test_should_merge_keywords_of_chunks_of_same_text(self):
+        assert list(iter_merge_chunk_keywords_with_context([
+            (['keyword1'], 'context1'),
+            (['keyword2', 'common'], PARTIAL_TEXT_CONTEXT),
+            (['common', 'keyword3'], 'context2')
+        ])) == [
+            (['keyword1'], 'context1'),
+            (['keyword2', 'common', 'keyword3'], 'context2')
+        ]
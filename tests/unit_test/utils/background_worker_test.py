@@ -0,0 +1,176 @@
+import threading
+from typing import List
+
+import pytest
+
+from peerscout.utils.background_worker import (
+    BackgroundWorker,
+    iter_prefetched,
+    run_concurrently
+)
+
+
+class TestBackgroundWorker:
+    def test_should_process_items_in_order(self):
+        processed_items: List[int] = []
+        with BackgroundWorker(processed_items.append, max_queue_size=2) as worker:
+            for item in range(10):
+                worker.submit(item)
+        assert processed_items == list(range(10))
+
+    def test_should_process_items_in_other_thread(self):
+        thread_names: List[str] = []
+        worker: BackgroundWorker[int] = BackgroundWorker(
+            lambda _: thread_names.append(threading.current_thread().name),
+            name='worker1'
+        )
+        with worker:
+            worker.submit(1)
+        assert thread_names == ['worker1']
+
+    def test_should_raise_error_on_close_and_skip_remaining_items(self):
+        processed_items: List[int] = []
+        first_item_processed = threading.Event()
+        continue_processing = threading.Event()
+
+        def process_item(item: int):
+            if item == 1:
+                first_item_processed.set()
+                continue_processing.wait()
+                raise RuntimeError('error processing item')
+            processed_items.append(item)
+
+        worker = BackgroundWorker(process_item, max_queue_size=2)
+        worker.submit(1)
+        first_item_processed.wait()
+        worker.submit(2)
+        continue_processing.set()
+        with pytest.raises(RuntimeError):
+            worker.close()
+        assert not processed_items
+
+    def test_should_raise_error_on_submit_after_failure(self):
+        def process_item(_: int):
+            raise RuntimeError('error processing item')
+
+        worker = BackgroundWorker(process_item)
+        worker.submit(1)
+        with pytest.raises(RuntimeError):
+            for item in range(2, 100):
+                worker.submit(item)
+                worker._thread.join(0.01)  # pylint: disable=protected-access
+
+    def test_should_not_process_remaining_items_if_exiting_with_error(self):
+        processed_items: List[int] = []
+        continue_processing = threading.Event()
+
+        def process_item(item: int):
+            continue_processing.wait()
+            processed_items.append(item)
+
+        with pytest.raises(ValueError):
+            with BackgroundWorker(process_item, max_queue_size=2) as worker:
+                worker.submit(1)
+                worker.submit(2)
+                continue_processing.set()
+                raise ValueError('error producing items')
+        assert processed_items in ([], [1])
+
+
+class TestIterPrefetched:
+    def test_should_return_items_in_order(self):
+        assert list(iter_prefetched(range(10), max_prefetch_count=2)) == list(range(10))
+
+    def test_should_return_items_without_prefetching(self):
+        assert list(iter_prefetched(range(3), max_prefetch_count=0)) == [0, 1, 2]
+
+    def test_should_retrieve_items_in_other_thread(self):
+        thread_names: List[str] = []
+
+        def iter_items():
+            for item in range(2):
+                thread_names.append(threading.current_thread().name)
+                yield item
+
+        assert list(iter_prefetched(iter_items(), name='prefetch1')) == [0, 1]
+        assert thread_names == ['prefetch1', 'prefetch1']
+
+    def test_should_limit_number_of_prefetched_items(self):
+        retrieved_items: List[int] = []
+        all_items_retrieved = threading.Event()
+
+        def iter_items():
+            for item in range(10):
+                retrieved_items.append(item)
+                yield item
+            all_items_retrieved.set()
+
+        prefetched_iterator = iter(iter_prefetched(iter_items(), max_prefetch_count=2))
+        assert next(prefetched_iterator) == 0
+        # one item consumed, two items waiting and one item being put
+        assert not all_items_retrieved.wait(0.2)
+        assert len(retrieved_items) <= 4
+        assert list(prefetched_iterator) == list(range(1, 10))
+
+    def test_should_raise_error_after_previous_items(self):
+        def iter_items():
+            yield 1
+            raise RuntimeError('error retrieving item')
+
+        prefetched_iterator = iter(iter_prefetched(iter_items()))
+        assert next(prefetched_iterator) == 1
+        with pytest.raises(RuntimeError):
+            next(prefetched_iterator)
+
+    def test_should_stop_retrieving_items_when_closed(self):
+        stopped = threading.Event()
+
+        def iter_items():
+            try:
+                yield from range(100)
+            finally:
+                stopped.set()
+
+        prefetched_iterator = iter_prefetched(iter_items(), max_prefetch_count=1)
+        assert next(iter(prefetched_iterator)) == 0
+        prefetched_iterator.close()  # type: ignore
+        assert stopped.wait(5)
+
+
+class TestRunConcurrently:
+    def test_should_process_items_in_current_thread_without_concurrency(self):
+        thread_names: List[str] = []
+        run_concurrently(
+            lambda _: thread_names.append(threading.current_thread().name),
+            [1, 2],
+            max_workers=1
+        )
+        assert thread_names == [threading.current_thread().name] * 2
+
+    def test_should_process_items_concurrently(self):
+        # each item waits for the other item to have started
+        barrier = threading.Barrier(2, timeout=5)
+        processed_items: List[int] = []
+
+        def process_item(item: int):
+            barrier.wait()
+            processed_items.append(item)
+
+        run_concurrently(process_item, [1, 2], max_workers=2, name='concurrent1')
+        assert sorted(processed_items) == [1, 2]
+
+    def test_should_skip_remaining_items_and_raise_error(self):
+        processed_items: List[int] = []
+        never_set = threading.Event()
+
+        def process_item(item: int):
+            if item == 1:
+                raise RuntimeError('error processing item')
+            # items 2 and 3 may still be started while the error is handled
+            never_set.wait(0.5)
+            processed_items.append(item)
+
+        with pytest.raises(RuntimeError):
+            run_concurrently(process_item, [1, 2, 3, 4], max_workers=2)
+        assert 2 in processed_items
+        assert 4 not in processed_items
@@ -0,0 +1,71 @@
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+import peerscout.utils.batching as batching_module
+from peerscout.utils.batching import (
+    get_approximate_record_byte_size,
+    iter_get_adaptive_batches,
+    iter_get_batches
+)
+
+
+class TestIterGetBatches:
+    def test_should_not_return_any_batches_if_iterator_produces_no_items(self):
+        assert not list(iter_get_batches(iter([]), 2))
+
+    def test_should_return_full_batches(self):
+        assert list(iter_get_batches(
+            iter([1, 2, 3, 4]),
+            2
+        )) == [[1, 2], [3, 4]]
+
+    def test_should_return_last_partial_batch(self):
+        assert list(iter_get_batches(
+            iter([1, 2, 3, 4, 5]),
+            2
+        )) == [[1, 2], [3, 4], [5]]
+
+
+@pytest.fixture(name="monotonic_mock")
+def _monotonic_mock():
+    with patch.object(batching_module, "monotonic") as mock:
+        mock.return_value = 0.0
+        yield mock
+
+
+class TestIterGetAdaptiveBatches:
+    def test_should_use_max_size_without_targets(self):
+        assert list(iter_get_adaptive_batches(
+            [1, 2, 3, 4, 5], max_size=2
+        )) == [[1, 2], [3, 4], [5]]
+
+    def test_should_complete_batch_when_reaching_target_bytes(self):
+        assert list(iter_get_adaptive_batches(
+            ['a', 'bbb', 'c', 'd', 'eeee', 'f'], max_size=10, target_bytes=3
+        )) == [['a', 'bbb'], ['c', 'd', 'eeee'], ['f']]
+
+    def test_should_not_complete_batch_below_min_size(self):
+        assert list(iter_get_adaptive_batches(
+            ['aaaa', 'b', 'c', 'dddd'], max_size=10, min_size=2, target_bytes=3
+        )) == [['aaaa', 'b'], ['c', 'dddd']]
+
+    def test_should_not_exceed_max_size(self):
+        assert list(iter_get_adaptive_batches(
+            ['a', 'b', 'c'], max_size=2, target_bytes=100
+        )) == [['a', 'b'], ['c']]
+
+    def test_should_complete_batch_when_reaching_target_seconds(
+            self, monotonic_mock: MagicMock):
+        # start time, then one call per item (and start of the next batch)
+        monotonic_mock.side_effect = [0.0, 1.0, 2.0, 2.0, 2.5, 5.0, 5.0, 5.0]
+        assert list(iter_get_adaptive_batches(
+            [1, 2, 3, 4], max_size=10, target_seconds=2
+        )) == [[1, 2], [3, 4]]
+
+
+class TestGetApproximateRecordByteSize:
+    def test_should_add_length_of_values_and_list_items(self):
+        assert get_approximate_record_byte_size({
+            'id': '123', 'count': 10, 'extracted_keywords': ['ab', 'cde']
+        }) == 3 + 2 + 5
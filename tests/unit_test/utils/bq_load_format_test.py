@@ -0,0 +1,118 @@
+import datetime
+from io import BytesIO
+from typing import List
+
+import fastavro
+import pyarrow
+import pyarrow.parquet
+import pytest
+
+from peerscout.utils.bq_load_format import (
+    LoadFormat,
+    convert_record_for_schema,
+    get_load_format,
+    parse_date,
+    parse_time,
+    parse_timestamp,
+    write_columnar_records
+)
+
+
+SCHEMA: List[dict] = [
+    {'name': 'id', 'type': 'STRING', 'mode': 'NULLABLE'},
+    {'name': 'count', 'type': 'INTEGER', 'mode': 'NULLABLE'},
+    {'name': 'score', 'type': 'FLOAT', 'mode': 'NULLABLE'},
+    {'name': 'imported_timestamp', 'type': 'TIMESTAMP', 'mode': 'NULLABLE'},
+    {'name': 'extracted_keywords', 'type': 'STRING', 'mode': 'REPEATED'},
+    {'name': 'nested', 'type': 'RECORD', 'mode': 'NULLABLE', 'fields': [
+        {'name': 'date', 'type': 'DATE', 'mode': 'NULLABLE'}
+    ]}
+]
+
+RECORD: dict = {
+    'id': '1',
+    'count': 2,
+    'score': 3,
+    'imported_timestamp': '2021-02-03 04:05:06',
+    'extracted_keywords': ['keyword1', 'keyword2'],
+    'nested': {'date': '2021-02-03'}
+}
+
+UTC = datetime.timezone.utc
+
+
+class TestGetLoadFormat:
+    def test_should_default_to_json(self):
+        assert get_load_format(None) == LoadFormat.JSON
+
+    def test_should_ignore_case(self):
+        assert get_load_format('Parquet') == LoadFormat.PARQUET
+
+    def test_should_reject_unknown_load_format(self):
+        with pytest.raises(ValueError):
+            get_load_format('other')
+
+
+class TestParseTimestamp:
+    def test_should_parse_timestamp_without_timezone_as_utc(self):
+        assert parse_timestamp('2021-02-03 04:05:06') == datetime.datetime(
+            2021, 2, 3, 4, 5, 6, tzinfo=UTC
+        )
+
+    def test_should_parse_fraction_and_timezone_offset(self):
+        assert parse_timestamp('2021-02-03T04:05:06.5+01:00') == datetime.datetime(
+            2021, 2, 3, 3, 5, 6, 500000, tzinfo=UTC
+        )
+
+    def test_should_parse_utc_suffix(self):
+        assert parse_timestamp('2021-2-3 4:05:06 UTC') == datetime.datetime(
+            2021, 2, 3, 4, 5, 6, tzinfo=UTC
+        )
+
+
+class TestParseDateAndTime:
+    def test_should_parse_date(self):
+        assert parse_date('2021-02-03') == datetime.date(2021, 2, 3)
+
+    def test_should_parse_time(self):
+        assert parse_time('04:05:06.123') == datetime.time(4, 5, 6, 123000)
+
+
+class TestConvertRecordForSchema:
+    def test_should_convert_values_and_add_missing_fields(self):
+        assert convert_record_for_schema({'ID': '1', 'score': 3}, SCHEMA) == {
+            'id': '1',
+            'count': None,
+            'score': 3.0,
+            'imported_timestamp': None,
+            'extracted_keywords': [],
+            'nested': None
+        }
+
+
+class TestWriteColumnarRecords:
+    def test_should_write_parquet_with_repeated_string_column(self):
+        parquet_file = BytesIO()
+        write_columnar_records([RECORD], parquet_file, LoadFormat.PARQUET, SCHEMA)
+        parquet_file.seek(0)
+        table = pyarrow.parquet.read_table(parquet_file)
+        keywords_type = table.schema.field('extracted_keywords').type
+        assert pyarrow.types.is_list(keywords_type)
+        assert pyarrow.types.is_string(keywords_type.value_type)
+        assert table.to_pylist() == [{
+            **RECORD,
+            'score': 3.0,
+            'imported_timestamp': datetime.datetime(2021, 2, 3, 4, 5, 6, tzinfo=UTC),
+            'nested': {'date': datetime.date(2021, 2, 3)}
+        }]
+
+    def test_should_write_avro_with_repeated_string_field(self):
+        avro_file = BytesIO()
+        write_columnar_records([RECORD], avro_file, LoadFormat.AVRO, SCHEMA)
+        avro_file.seek(0)
+        assert list(fastavro.reader(avro_file)) == [{
+            **RECORD,
+            'score': 3.0,
+            'imported_timestamp': datetime.datetime(2021, 2, 3, 4, 5, 6, tzinfo=UTC),
+            'nested': {'date': datetime.date(2021, 2, 3)}
+        }]
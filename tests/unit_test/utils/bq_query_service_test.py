@@ -0,0 +1,158 @@
+import datetime
+import sys
+import threading
+from types import ModuleType
+from typing import List, Optional
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import pyarrow
+import pytest
+
+from peerscout.utils.bq_query_service import (
+    BqQueryResult,
+    BqQueryResultMode,
+    get_bigquery_storage_client,
+    get_query_result_mode
+)
+
+
+RECORDS: List[dict] = [
+    {
+        'id': '1',
+        'count': 1,
+        'keywords': ['keyword1', 'keyword2'],
+        'timestamp': datetime.datetime(2021, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc)
+    },
+    {'id': '2', 'count': None, 'keywords': [], 'timestamp': None},
+    {'id': '3', 'count': 3, 'keywords': ['keyword3'], 'timestamp': None}
+]
+
+ARROW_SCHEMA = pyarrow.schema([
+    pyarrow.field('id', pyarrow.string()),
+    pyarrow.field('count', pyarrow.int64()),
+    pyarrow.field('keywords', pyarrow.list_(pyarrow.string())),
+    pyarrow.field('timestamp', pyarrow.timestamp('us', tz='UTC'))
+])
+
+
+class LocalRowIterator:
+    # a stand-in for bigquery.table.RowIterator, using a local Arrow table
+    def __init__(self, records: List[dict], max_batch_size: int = 2):
+        self.table = pyarrow.Table.from_pylist(records, schema=ARROW_SCHEMA)
+        self.max_batch_size = max_batch_size
+        self.total_rows = self.table.num_rows
+        self.bqstorage_client: Optional[object] = None
+
+    def __iter__(self):
+        return iter(self.table.to_pylist())
+
+    @property
+    def pages(self):
+        # the rows of each page, similar to bigquery.table.Row (a mapping)
+        return (
+            record_batch.to_pylist()
+            for record_batch in self.table.to_batches(max_chunksize=self.max_batch_size)
+        )
+
+    def to_arrow_iterable(self, bqstorage_client=None):
+        self.bqstorage_client = bqstorage_client
+        return iter(self.table.to_batches(max_chunksize=self.max_batch_size))
+
+
+@pytest.fixture(name='bigquery_storage_module_mock')
+def _bigquery_storage_module_mock():
+    module = ModuleType('google.cloud.bigquery_storage')
+    module.BigQueryReadClient = MagicMock(name='BigQueryReadClient')  # type: ignore
+    with patch.dict(sys.modules, {'google.cloud.bigquery_storage': module}):
+        yield module
+
+
+class TestGetQueryResultMode:
+    def test_should_default_to_rows(self):
+        assert get_query_result_mode(None) == BqQueryResultMode.ROWS
+
+    def test_should_accept_arrow(self):
+        assert get_query_result_mode('Arrow') == BqQueryResultMode.ARROW
+
+    def test_should_raise_error_for_unsupported_mode(self):
+        with pytest.raises(ValueError):
+            get_query_result_mode('other')
+
+
+class TestGetBigQueryStorageClient:
+    def test_should_return_none_without_bigquery_storage(self):
+        with patch.dict(sys.modules, {'google.cloud.bigquery_storage': None}):
+            assert get_bigquery_storage_client() is None
+
+    def test_should_create_storage_client_once(self, bigquery_storage_module_mock: ModuleType):
+        storage_client = get_bigquery_storage_client()
+        assert storage_client == bigquery_storage_module_mock.BigQueryReadClient.return_value
+        assert get_bigquery_storage_client() == storage_client
+        bigquery_storage_module_mock.BigQueryReadClient.assert_called_once()
+
+
+class TestBqQueryResult:
+    def test_should_iterate_rows_as_dicts(self):
+        result = BqQueryResult(LocalRowIterator(RECORDS))  # type: ignore
+        assert result.total_rows == len(RECORDS)
+        assert list(result) == RECORDS
+
+    def test_should_iterate_rows_as_dicts_without_prefetching(self):
+        result = BqQueryResult(
+            LocalRowIterator(RECORDS),  # type: ignore
+            prefetch_page_count=0
+        )
+        assert list(result) == RECORDS
+
+    def test_should_not_retrieve_pages_without_rows(self):
+        row_iterator = MagicMock(name='row_iterator', total_rows=0)
+        assert not list(BqQueryResult(row_iterator))
+
+    def test_should_retrieve_pages_in_background_thread(self):
+        page_thread_names: List[str] = []
+        row_iterator = LocalRowIterator(RECORDS, max_batch_size=1)
+        pages = row_iterator.pages
+
+        def iter_pages():
+            for page in pages:
+                page_thread_names.append(threading.current_thread().name)
+                yield page
+
+        with patch.object(LocalRowIterator, 'pages', new_callable=PropertyMock) as pages_mock:
+            pages_mock.return_value = iter_pages()
+            result = BqQueryResult(
+                row_iterator,  # type: ignore
+                prefetch_page_count=1
+            )
+            assert list(result) == RECORDS
+        assert page_thread_names == ['bq-query-result-prefetch'] * len(RECORDS)
+
+    def test_should_iterate_arrow_batches_as_dicts(
+            self, bigquery_storage_module_mock: ModuleType):
+        row_iterator = LocalRowIterator(RECORDS, max_batch_size=2)
+        result = BqQueryResult(
+            row_iterator,  # type: ignore
+            result_mode=BqQueryResultMode.ARROW
+        )
+        assert list(result) == RECORDS
+        assert row_iterator.bqstorage_client == (
+            bigquery_storage_module_mock.BigQueryReadClient.return_value
+        )
+
+    def test_should_return_record_batches(self):
+        result = BqQueryResult(
+            LocalRowIterator(RECORDS, max_batch_size=2),  # type: ignore
+            result_mode=BqQueryResultMode.ARROW
+        )
+        with patch.dict(sys.modules, {'google.cloud.bigquery_storage': None}):
+            assert list(result.iter_record_batches()) == [RECORDS[:2], RECORDS[2:]]
+
+    def test_should_return_arrow_batches(self):
+        result = BqQueryResult(
+            LocalRowIterator(RECORDS, max_batch_size=2),  # type: ignore
+            result_mode=BqQueryResultMode.ARROW
+        )
+        with patch.dict(sys.modules, {'google.cloud.bigquery_storage': None}):
+            arrow_batches = list(result.iter_arrow_batches())
+        assert [arrow_batch.num_rows for arrow_batch in arrow_batches] == [2, 1]
+        assert arrow_batches[0].schema == ARROW_SCHEMA
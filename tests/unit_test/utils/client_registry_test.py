@@ -0,0 +1,25 @@
+from unittest.mock import MagicMock
+
+from peerscout.utils.client_registry import clear_clients, get_or_create_client
+
+
+class TestGetOrCreateClient:
+    def test_should_create_client_once_per_key(self):
+        create_client = MagicMock(name='create_client')
+        client_1 = get_or_create_client(('service1', 'project1'), create_client)
+        client_2 = get_or_create_client(('service1', 'project1'), create_client)
+        assert client_1 is client_2
+        create_client.assert_called_once()
+
+    def test_should_create_separate_clients_for_different_keys(self):
+        get_or_create_client(('service1', 'project1'), MagicMock(return_value='client1'))
+        assert get_or_create_client(
+            ('service1', 'project2'), MagicMock(return_value='client2')
+        ) == 'client2'
+
+    def test_should_create_client_again_after_clearing_clients(self):
+        create_client = MagicMock(name='create_client')
+        get_or_create_client('service1', create_client)
+        clear_clients()
+        get_or_create_client('service1', create_client)
+        assert create_client.call_count == 2
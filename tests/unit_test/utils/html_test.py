@@ -1,8 +1,67 @@
+import json
+import logging
+import random
+import timeit
+from pathlib import Path
+from typing import List
+
+import pytest
+
 from peerscout.utils.html import (
-    strip_tags
+    strip_tags,
+    strip_tags_list,
+    strip_tags_using_html_parser
 )
 
 
+LOGGER = logging.getLogger(__name__)
+
+
+# abstracts with the markup found in the source data (e.g. JATS tags of Crossref)
+ABSTRACTS_JSON_PATH = Path(__file__).parent / 'resources' / 'abstracts.json'
+
+
+def _load_abstracts() -> List[str]:
+    return json.loads(ABSTRACTS_JSON_PATH.read_text(encoding='utf-8'))
+
+
+ABSTRACTS = _load_abstracts()
+
+MARKUP_FRAGMENTS = [
+    'text', ' ', '.', '<i>', '</i>', '<SUP>', '</sup>', '<br/>', '<jats:p>', '</jats:p>',
+    "<a href='x?a=1&amp;b=2'>", '</a>', '<!-- comment -->', '<script>', '</script>',
+    '&amp;', '&lt;', '&gt;', '&#945;', '&#x3b1;', '&alpha', ';', '&', '<', '>', '=', '"'
+]
+
+
+def _get_random_markup_texts(count: int, seed: int = 1) -> List[str]:
+    rnd = random.Random(seed)
+    return [
+        ''.join(rnd.choices(MARKUP_FRAGMENTS, k=rnd.randint(1, 12)))
+        for _ in range(count)
+    ]
+
+
+ABSTRACT_LIKE_TEXTS = [
+    'Plain abstract without any markup, measured at 37 °C over 10 days.',
+    'Expression of <i>Drosophila</i> genes in the <i>C. elegans</i> germline.',
+    'Ca<sup>2+</sup> influx via TRPV4 &amp; PIEZO1 channels (p &lt; 0.05).',
+    'CO<sub>2</sub> and O<sub>2</sub> levels; H<sub>2</sub>O<sub>2</sub> signalling.',
+    '<p>First paragraph.</p><p>Second paragraph with <b>bold</b> text.</p>',
+    'Line<br/>break and<br />another and <br> another.',
+    'Link to <a href="https://example.org/?a=1&amp;b=2">the data</a>.',
+    "Attributes <span class='x' data-id=1>in</span> single quotes.",
+    'Greek letters &alpha;, &#945; and &#x3b1; as char refs.',
+    'Comparison 1 > 0 and 0 < 1 without escaping.',
+    'Comment <!-- hidden --> in text.',
+    'Style <style>p { color: red; }</style> and <script>var a = 1 < 2;</script>.',
+    'Trailing ampersand &',
+    'Trailing incomplete char ref &amp',
+    'Uppercase <I>italic</I> and <SUP>superscript</SUP>.',
+    '',
+]
+
+
 class TestStripTags:
     def test_strip_tags(self):
         assert strip_tags('<i>italic</i>') == 'italic'
@@ -12,3 +71,42 @@ class TestStripTags:
 
     def test_not_fail_on_unescaped_greater_sign(self):
         assert strip_tags('1 > 0') == '1 > 0'
+
+    def test_should_return_text_without_markup_unchanged(self):
+        text = 'text without markup'
+        assert strip_tags(text) is text
+
+    @pytest.mark.parametrize('text', ABSTRACT_LIKE_TEXTS)
+    def test_should_return_same_result_as_html_parser(self, text: str):
+        assert strip_tags(text) == strip_tags_using_html_parser(text)
+
+    @pytest.mark.parametrize('text', ABSTRACTS)
+    def test_should_return_same_result_as_html_parser_for_abstracts(self, text: str):
+        assert strip_tags(text) == strip_tags_using_html_parser(text)
+
+    @pytest.mark.slow
+    def test_should_return_same_result_as_html_parser_for_random_markup(self):
+        for text in _get_random_markup_texts(20000):
+            assert strip_tags(text) == strip_tags_using_html_parser(text), text
+
+    @pytest.mark.slow
+    def test_should_be_faster_than_html_parser_for_abstracts(self):
+        text_list = ABSTRACTS * 100
+        fast_seconds = min(timeit.repeat(
+            lambda: strip_tags_list(text_list), number=1, repeat=5
+        ))
+        html_parser_seconds = min(timeit.repeat(
+            lambda: [strip_tags_using_html_parser(text) for text in text_list],
+            number=1, repeat=5
+        ))
+        LOGGER.info(
+            'strip tags of %d abstracts: %.1fms (html parser: %.1fms, %.1fx)',
+            len(text_list), fast_seconds * 1000, html_parser_seconds * 1000,
+            html_parser_seconds / fast_seconds
+        )
+        assert fast_seconds < html_parser_seconds
+
+
+class TestStripTagsList:
+    def test_should_strip_tags_of_all_texts(self):
+        assert strip_tags_list(['<i>italic</i>', '&gt;']) == ['italic', '>']
@@ -0,0 +1,80 @@
+import gzip
+import json
+from io import BytesIO
+
+import pytest
+
+from peerscout.utils.json_serializer import (
+    JsonEncoderName,
+    JsonLinesWriter,
+    LoadCompression,
+    get_json_encode,
+    get_load_compression
+)
+
+
+RECORDS = [
+    {'id': '1', 'text': 'café α-helix "quoted" \\ \n', 'count': 1},
+    {'score': 1.5, 'large': 1e16, 'flag': True, 'none': None, 'nan': float('nan')},
+    {'keywords': ['keyword1', 'keyword2'], 'nested': {'list': [{'a': 1}], 'empty': {}}},
+    {},
+    'text',
+    [1, 2.5, None]
+]
+
+
+def _get_expected_jsonl_bytes(records: list) -> bytes:
+    return b''.join(
+        json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+        for record in records
+    )
+
+
+class TestGetJsonEncode:
+    @pytest.mark.parametrize('encoder_name', [
+        None, JsonEncoderName.FAST, JsonEncoderName.STDLIB, 'FAST'
+    ])
+    def test_should_encode_same_as_json_dumps(self, encoder_name: str):
+        encode = get_json_encode(encoder_name)
+        for record in RECORDS:
+            assert encode(record) == json.dumps(record, ensure_ascii=False)
+
+    def test_should_raise_error_for_unsupported_encoder(self):
+        with pytest.raises(ValueError):
+            get_json_encode('other')
+
+
+class TestGetLoadCompression:
+    def test_should_default_to_no_compression(self):
+        assert get_load_compression(None) == LoadCompression.NONE
+
+    def test_should_accept_gzip(self):
+        assert get_load_compression('GZIP') == LoadCompression.GZIP
+
+    def test_should_raise_error_for_unsupported_compression(self):
+        with pytest.raises(ValueError):
+            get_load_compression('zip')
+
+
+class TestJsonLinesWriter:
+    def test_should_write_same_bytes_as_json_dumps(self):
+        write_file = BytesIO()
+        with JsonLinesWriter(write_file) as jsonl_writer:
+            for record in RECORDS:
+                jsonl_writer.write(record)
+        assert write_file.getvalue() == _get_expected_jsonl_bytes(RECORDS)
+        assert jsonl_writer.record_count == len(RECORDS)
+
+    def test_should_write_gzip_compressed_bytes(self):
+        write_file = BytesIO()
+        with JsonLinesWriter(write_file, compression=LoadCompression.GZIP) as jsonl_writer:
+            for record in RECORDS:
+                jsonl_writer.write(record)
+        assert not write_file.closed
+        assert gzip.decompress(write_file.getvalue()) == _get_expected_jsonl_bytes(RECORDS)
+
+    def test_should_not_write_anything_without_records(self):
+        write_file = BytesIO()
+        with JsonLinesWriter(write_file, compression=LoadCompression.GZIP):
+            pass
+        assert write_file.getvalue() == b''